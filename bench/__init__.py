@@ -0,0 +1 @@
+"""Benchmarks for multi_search (run as `python -m bench.<name>`)."""
@@ -0,0 +1,120 @@
+"""Chunker throughput on large documents and chunk-id stability under edits.
+
+Compares the sentence-aware content-defined chunker (`src.data_init.chunker`) with
+langchain's `RecursiveCharacterTextSplitter` (the previous splitter, if installed) on
+synthetic documents of `--doc-chars` characters. For stability, `--edits` random
+sentences are inserted into each document and the share of chunks that would have to
+be re-embedded is reported: content-hash ids vs positional ids (`chunk_id = idx`).
+
+    python -m bench.chunking --docs 20 --doc-chars 200000 --edits 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.corpus import _paragraph, _sentence
+from src.data_init.chunker import assign_chunk_ids, chunk_text
+
+
+def _document(rng: random.Random, chars: int) -> str:
+    parts: List[str] = []
+    size = 0
+    while size < chars:
+        p = _paragraph(rng, rng.randint(80, 600))
+        parts.append(p)
+        size += len(p) + 3
+    return "\n　　".join(parts)
+
+
+def _edit(rng: random.Random, text: str, edits: int) -> str:
+    for _ in range(edits):
+        pos = text.find("。", rng.randrange(len(text))) + 1
+        text = text[:pos] + _sentence(rng) + text[pos:]
+    return text
+
+
+def _throughput(split, docs: List[str]) -> Dict:
+    t0 = time.perf_counter()
+    n = 0
+    sizes: List[int] = []
+    for d in docs:
+        texts = split(d)
+        n += len(texts)
+        sizes.extend(len(t) for t in texts)
+    wall = time.perf_counter() - t0
+    chars = sum(len(d) for d in docs)
+    return {
+        "wall_s": wall,
+        "mchars_per_s": chars / wall / 1e6 if wall > 0 else 0.0,
+        "chunks": n,
+        "mean_chunk_chars": (sum(sizes) / len(sizes)) if sizes else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunker throughput and chunk-id stability")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--doc-chars", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=400)
+    parser.add_argument("--chunk-overlap", type=int, default=40)
+    parser.add_argument("--edits", type=int, default=3, help="Sentences inserted per document for the stability check")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = [_document(rng, args.doc_chars) for _ in range(args.docs)]
+    size, overlap = args.chunk_size, args.chunk_overlap
+
+    def sentence_split(d: str) -> List[str]:
+        return [c.text for c in chunk_text(d, chunk_size=size, chunk_overlap=overlap)]
+
+    results: Dict[str, Dict] = {"sentence": _throughput(sentence_split, docs)}
+    recursive = None
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        recursive = RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=overlap).split_text
+        results["recursive"] = _throughput(recursive, docs)
+    except ImportError:
+        pass
+
+    content, positional = [], []
+    for d in docs:
+        edited = _edit(rng, d, args.edits)
+        a, b = chunk_text(d, size, overlap), chunk_text(edited, size, overlap)
+        ids_a, ids_b = set(assign_chunk_ids(a)), assign_chunk_ids(b)
+        content.append(sum(1 for i in ids_b if i not in ids_a) / max(1, len(ids_b)))
+        if recursive is not None:
+            ra, rb = recursive(d), recursive(edited)
+            old = set(enumerate(ra))
+            positional.append(sum(1 for pair in enumerate(rb) if pair not in old) / max(1, len(rb)))
+    results["reembed_share"] = {"content_hash_ids": sum(content) / len(content)}
+    if positional:
+        results["reembed_share"]["positional_ids"] = sum(positional) / len(positional)
+
+    for name in ("sentence", "recursive"):
+        if name in results:
+            r = results[name]
+            print(f"{name:<10} {r['mchars_per_s']:6.2f} Mchar/s  chunks={r['chunks']:<7} mean={r['mean_chunk_chars']:.0f} chars", file=sys.stderr)
+    print(f"re-embed after {args.edits} edits/doc: " + ", ".join(f"{k}={v:.1%}" for k, v in results["reembed_share"].items()), file=sys.stderr)
+
+    text = json.dumps({"params": vars(args), "results": results}, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Synthetic `【省份】`-named corpus generator for ingestion and query benchmarks.
+
+Files are written paragraph by paragraph (never held in memory), each paragraph sized
+to roughly one 400-char chunk, so `--chunks` approximates the number of chunks that
+`split_items` produces. Output is deterministic for a given seed.
+
+    python -m bench.corpus --out bench_data/corpus_10k --chunks 10000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.geo.region import REGION_PATTERNS
+
+
+_SUBJECTS = ["政府采购", "集中采购", "采购人", "供应商", "评标专家", "采购代理机构", "财政部门", "监管部门", "中小企业", "民营企业"]
+_ACTIONS = ["全面落实", "持续深化", "积极推进", "严格规范", "加快推广", "着力优化", "统筹推进", "大力支持", "切实加强", "探索建立"]
+_OBJECTS = [
+    "主体责任", "电子化采购平台", "远程异地评标", "诚信评价体系", "营商环境", "预留份额制度",
+    "履约验收管理", "采购意向公开", "信用承诺制", "网上商城采购", "框架协议采购", "专家库建设",
+]
+_TAILS = ["提升采购效率", "降低交易成本", "保障公平竞争", "促进高质量发展", "防范廉政风险", "稳定市场预期"]
+_TOPICS = ["深化政采制度改革", "优化营商环境", "规范网上商城采购管理", "支持民企参与政府采购", "推广远程异地评标", "落实采购人主体责任"]
+
+
+def _sentence(rng: random.Random) -> str:
+    return f"{rng.choice(_SUBJECTS)}{rng.choice(_ACTIONS)}{rng.choice(_OBJECTS)}，{rng.choice(_TAILS)}。"
+
+
+def _paragraph(rng: random.Random, chars: int) -> str:
+    parts: List[str] = []
+    size = 0
+    while size < chars:
+        s = _sentence(rng)
+        parts.append(s)
+        size += len(s)
+    return "".join(parts)
+
+
+def generate_corpus(
+    out_dir: str,
+    chunks: int = 10000,
+    chunks_per_file: int = 50,
+    paragraph_chars: int = 340,
+    core_ratio: float = 0.1,
+    seed: int = 42,
+) -> Dict:
+    """Write ~`chunks` chunks worth of text into `【省份】主题N` files under out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    provinces = list(REGION_PATTERNS.keys())
+    n_files = max(1, -(-chunks // chunks_per_file))
+    n_core = max(1, int(n_files * core_ratio))
+    files: List[str] = []
+    remaining = chunks
+    for fi in range(n_files):
+        prov = "中央" if fi < n_core else provinces[(fi - n_core) % len(provinces)]
+        name = f"【{prov}】{rng.choice(_TOPICS)}{fi:06d}"
+        n_par = min(chunks_per_file, remaining)
+        remaining -= n_par
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            for pi in range(n_par):
+                if pi:
+                    f.write("\n\n")
+                f.write(_paragraph(rng, paragraph_chars))
+        files.append(name)
+    manifest = {
+        "out_dir": out_dir,
+        "target_chunks": chunks,
+        "files": len(files),
+        "core_files": n_core,
+        "chunks_per_file": chunks_per_file,
+        "paragraph_chars": paragraph_chars,
+        "seed": seed,
+    }
+    return manifest
+
+
+def sample_questions(n: int, seed: int = 7) -> List[str]:
+    """Deterministic question set mixing province-scoped and national questions."""
+    rng = random.Random(seed)
+    provinces = list(REGION_PATTERNS.keys())
+    out: List[str] = []
+    for i in range(n):
+        obj = rng.choice(_OBJECTS)
+        if i % 3 == 2:
+            out.append(f"各地在{obj}方面有哪些做法？")
+        else:
+            out.append(f"{rng.choice(provinces)}在{obj}方面有哪些措施？")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic 【省份】 corpus")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--chunks", type=int, default=10000, help="Approximate number of chunks")
+    parser.add_argument("--chunks-per-file", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    manifest = generate_corpus(args.out, chunks=args.chunks, chunks_per_file=args.chunks_per_file, seed=args.seed)
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
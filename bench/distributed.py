@@ -0,0 +1,175 @@
+"""Distributed query: N local worker processes vs one node, against the mock Ollama.
+
+The synthetic corpus is ingested once into a single index and once per shard
+(`init_vector_db(provinces=...)`; shard 0 also holds the core documents). Each shard
+is served by a `python -m src.service.worker` subprocess; the coordinator fans
+retrieval out to them and load-balances summaries. The report gives latency for both
+setups and how often the distributed answer cites the same chunks as the single node.
+
+    python -m bench.distributed --shards 3 --chunks 600 --queries 20 --concurrency 4
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.corpus import generate_corpus, sample_questions
+from bench.mock_ollama import MockOllamaConfig, MockOllamaServer
+from src.geo.region import REGION_PATTERNS
+from src.utils.metrics import LatencyHistogram
+
+
+def shard_provinces(shards: int) -> List[List[str]]:
+    provinces = list(REGION_PATTERNS.keys())
+    out = [provinces[i::shards] for i in range(shards)]
+    out[0] = ["中央"] + out[0]
+    return out
+
+
+def _spawn_worker(name: str, persist_dir: str, base_url: str, timeout_s: float = 60.0):
+    env = {**os.environ, "CHROMA_PERSIST_DIR": persist_dir, "OLLAMA_BASE_URL": base_url}
+    env.pop("MULTI_SEARCH_KB_CATALOG", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.service.worker", "--port", "0", "--name", name],
+        cwd=str(ROOT),
+        env=env,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        line = proc.stdout.readline()
+        if not line:
+            break
+        if "listening on" in line:
+            return proc, line.rsplit(" ", 1)[-1].strip()
+    proc.kill()
+    raise RuntimeError(f"worker {name} did not start")
+
+
+def _refs(out: Dict) -> List[str]:
+    return sorted(json.dumps(r, ensure_ascii=False, sort_keys=True) for r in out.get("references") or [])
+
+
+def _run(invoke: Callable[[str], Dict], questions: List[str], concurrency: int) -> Dict:
+    invoke(questions[0])  # first query opens the indexes and imports the pipeline
+    h = LatencyHistogram()
+    results: Dict[str, Dict] = {}
+
+    def one(q: str) -> None:
+        s = time.perf_counter()
+        results[q] = invoke(q)
+        h.record(time.perf_counter() - s)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, questions))
+    wall = time.perf_counter() - t0
+    snap = h.snapshot()
+    return {
+        "count": snap["count"],
+        "p50_ms": snap["p50"] * 1000,
+        "p95_ms": snap["p95"] * 1000,
+        "throughput_per_s": (len(questions) / wall) if wall > 0 else 0.0,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark coordinator + local query workers against one node")
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--chunks-per-file", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("-k", "--top-k", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--generate-latency-ms", type=float, default=200.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Keep the temp corpus/index directories")
+    parser.add_argument("--out", default=None, help="Write JSON report here")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="ms_bench_dist_")
+    corpus_dir = os.path.join(work, "corpus")
+    server = MockOllamaServer(config=MockOllamaConfig(args.embed_latency_ms, args.generate_latency_ms)).start()
+    os.environ["OLLAMA_BASE_URL"] = server.base_url
+    os.environ.setdefault("MULTI_SEARCH_DEBUG", "0")
+    os.environ["MULTI_SEARCH_LLM_CACHE"] = "off"
+    os.environ.pop("MULTI_SEARCH_KB_CATALOG", None)
+    procs = []
+    try:
+        from src.data_init.initializer import init_vector_db
+
+        generate_corpus(corpus_dir, chunks=args.chunks, chunks_per_file=args.chunks_per_file, seed=args.seed)
+        single_dir = os.path.join(work, "single")
+        init_vector_db(data_dir=corpus_dir, persist_dir=single_dir, reset=True)
+        shards = shard_provinces(args.shards)
+        urls = []
+        for i, provinces in enumerate(shards):
+            persist = os.path.join(work, f"shard{i}")
+            summary = init_vector_db(data_dir=corpus_dir, persist_dir=persist, reset=True, provinces=provinces)
+            print(f"[bench] shard{i}: {len(provinces)} provinces, {summary.get('total_chunks')} chunks", file=sys.stderr)
+            proc, url = _spawn_worker(f"shard{i}", persist, server.base_url)
+            procs.append(proc)
+            urls.append(url)
+
+        questions = sample_questions(args.queries, seed=args.seed)
+        os.environ["CHROMA_PERSIST_DIR"] = single_dir
+        from src.pipeline.chain import build_app_chain
+
+        chain = build_app_chain()
+        print("[bench] single node ...", file=sys.stderr)
+        single = _run(lambda q: chain.invoke({"question": q, "top_k": args.top_k}), questions, args.concurrency)
+
+        from src.service.coordinator import Coordinator
+
+        coordinator = Coordinator(urls)
+        dist_chain = coordinator.build_chain()
+        print(f"[bench] {len(urls)} workers ...", file=sys.stderr)
+        dist = _run(lambda q: dist_chain.invoke({"question": q, "top_k": args.top_k}), questions, args.concurrency)
+        workers = coordinator.snapshot()
+        coordinator.close()
+
+        same = sum(1 for q in questions if _refs(single["results"][q]) == _refs(dist["results"][q]))
+        report = {
+            "params": {k: v for k, v in vars(args).items() if k != "out"},
+            "shards": shards,
+            "single": {k: v for k, v in single.items() if k != "results"},
+            "distributed": {k: v for k, v in dist.items() if k != "results"},
+            "same_references": same / len(questions) if questions else 1.0,
+            "workers": workers,
+        }
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Retrieval quality and latency over a labeled question set, per backend.
+
+Each label is a question with the chunks that should be retrieved for it
+(`source_name::chunk_id`, the `ref` the pipeline cites), as JSONL or a JSON list:
+
+    {"question": "四川在远程异地评标方面有哪些措施？", "expected": ["【四川】推广远程异地评标000012::3"]}
+
+Optional per-label fields: `province` (else resolved from the question) and `kb`.
+
+Backends are `chain` (the pipeline's plan → embed → RunMultiQuery stages), `simple`
+(`simple_query`, one unfiltered top-k) and `workers` (the distributed coordinator over
+`--workers` / MULTI_SEARCH_WORKERS); `name@kb` runs a backend against another KB of the
+catalog, e.g. a re-chunked or quantized index. Summarization is not run: latency is the
+retrieval path only.
+
+Reported per backend, in one table:
+- recall@k: share of a question's expected chunks found in any group, averaged over questions;
+- recall@k per group: the same, counting only the expected chunks whose metadata
+  (kb_type/province from the `【省份】` file name) matches that group's filter;
+- MRR: reciprocal rank of the first expected chunk in the answer order (groups in plan order);
+- latency p50/p95/p99.
+
+`--baseline NAME --max-recall-drop X` exits 1 when another backend's recall is more than
+X below the baseline's, so a faster configuration is accepted only at acceptable quality.
+`--synthetic N` builds a synthetic corpus and index with the mock Ollama and labels N of
+its chunks (a chunk's opening sentences as the question) for a self-contained run.
+
+    python -m bench.eval --labels eval/labels.jsonl --backends chain,simple,chain@kb_q8 -k 5
+    python -m bench.eval --synthetic 50 --chunks 600 --backends chain,simple --baseline chain --max-recall-drop 0.05
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.utils.metrics import LatencyHistogram
+
+# (group name, refs in rank order) per group, and the plan's filters_list
+Retrieved = Tuple[List[Tuple[str, List[str]]], Sequence[Dict[str, Any]]]
+
+BACKENDS = ("chain", "simple", "workers")
+
+
+def load_labels(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        rows = json.loads(text)
+    else:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    labels = []
+    for row in rows:
+        expected = row.get("expected") or []
+        if isinstance(expected, str):
+            expected = [expected]
+        labels.append({**row, "expected": list(expected)})
+    return labels
+
+
+def _matches(md: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Chroma `where` semantics for the operators the partition plans use."""
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(_matches(md, w) for w in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(md, w) for w in cond):
+                return False
+        elif isinstance(cond, dict):
+            v = md.get(key)
+            for op, arg in cond.items():
+                ok = {
+                    "$eq": lambda: v == arg,
+                    "$ne": lambda: v != arg,
+                    "$in": lambda: v in arg,
+                    "$nin": lambda: v not in arg,
+                }.get(op, lambda: False)()
+                if not ok:
+                    return False
+        elif md.get(key) != cond:
+            return False
+    return True
+
+
+def expected_by_group(expected: Sequence[str], filters_list: Sequence[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Assign each expected ref to the first plan group whose filter admits its metadata."""
+    from src.data_init.loaders import parse_kb_metadata
+
+    out: Dict[str, List[str]] = {}
+    for ref in expected:
+        kb_type, province = parse_kb_metadata(ref.split("::", 1)[0])
+        md = {"kb_type": kb_type, "province": province}
+        for f in filters_list:
+            if _matches(md, f.get("where")):
+                out.setdefault(f.get("name"), []).append(ref)
+                break
+    return out
+
+
+def score_question(expected: Sequence[str], retrieved: Retrieved) -> Dict[str, Any]:
+    groups, filters_list = retrieved
+    want = set(expected)
+    ranked = [ref for _, refs in groups for ref in refs]
+    found = want.intersection(ranked)
+    rr = next((1.0 / i for i, ref in enumerate(ranked, start=1) if ref in want), 0.0)
+    per_group: Dict[str, Tuple[int, int]] = {}
+    got = dict(groups)
+    for name, refs in expected_by_group(expected, filters_list).items():
+        per_group[name] = (len(set(refs).intersection(got.get(name, []))), len(refs))
+    return {"recall": len(found) / len(want) if want else 1.0, "rr": rr, "groups": per_group}
+
+
+def aggregate(scores: List[Dict[str, Any]], latency: LatencyHistogram) -> Dict[str, Any]:
+    n = len(scores)
+    groups: Dict[str, List[float]] = {}
+    for s in scores:
+        for name, (hit, total) in s["groups"].items():
+            groups.setdefault(name, []).append(hit / total)
+    snap = latency.snapshot()
+    return {
+        "questions": n,
+        "recall": sum(s["recall"] for s in scores) / n if n else 0.0,
+        "mrr": sum(s["rr"] for s in scores) / n if n else 0.0,
+        "recall_by_group": {name: sum(v) / len(v) for name, v in groups.items()},
+        "p50_ms": snap["p50"] * 1000,
+        "p95_ms": snap["p95"] * 1000,
+        "p99_ms": snap["p99"] * 1000,
+    }
+
+
+def make_backend(spec: str, top_k: int, workers: Sequence[str] = ()) -> Tuple[Callable[[Dict[str, Any]], Retrieved], Callable[[], None]]:
+    """(retrieve(label), close()) for a backend spec `name[@kb]`."""
+    name, _, kb = spec.partition("@")
+    kb = kb or None
+    if name == "simple":
+        from src.rag.simple import simple_query
+
+        def run_simple(label: Dict[str, Any]) -> Retrieved:
+            items = simple_query(label["question"], top_k=top_k, kb=label.get("kb") or kb)
+            return [("all", [it["id"] for it in items])], [{"name": "all", "where": None}]
+
+        return run_simple, lambda: None
+
+    if name == "chain":
+        from src.pipeline.chain import build_stage_runnables
+
+        stages, close = build_stage_runnables(), (lambda: None)
+    elif name == "workers":
+        from src.service.coordinator import Coordinator
+
+        if not workers:
+            raise ValueError("the workers backend needs --workers or MULTI_SEARCH_WORKERS")
+        coordinator = Coordinator(list(workers))
+        stages, close = coordinator.stages(), coordinator.close
+    else:
+        raise ValueError(f"unknown backend {name!r} (expected one of {', '.join(BACKENDS)})")
+
+    from src.pipeline.types import as_contexts
+
+    def run_stages(label: Dict[str, Any]) -> Retrieved:
+        state = {"question": label["question"], "province": label.get("province"), "kb": label.get("kb") or kb, "top_k": top_k}
+        state = stages["embed"].invoke(stages["plan"].invoke(state))
+        filters_list = state["filters_list"]
+        contexts = as_contexts(stages["retrieve"].invoke(state)["contexts"])
+        return [(g.name, [c.ref for c in g.results]) for g in contexts], filters_list
+
+    return run_stages, close
+
+
+def evaluate(retrieve: Callable[[Dict[str, Any]], Retrieved], labels: List[Dict[str, Any]]) -> Dict[str, Any]:
+    retrieve(labels[0])  # warm-up (index open, connection pool)
+    latency = LatencyHistogram()
+    scores = []
+    for label in labels:
+        t0 = time.perf_counter()
+        retrieved = retrieve(label)
+        latency.record(time.perf_counter() - t0)
+        scores.append(score_question(label["expected"], retrieved))
+    return aggregate(scores, latency)
+
+
+def format_table(results: Dict[str, Dict[str, Any]], top_k: int) -> str:
+    group_names: List[str] = []
+    for r in results.values():
+        group_names += [g for g in r["recall_by_group"] if g not in group_names]
+    header = ["backend", f"recall@{top_k}", "MRR"] + [f"R@{top_k}[{g}]" for g in group_names] + ["p50 ms", "p95 ms", "p99 ms"]
+    rows = [header]
+    for name, r in results.items():
+        by_group = [f"{r['recall_by_group'][g]:.3f}" if g in r["recall_by_group"] else "-" for g in group_names]
+        rows.append([name, f"{r['recall']:.3f}", f"{r['mrr']:.3f}"] + by_group + [f"{r[k]:.1f}" for k in ("p50_ms", "p95_ms", "p99_ms")])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return "\n".join("  ".join(cell.ljust(w) for cell, w in zip(row, widths)) for row in rows)
+
+
+def check_baseline(results: Dict[str, Dict[str, Any]], baseline: str, max_drop: float) -> List[str]:
+    """Backends whose recall is more than `max_drop` below the baseline's."""
+    base = results[baseline]["recall"]
+    return [
+        f"{name}: recall {r['recall']:.3f} < {baseline} {base:.3f} - {max_drop:.3f}"
+        for name, r in results.items()
+        if name != baseline and r["recall"] < base - max_drop
+    ]
+
+
+def synthetic_labels(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Label `n` chunks of the default KB: question = the chunk's opening sentences
+    (prefixed with its province), expected = that chunk."""
+    from src.data_init.chunker import sentence_spans
+    from src.rag.catalog import get_catalog
+
+    with get_catalog().lease(None) as kb:
+        data = kb.vectorstore.get(include=["documents", "metadatas"])
+    rows = list(zip(data["documents"], data["metadatas"]))
+    rng = random.Random(seed)
+    labels = []
+    for text, md in rng.sample(rows, min(n, len(rows))):
+        spans = sentence_spans(text)[:2]
+        opening = "".join(text[s:e] for s, e in spans) or text[:80]
+        prefix = "" if md.get("kb_type") == "core" else f"{md.get('province')}："
+        labels.append({"question": prefix + opening, "expected": [f"{md.get('source_name')}::{md.get('chunk_id')}"]})
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval recall@k / MRR / latency per backend over labeled questions")
+    parser.add_argument("--labels", default=None, help="JSONL (or JSON list) of {question, expected: [source_name::chunk_id], province?, kb?}")
+    parser.add_argument("--backends", default="chain,simple", help="Comma-separated name[@kb], name in " + ",".join(BACKENDS))
+    parser.add_argument("-k", "--top-k", type=int, default=5)
+    parser.add_argument("--workers", default=None, help="Query worker URLs for the workers backend (default MULTI_SEARCH_WORKERS)")
+    parser.add_argument("--baseline", default=None, help="Backend the others are held to (with --max-recall-drop)")
+    parser.add_argument("--max-recall-drop", type=float, default=0.0)
+    parser.add_argument("--synthetic", type=int, default=0, help="Label N chunks of a synthetic corpus indexed with the mock Ollama")
+    parser.add_argument("--chunks", type=int, default=600, help="Synthetic corpus size")
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=None, help="Write JSON report here")
+    args = parser.parse_args()
+    if not args.labels and not args.synthetic:
+        parser.error("--labels or --synthetic is required")
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if args.baseline and args.baseline not in backends:
+        parser.error(f"--baseline {args.baseline!r} is not in --backends")
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    os.environ.setdefault("MULTI_SEARCH_DEBUG", "0")
+    server, work = None, None
+    try:
+        if args.synthetic:
+            from bench.corpus import generate_corpus
+            from bench.mock_ollama import MockOllamaConfig, MockOllamaServer
+            from src.data_init.initializer import init_vector_db
+
+            server = MockOllamaServer(config=MockOllamaConfig(args.embed_latency_ms, 0.0)).start()
+            work = tempfile.mkdtemp(prefix="ms_eval_")
+            os.environ["OLLAMA_BASE_URL"] = server.base_url
+            os.environ["CHROMA_PERSIST_DIR"] = os.path.join(work, "chroma")
+            generate_corpus(os.path.join(work, "corpus"), chunks=args.chunks, seed=args.seed)
+            init_vector_db(data_dir=os.path.join(work, "corpus"), persist_dir=os.environ["CHROMA_PERSIST_DIR"], reset=True, verbose=False)
+            labels = synthetic_labels(args.synthetic, seed=args.seed)
+        else:
+            labels = load_labels(args.labels)
+        if not labels:
+            parser.error("no labels")
+
+        from src.config import distributed_settings
+
+        workers = [u.strip() for u in args.workers.split(",") if u.strip()] if args.workers else distributed_settings()["workers"]
+        results: Dict[str, Dict[str, Any]] = {}
+        for spec in backends:
+            print(f"[eval] {spec} ...", file=sys.stderr)
+            retrieve, close = make_backend(spec, args.top_k, workers)
+            try:
+                results[spec] = evaluate(retrieve, labels)
+            finally:
+                close()
+    finally:
+        if server is not None:
+            server.stop()
+        if work is not None:
+            shutil.rmtree(work, ignore_errors=True)
+
+    print(format_table(results, args.top_k))
+    failures = check_baseline(results, args.baseline, args.max_recall_drop) if args.baseline else []
+    report = {"params": {k: v for k, v in vars(args).items() if k != "out"}, "results": results, "failures": failures}
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False, indent=2))
+    for line in failures:
+        print(f"[eval] FAIL {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
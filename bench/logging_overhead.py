@@ -0,0 +1,132 @@
+"""Per-request overhead of LCEL file logging: off vs sync vs queued.
+
+Runs a stub chain with the same step names and payload shapes as `build_app_chain`
+(no Chroma/Ollama I/O) so the measured difference is the logging cost alone.
+
+    python -m bench.logging_overhead --requests 300 --chunk-chars 400 -k 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from langchain_core.runnables import RunnableLambda
+
+from src.utils.log import get_lcel_file_callback, setup_run_logging, shutdown_logging
+from src.utils.metrics import LatencyHistogram
+
+
+def _contexts(top_k: int, chunk_chars: int) -> List[Dict]:
+    text = ("政府采购制度改革持续深化，采购人主体责任进一步落实。" * (chunk_chars // 26 + 1))[:chunk_chars]
+    groups = []
+    for name, prov in (("core", "中央"), ("target_region", "四川"), ("other_regions", "河南")):
+        items = [
+            {
+                "text": text,
+                "kb_type": "core" if name == "core" else "regional",
+                "province": prov,
+                "source_name": f"【{prov}】示例文档{i}",
+                "chunk_id": i,
+                "ref": f"【{prov}】示例文档{i}::{i}",
+            }
+            for i in range(top_k)
+        ]
+        groups.append({"name": name, "where": {"province": prov}, "results": items})
+    return groups
+
+
+def _stub_chain(contexts: List[Dict], callbacks: List):
+    def enrich(x):
+        return {**x, "province": "四川"}
+
+    def filters(x):
+        return {**x, "filters_list": [{"name": g["name"], "where": g["where"]} for g in contexts]}
+
+    def multi_query(x):
+        return {"question": x["question"], "province": x["province"], "contexts": contexts}
+
+    def summarize(x):
+        return {"question": x["question"], "summary": "### 总结\n...", "references": []}
+
+    steps = [
+        RunnableLambda(fn).with_config(run_name=name, tags=["pipeline"], callbacks=callbacks)
+        for fn, name in (
+            (enrich, "EnrichInput"),
+            (filters, "BuildFilters"),
+            (multi_query, "RunMultiQuery"),
+            (summarize, "SummarizeAndRefs"),
+        )
+    ]
+    chain = steps[0] | steps[1] | steps[2] | steps[3]
+    return chain.with_config(run_name="AppChain", tags=["app"], callbacks=callbacks)
+
+
+def _run(mode: str, contexts: List[Dict], requests: int, queued: Optional[bool]) -> Dict:
+    callbacks = []
+    if mode != "off":
+        setup_run_logging(label=f"bench_{mode}", debug=True, run_type="q", queued=queued)
+        callbacks = [get_lcel_file_callback(preview_limit=1000)]
+    chain = _stub_chain(contexts, callbacks)
+    payload = {"question": "四川在提高政府采购效率有哪些措施？", "top_k": 3}
+    for _ in range(min(20, requests)):
+        chain.invoke(payload)
+    h = LatencyHistogram()
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        s = time.perf_counter()
+        chain.invoke(payload)
+        h.record(time.perf_counter() - s)
+    wall = time.perf_counter() - t0
+    # Time for the background writer to drain is reported separately
+    d0 = time.perf_counter()
+    shutdown_logging()
+    drain = time.perf_counter() - d0
+    snap = h.snapshot()
+    return {
+        "mode": mode,
+        "requests": requests,
+        "wall_s": wall,
+        "drain_s": drain,
+        "mean_ms": snap["mean"] * 1000,
+        "p50_ms": snap["p50"] * 1000,
+        "p95_ms": snap["p95"] * 1000,
+        "p99_ms": snap["p99"] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LCEL logging overhead per request")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("-k", "--top-k", type=int, default=3)
+    parser.add_argument("--chunk-chars", type=int, default=400)
+    parser.add_argument("--out", default=None, help="Write JSON report to this path")
+    args = parser.parse_args()
+
+    contexts = _contexts(args.top_k, args.chunk_chars)
+    results = [
+        _run("off", contexts, args.requests, None),
+        _run("sync", contexts, args.requests, False),
+        _run("queue", contexts, args.requests, True),
+    ]
+    base = results[0]["mean_ms"]
+    for r in results:
+        r["overhead_ms"] = r["mean_ms"] - base
+    report = {"benchmark": "logging_overhead", "results": results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
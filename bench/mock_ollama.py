@@ -0,0 +1,290 @@
+"""Deterministic local stand-in for the Ollama HTTP API.
+
+Implements the endpoints used by `langchain_ollama` and the `ollama` client:
+`/api/embed`, `/api/embeddings`, `/api/generate` (streaming and non-streaming),
+`/api/tags`, `/api/version`. Embeddings are hashed character bigrams (stable across
+processes and runs), so retrieval over a mock-embedded index is meaningful and
+reproducible. Generation answers the summary prompt with valid JSON that cites refs
+found in the prompt. Latency is configurable per endpoint.
+
+    python -m bench.mock_ollama --port 11435 --embed-latency-ms 5 --generate-latency-ms 300
+"""
+import argparse
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+_GROUP_HEADER = re.compile(r"^=== 组(\d+): (\S+) ===$")
+_CTX_LINE = re.compile(r"^\[(\d+)\] \([^)]*\) (.+::\S+)$")
+_GROUP_KEYS = {"核心组": "core", "目标地域组": "target", "其他组": "others"}
+
+
+def embed_text(text: str, dim: int = 256) -> List[float]:
+    """Deterministic bag-of-bigrams embedding, L2-normalized."""
+    vec = [0.0] * dim
+    s = text or " "
+    grams = [s[i : i + 2] for i in range(max(1, len(s) - 1))]
+    for g in grams:
+        h = zlib.crc32(g.encode("utf-8"))
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _first_sentence(text: str, limit: int = 60) -> str:
+    s = (text or "").strip().split("。")[0].strip()
+    return s[:limit] if s else (text or "")[:limit].strip()
+
+
+def answer_prompt(prompt: str) -> str:
+    """Build a deterministic JSON answer for a summary, map-step or reduce-step prompt."""
+    groups: Dict[str, List[Dict[str, str]]] = {"core": [], "target": [], "others": []}
+    current: Optional[str] = None
+    pending_ref: Optional[str] = None
+    for line in prompt.splitlines():
+        m = _GROUP_HEADER.match(line.strip())
+        if m:
+            current = _GROUP_KEYS.get(m.group(2), "others")
+            pending_ref = None
+            continue
+        m = _CTX_LINE.match(line.strip())
+        if m and current:
+            pending_ref = m.group(2)
+            continue
+        if pending_ref and current and line.strip():
+            groups[current].append({"text": _first_sentence(line), "ref": pending_ref})
+            pending_ref = None
+    first = next((items[0]["text"] for items in groups.values() if items), "")
+    if '"points"' in prompt:
+        # Map-step prompt (one group): {"points": [...]}
+        obj = {"points": [it for items in groups.values() for it in items]}
+    elif "各组要点" in prompt:
+        # Reduce-step prompt: "- text" lines under group headers
+        tail = prompt.split("各组要点：", 1)[-1]
+        texts = [ln.strip()[2:] for ln in tail.splitlines() if ln.strip().startswith("- ")]
+        obj = {"summary": f"根据检索结果：{texts[0]}" if texts else "未检索到相关内容"}
+    else:
+        obj = {"summary": f"根据检索结果：{first}" if first else "未检索到相关内容", **groups}
+    return json.dumps(obj, ensure_ascii=False)
+
+
+class MockOllamaConfig:
+    def __init__(
+        self,
+        embed_latency_ms: float = 0.0,
+        generate_latency_ms: float = 0.0,
+        prefill_us_per_char: float = 0.0,
+        dim: int = 256,
+        stream_chunk_chars: int = 64,
+    ) -> None:
+        self.embed_latency_ms = embed_latency_ms
+        self.generate_latency_ms = generate_latency_ms
+        self.prefill_us_per_char = prefill_us_per_char
+        self.dim = dim
+        self.stream_chunk_chars = stream_chunk_chars
+
+
+class MockOllamaStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.embedded_texts = 0
+        self.prompt_chars = 0
+
+    def hit(self, path: str, texts: int = 0, prompt_chars: int = 0) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.embedded_texts += texts
+            self.prompt_chars += prompt_chars
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "embedded_texts": self.embedded_texts,
+                "prompt_chars": self.prompt_chars,
+            }
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockOllama/0.1"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # quiet
+        pass
+
+    @property
+    def cfg(self) -> MockOllamaConfig:
+        return self.server.cfg  # type: ignore[attr-defined]
+
+    @property
+    def stats(self) -> MockOllamaStats:
+        return self.server.stats  # type: ignore[attr-defined]
+
+    def _send_json(self, obj, status: int = 200) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b"{}"
+        try:
+            return json.loads(raw.decode("utf-8") or "{}")
+        except Exception:
+            return {}
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        self.stats.hit(path)
+        if path == "/api/tags":
+            self._send_json({"models": [{"name": "bge-m3:latest", "model": "bge-m3:latest"}, {"name": "qwen3:0.6b", "model": "qwen3:0.6b"}]})
+        elif path == "/api/version":
+            self._send_json({"version": "0.0.0-mock"})
+        elif path == "/api/ps":
+            self._send_json({"models": []})
+        elif path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        req = self._read_json()
+        if path == "/api/embed":
+            inp = req.get("input", "")
+            texts = [inp] if isinstance(inp, str) else list(inp)
+            self.stats.hit(path, texts=len(texts))
+            self._sleep_ms(self.cfg.embed_latency_ms)
+            self._send_json({"model": req.get("model"), "embeddings": [embed_text(t, self.cfg.dim) for t in texts]})
+        elif path == "/api/embeddings":
+            self.stats.hit(path, texts=1)
+            self._sleep_ms(self.cfg.embed_latency_ms)
+            self._send_json({"embedding": embed_text(req.get("prompt", ""), self.cfg.dim)})
+        elif path == "/api/generate":
+            prompt = req.get("prompt") or ""
+            self.stats.hit(path, prompt_chars=len(prompt))
+            self._generate(req, prompt)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _sleep_ms(self, ms: float) -> None:
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def _generate(self, req: Dict, prompt: str) -> None:
+        # An empty prompt is Ollama's "load the model" request (used for warm-up)
+        text = answer_prompt(prompt) if prompt else ""
+        self._sleep_ms(self.cfg.generate_latency_ms + len(prompt) * self.cfg.prefill_us_per_char / 1000.0)
+        model = req.get("model")
+        final = {
+            "model": model,
+            "created_at": _now(),
+            "response": "",
+            "done": True,
+            "done_reason": "stop" if prompt else "load",
+            "prompt_eval_count": len(prompt),
+            "eval_count": len(text),
+        }
+        if not req.get("stream", True):
+            self._send_json({**final, "response": text})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = max(1, self.cfg.stream_chunk_chars)
+        for i in range(0, len(text), step):
+            self._write_chunk({"model": model, "created_at": _now(), "response": text[i : i + step], "done": False})
+        self._write_chunk(final)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, obj: Dict) -> None:
+        data = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class MockOllamaServer:
+    """Threaded mock server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[MockOllamaConfig] = None) -> None:
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.cfg = config or MockOllamaConfig()  # type: ignore[attr-defined]
+        self.httpd.stats = MockOllamaStats()  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.httpd.server_address[:2]  # type: ignore[return-value]
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> MockOllamaStats:
+        return self.httpd.stats  # type: ignore[attr-defined]
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a deterministic mock Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--generate-latency-ms", type=float, default=0.0)
+    parser.add_argument("--prefill-us-per-char", type=float, default=0.0, help="Extra generate latency per prompt char")
+    parser.add_argument("--dim", type=int, default=256)
+    args = parser.parse_args()
+    cfg = MockOllamaConfig(args.embed_latency_ms, args.generate_latency_ms, args.prefill_us_per_char, args.dim)
+    server = MockOllamaServer(args.host, args.port, cfg)
+    print(f"Mock Ollama listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
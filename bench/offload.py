@@ -0,0 +1,146 @@
+"""CPU offload under concurrency: summary stages inline vs in the process pool.
+
+`--concurrency` client threads (64 by default) each run `summarize(...)` on synthetic
+grouped contexts, so every request waits on the (mock) LLM and then parses and renders
+its answer, or scores sentences in extractive mode. A probe thread sleeps 1ms in a loop
+and records how late it wakes up: that lateness is the GIL contention an I/O thread of
+the server would see. The mock Ollama runs in its own process so it does not compete
+for this process's GIL.
+
+    python -m bench.offload --concurrency 64 --requests 512 --processes 0,4 --modes single,extractive
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.summary_modes import _contexts
+from src.utils.metrics import LatencyHistogram
+
+
+def _start_mock(generate_latency_ms: float):
+    proc = subprocess.Popen(
+        [sys.executable, "-u", "-m", "bench.mock_ollama", "--port", "0", "--generate-latency-ms", str(generate_latency_ms)],
+        cwd=str(ROOT),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stdout.readline()
+    if "listening on" not in line:
+        proc.kill()
+        raise RuntimeError(f"mock Ollama did not start: {line!r}")
+    return proc, line.rsplit(" ", 1)[-1].strip()
+
+
+class _Probe:
+    """Wakes every 1ms and records the oversleep (scheduling + GIL wait)."""
+
+    def __init__(self) -> None:
+        self.lag = LatencyHistogram()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            time.sleep(0.001)
+            self.lag.record(max(0.0, time.perf_counter() - t0 - 0.001))
+
+    def __enter__(self) -> "_Probe":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _measure(mode: str, contexts: List[Dict], requests: int, concurrency: int) -> Dict:
+    from src.pipeline.summary import summarize
+
+    h = LatencyHistogram()
+
+    def one(_i: int) -> None:
+        s = time.perf_counter()
+        summarize(contexts, "四川在提高政府采购效率有哪些措施？", province="四川", mode=mode)
+        h.record(time.perf_counter() - s)
+
+    with _Probe() as probe, ThreadPoolExecutor(max_workers=concurrency) as ex:
+        t0 = time.perf_counter()
+        list(ex.map(one, range(requests)))
+        wall = time.perf_counter() - t0
+    snap, lag = h.snapshot(), probe.lag.snapshot()
+    return {
+        "p50_ms": snap["p50"] * 1000,
+        "p95_ms": snap["p95"] * 1000,
+        "p99_ms": snap["p99"] * 1000,
+        "throughput_per_s": requests / wall if wall > 0 else 0.0,
+        "probe_lag_p50_ms": lag["p50"] * 1000,
+        "probe_lag_p99_ms": lag["p99"] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summary CPU stages inline vs process-pool offload at high concurrency")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--processes", default="0,4", help="Comma-separated pool sizes (0 = inline)")
+    parser.add_argument("--modes", default="single,extractive")
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--groups", type=int, default=3)
+    parser.add_argument("--chunk-chars", type=int, default=1200)
+    parser.add_argument("--generate-latency-ms", type=float, default=50.0)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    mock, base_url = _start_mock(args.generate_latency_ms)
+    os.environ["OLLAMA_BASE_URL"] = base_url
+    os.environ["OLLAMA_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["MULTI_SEARCH_LLM_CACHE"] = "off"
+    os.environ["MULTI_SEARCH_DEBUG"] = "0"
+    os.environ["MULTI_SEARCH_CPU_OFFLOAD_MIN_CHARS"] = "0"
+    contexts = _contexts(args.groups, args.top_k, args.chunk_chars)
+
+    from src.service.offload import get_offload, reset_offload
+
+    rows = []
+    try:
+        for processes in [int(x) for x in args.processes.split(",") if x.strip()]:
+            os.environ["MULTI_SEARCH_CPU_OFFLOAD"] = str(processes)
+            offload = get_offload()
+            if offload is not None:
+                offload.warm()
+            for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+                _measure(mode, contexts, min(args.requests, args.concurrency), args.concurrency)  # warm-up
+                row = {"processes": processes, "mode": mode, **_measure(mode, contexts, args.requests, args.concurrency)}
+                rows.append(row)
+                print(
+                    f"processes={processes:<2} {mode:<10} p50={row['p50_ms']:8.1f}ms p99={row['p99_ms']:8.1f}ms "
+                    f"{row['throughput_per_s']:7.1f}/s  probe lag p99={row['probe_lag_p99_ms']:6.2f}ms",
+                    file=sys.stderr,
+                )
+            reset_offload()
+    finally:
+        mock.terminate()
+        mock.wait(timeout=10)
+
+    text = json.dumps({"params": vars(args), "results": rows}, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""End-to-end benchmark suite against the local mock Ollama.
+
+Scenarios:
+- ingest:     generate a synthetic corpus and run `init_vector_db` into a fresh dir
+- simple:     sequential `simple_query` calls
+- single:     sequential `build_app_chain().invoke` calls
+- batch:      `build_app_chain().batch` over the question set
+- concurrent: N client threads issuing `invoke` calls
+- scheduled:  N client threads through `QueryScheduler` (admission control, degradation)
+
+The report is JSON (commit, parameters, per-scenario latency percentiles and
+throughput) so runs can be diffed across commits with `--compare`.
+
+    python -m bench.run --chunks 300 --queries 20 --concurrency 8 --out output/bench/report.json
+    python -m bench.run --skip-ingest --persist-dir /tmp/bench_chroma --compare output/bench/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.corpus import generate_corpus, sample_questions
+from bench.mock_ollama import MockOllamaConfig, MockOllamaServer
+from src.utils.metrics import LatencyHistogram
+
+SCENARIOS = ("ingest", "simple", "single", "batch", "concurrent", "scheduled")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _summarize(h: LatencyHistogram, wall: float) -> Dict:
+    snap = h.snapshot()
+    return {
+        "count": snap["count"],
+        "wall_s": wall,
+        "throughput_per_s": (snap["count"] / wall) if wall > 0 else 0.0,
+        "mean_ms": snap["mean"] * 1000,
+        "p50_ms": snap["p50"] * 1000,
+        "p95_ms": snap["p95"] * 1000,
+        "p99_ms": snap["p99"] * 1000,
+        "max_ms": snap["max"] * 1000,
+    }
+
+
+def _timed_calls(fn: Callable[[str], object], questions: List[str]) -> Dict:
+    h = LatencyHistogram()
+    t0 = time.perf_counter()
+    for q in questions:
+        s = time.perf_counter()
+        fn(q)
+        h.record(time.perf_counter() - s)
+    return _summarize(h, time.perf_counter() - t0)
+
+
+def scenario_ingest(args, persist_dir: str) -> Dict:
+    from src.data_init.initializer import init_vector_db
+
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="ms_bench_corpus_")
+    t0 = time.perf_counter()
+    manifest = generate_corpus(corpus_dir, chunks=args.chunks, chunks_per_file=args.chunks_per_file, seed=args.seed)
+    gen_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    summary = init_vector_db(data_dir=corpus_dir, persist_dir=persist_dir, reset=True)
+    wall = time.perf_counter() - t0
+    if not args.corpus_dir and not args.keep:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+    total = summary.get("total_chunks", 0)
+    return {
+        "corpus": manifest,
+        "generate_s": gen_s,
+        "wall_s": wall,
+        "total_chunks": total,
+        "chunks_per_s": (total / wall) if wall > 0 else 0.0,
+    }
+
+
+def scenario_simple(args, questions: List[str]) -> Dict:
+    from src.rag.simple import simple_query
+
+    return _timed_calls(lambda q: simple_query(q, top_k=args.top_k), questions)
+
+
+def scenario_single(args, questions: List[str]) -> Dict:
+    from src.pipeline.chain import build_app_chain
+
+    chain = build_app_chain()
+    return _timed_calls(lambda q: chain.invoke({"question": q, "top_k": args.top_k}), questions)
+
+
+def scenario_batch(args, questions: List[str]) -> Dict:
+    from src.pipeline.chain import build_app_chain
+
+    chain = build_app_chain()
+    t0 = time.perf_counter()
+    chain.batch([{"question": q, "top_k": args.top_k} for q in questions], config={"max_concurrency": args.concurrency})
+    wall = time.perf_counter() - t0
+    return {"count": len(questions), "wall_s": wall, "throughput_per_s": (len(questions) / wall) if wall > 0 else 0.0}
+
+
+def scenario_concurrent(args, questions: List[str]) -> Dict:
+    from src.pipeline.chain import build_app_chain
+
+    chain = build_app_chain()
+    h = LatencyHistogram()
+    errors = 0
+
+    def one(q: str) -> Optional[float]:
+        s = time.perf_counter()
+        chain.invoke({"question": q, "top_k": args.top_k})
+        return time.perf_counter() - s
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        futures = [ex.submit(one, q) for q in questions * max(1, args.rounds)]
+        for fut in futures:
+            try:
+                h.record(fut.result())
+            except Exception:
+                errors += 1
+    out = _summarize(h, time.perf_counter() - t0)
+    out["concurrency"] = args.concurrency
+    out["errors"] = errors
+    return out
+
+
+def scenario_scheduled(args, questions: List[str]) -> Dict:
+    from collections import Counter
+
+    from src.service.scheduler import QueryRejected, QueryScheduler
+
+    scheduler = QueryScheduler(deadline_s=args.deadline_s)
+    h = LatencyHistogram()
+    tiers: Counter = Counter()
+    rejected: Counter = Counter()
+
+    def one(q: str) -> None:
+        s = time.perf_counter()
+        try:
+            out = scheduler.run(q, top_k=args.top_k)
+        except QueryRejected as e:
+            rejected[f"{e.stage}:{e.reason}"] += 1
+            return
+        h.record(time.perf_counter() - s)
+        tiers[out["tier"]] += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        list(ex.map(one, questions * max(1, args.rounds)))
+    out = _summarize(h, time.perf_counter() - t0)
+    out.update({"concurrency": args.concurrency, "deadline_s": args.deadline_s, "tiers": dict(tiers), "rejected": dict(rejected)})
+    return out
+
+
+def compare_reports(current: Dict, base: Dict) -> List[str]:
+    """Return human-readable deltas for the headline metric of each scenario."""
+    keys = {"ingest": "chunks_per_s", "batch": "throughput_per_s"}
+    lines: List[str] = [f"compare {base.get('meta', {}).get('commit')} -> {current.get('meta', {}).get('commit')}"]
+    for name, cur in current.get("scenarios", {}).items():
+        old = base.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        key = keys.get(name, "p95_ms")
+        a, b = old.get(key), cur.get(key)
+        if not a or b is None:
+            continue
+        lines.append(f"{name:<11} {key:<16} {a:>10.2f} -> {b:>10.2f} ({(b - a) / a * 100:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks with a mock Ollama")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ",".join(SCENARIOS))
+    parser.add_argument("--chunks", type=int, default=300, help="Synthetic corpus size (chunks) for ingest")
+    parser.add_argument("--chunks-per-file", type=int, default=50)
+    parser.add_argument("--corpus-dir", default=None, help="Write/keep the corpus here instead of a temp dir")
+    parser.add_argument("--persist-dir", default=None, help="Chroma dir (default: temp dir)")
+    parser.add_argument("--skip-ingest", action="store_true", help="Query an existing --persist-dir")
+    parser.add_argument("--keep", action="store_true", help="Keep temp corpus/index directories")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("-k", "--top-k", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=1, help="Repeat the question set in the concurrent/scheduled scenarios")
+    parser.add_argument("--deadline-s", type=float, default=5.0, help="Per-request deadline in the scheduled scenario")
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--generate-latency-ms", type=float, default=200.0)
+    parser.add_argument("--prefill-us-per-char", type=float, default=0.0)
+    parser.add_argument("--ollama-url", default=None, help="Use a running Ollama (or mock) instead of the built-in mock")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the persistent LLM summary cache enabled (default off)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="Write JSON report here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to diff against")
+    args = parser.parse_args()
+
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in selected if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {unknown}")
+    if args.skip_ingest:
+        if not args.persist_dir:
+            parser.error("--skip-ingest requires --persist-dir")
+        selected = [s for s in selected if s != "ingest"]
+
+    persist_dir = args.persist_dir or tempfile.mkdtemp(prefix="ms_bench_chroma_")
+    server = None
+    if args.ollama_url:
+        base_url = args.ollama_url
+    else:
+        cfg = MockOllamaConfig(args.embed_latency_ms, args.generate_latency_ms, args.prefill_us_per_char)
+        server = MockOllamaServer(config=cfg).start()
+        base_url = server.base_url
+    os.environ["OLLAMA_BASE_URL"] = base_url
+    os.environ["CHROMA_PERSIST_DIR"] = persist_dir
+    os.environ.setdefault("MULTI_SEARCH_DEBUG", "0")
+    if not args.llm_cache:
+        os.environ["MULTI_SEARCH_LLM_CACHE"] = "off"
+
+    questions = sample_questions(args.queries, seed=args.seed)
+    scenarios: Dict[str, Dict] = {}
+    try:
+        for name in selected:
+            print(f"[bench] {name} ...", file=sys.stderr)
+            if name == "ingest":
+                scenarios[name] = scenario_ingest(args, persist_dir)
+            elif name == "simple":
+                scenarios[name] = scenario_simple(args, questions)
+            elif name == "single":
+                scenarios[name] = scenario_single(args, questions)
+            elif name == "batch":
+                scenarios[name] = scenario_batch(args, questions)
+            elif name == "concurrent":
+                scenarios[name] = scenario_concurrent(args, questions)
+            elif name == "scheduled":
+                scenarios[name] = scenario_scheduled(args, questions)
+    finally:
+        if server is not None:
+            scenarios_mock = server.stats.snapshot()
+            server.stop()
+        else:
+            scenarios_mock = None
+        if not args.persist_dir and not args.keep:
+            shutil.rmtree(persist_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+            "ollama": "mock" if server is not None else base_url,
+            "mock_stats": scenarios_mock,
+        },
+        "scenarios": scenarios,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        print("\n".join(compare_reports(report, base)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Summarization latency: single prompt vs map-reduce vs extractive, against the mock Ollama.
+
+Contexts are synthesized (no Chroma), so the measured time is prompt building, the
+LLM round trips and repair/rendering. The mock charges `--prefill-us-per-char` on
+top of `--generate-latency-ms`, which models prefill growing with prompt length;
+map-reduce trades one long prompt for concurrent short ones plus a reduce call.
+
+    python -m bench.summary_modes --top-k 3,8,16 --groups 3 --requests 20 --prefill-us-per-char 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from bench.mock_ollama import MockOllamaConfig, MockOllamaServer
+from src.utils.metrics import LatencyHistogram
+
+_PROVINCES = ("中央", "四川", "河南", "广东", "浙江", "江苏")
+
+
+def _contexts(groups: int, top_k: int, chunk_chars: int) -> List[Dict]:
+    text = ("政府采购制度改革持续深化，采购人主体责任进一步落实。远程异地评标加快推广，提升采购效率。" * (chunk_chars // 44 + 1))[:chunk_chars]
+    names = ["core", "target_region"] + [f"other_regions_{i}" for i in range(max(0, groups - 2))]
+    out = []
+    for gi, name in enumerate(names[:groups]):
+        prov = _PROVINCES[gi % len(_PROVINCES)]
+        items = [
+            {
+                "text": text,
+                "kb_type": "core" if name == "core" else "regional",
+                "province": prov,
+                "source_name": f"【{prov}】示例文档{i}",
+                "chunk_id": i,
+                "ref": f"【{prov}】示例文档{i}::{i}",
+            }
+            for i in range(top_k)
+        ]
+        out.append({"name": name, "where": {"province": prov}, "results": items})
+    return out
+
+
+def _measure(mode: str, contexts: List[Dict], requests: int) -> Dict:
+    from src.pipeline.summary import summarize
+
+    h = LatencyHistogram()
+    for _ in range(requests):
+        s = time.perf_counter()
+        summarize(contexts, "四川在提高政府采购效率有哪些措施？", province="四川", mode=mode)
+        h.record(time.perf_counter() - s)
+    snap = h.snapshot()
+    return {"mean_ms": snap["mean"] * 1000, "p50_ms": snap["p50"] * 1000, "p95_ms": snap["p95"] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-prompt vs map-reduce vs extractive summarization latency")
+    parser.add_argument("--top-k", default="3,8,16", help="Comma-separated top_k values")
+    parser.add_argument("--groups", type=int, default=3)
+    parser.add_argument("--chunk-chars", type=int, default=400)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--generate-latency-ms", type=float, default=50.0)
+    parser.add_argument("--prefill-us-per-char", type=float, default=100.0)
+    parser.add_argument("--ollama-url", default=None, help="Use a running Ollama instead of the mock")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    server = None
+    if args.ollama_url:
+        os.environ["OLLAMA_BASE_URL"] = args.ollama_url
+    else:
+        cfg = MockOllamaConfig(generate_latency_ms=args.generate_latency_ms, prefill_us_per_char=args.prefill_us_per_char)
+        server = MockOllamaServer(config=cfg).start()
+        os.environ["OLLAMA_BASE_URL"] = server.base_url
+    os.environ["MULTI_SEARCH_LLM_CACHE"] = "off"
+    os.environ.setdefault("MULTI_SEARCH_DEBUG", "0")
+
+    rows = []
+    try:
+        for k in [int(x) for x in args.top_k.split(",") if x.strip()]:
+            contexts = _contexts(args.groups, k, args.chunk_chars)
+            row = {"top_k": k, "groups": args.groups}
+            for mode in ("single", "map_reduce", "extractive"):
+                row[mode] = _measure(mode, contexts, args.requests)
+            row["speedup_p50"] = row["single"]["p50_ms"] / max(1e-9, row["map_reduce"]["p50_ms"])
+            rows.append(row)
+            print(
+                f"top_k={k:<3} single p50={row['single']['p50_ms']:8.1f}ms  "
+                f"map_reduce p50={row['map_reduce']['p50_ms']:8.1f}ms  x{row['speedup_p50']:.2f}  "
+                f"extractive p50={row['extractive']['p50_ms']:6.1f}ms",
+                file=sys.stderr,
+            )
+    finally:
+        if server is not None:
+            server.stop()
+
+    text = json.dumps({"params": vars(args), "results": rows}, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
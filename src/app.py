@@ -15,12 +15,10 @@ except Exception:
 
 import langchain  # unified LCEL debug switch
 from src.config import debug_enabled
-from src.utils.log import setup_run_logging, log_info
-from src.utils.log import get_lcel_file_callback
 
-from src.data_init.initializer import init_vector_db
-from src.pipeline.chain import build_app_chain
-from src.pipeline.format import build_markdown, MarkdownDoc, ReferenceGroup
+# Heavy dependencies (chromadb, langchain_ollama, pydantic models, the pipeline) are
+# imported inside the code path that needs them, so `--help` and `--init` do not pay
+# for the query stack and queries do not pay for the ingestion stack.
 
 
 def main():
@@ -36,17 +34,26 @@ def main():
     parser.add_argument("--out", default="output/result.md", help="输出Markdown路径")
     parser.add_argument("-k", "--top-k", type=int, default=3, help="每组Top-k")
     parser.add_argument("--province", default=None, help="覆盖从问题中识别的省份")
+    parser.add_argument("--kb", default=None, help="知识库名称（见 MULTI_SEARCH_KB_CATALOG，默认目录中的默认库）")
+    parser.add_argument("--summary-mode", choices=["single", "map_reduce", "extractive", "retrieval"], default=None, help="汇总模式：single 单提示 / map_reduce 按组并发再合并 / extractive 抽取式不调用LLM / retrieval 仅列检索要点（默认读 MULTI_SEARCH_SUMMARY_MODE）")
+    parser.add_argument("--profile-rate", type=float, default=None, help="按比例对查询采样性能剖析（0-1，写入 output/log）")
+    parser.add_argument("--workers", default=None, help="查询节点地址（逗号分隔，默认读 MULTI_SEARCH_WORKERS）；设置后检索与汇总分发到各节点")
+    parser.add_argument("--warmup", action="store_true", help="预热：预加载 Ollama 模型（keep_alive）、读入索引文件并按每个分区计划执行一次合成查询；未提供 --q 时预热后退出")
+    parser.add_argument("--metrics-out", default=None, help="导出分阶段耗时直方图（.prom 为 Prometheus 文本，否则 JSON）")
     # Init mode
     parser.add_argument("--init", action="store_true", help="执行数据初始化并退出")
     parser.add_argument("--data-dir", default=None, help="数据目录路径（默认 data/）")
     parser.add_argument("--persist-dir", default=None, help="Chroma 持久化目录")
     parser.add_argument("--reset", action="store_true", help="初始化前重置集合")
+    parser.add_argument("--in-place", action="store_true", help="直接改写在线集合，不构建新的索引版本")
     parser.add_argument("--verbose", action="store_true", help="在日志中输出详细信息")
     args = parser.parse_args()
 
+    from src.utils.log import setup_run_logging, log_info
+
     # Setup per-run logging file: type_time (type: q | init_data)
     run_type = "init_data" if args.init else "q"
-    label = args.q if args.q else ("init_data" if args.init else "run")
+    label = args.q if args.q else ("init_data" if args.init else ("warmup" if args.warmup else "run"))
     log_file = setup_run_logging(label=label, debug=langchain.debug, run_type=run_type)
     print(f"日志文件：{log_file}")
 
@@ -57,24 +64,58 @@ def main():
             verbose=bool(args.verbose),
             data_dir=args.data_dir,
             persist_dir=args.persist_dir,
+            kb=args.kb,
+            staged=not args.in_place,
         )
         log_info(f"Init summary: {summary}")
         print(f"数据初始化完成，详情见日志：{log_file}")
         return
 
     # Enforce --q when not running init
-    if not args.q:
-        parser.error("必须提供 --q 查询参数，或使用 --init 进行数据初始化")
+    if not args.q and not args.warmup:
+        parser.error("必须提供 --q 查询参数，或使用 --init 进行数据初始化、--warmup 进行预热")
+
+    from src.config import distributed_settings
+
+    workers = [u.strip() for u in args.workers.split(",") if u.strip()] if args.workers else distributed_settings()["workers"]
+    if args.warmup:
+        from src.service.warmup import warm_up
 
-    log_info(f"App start | q='{args.q}' | out='{args.out}' | top_k={args.top_k} | province={args.province}")
+        # Distributed: the index lives on the query workers (they warm themselves with
+        # --warmup); the coordinator only embeds locally
+        report = warm_up(kbs=[args.kb] if args.kb else None, index=not workers)
+        log_info(f"Warm-up report: {report}")
+        print(f"预热完成：{report['seconds']:.2f}s，错误 {len(report['errors'])} 项")
+        for err in report["errors"]:
+            print(f"  - {err}")
+        if not args.q:
+            # Deploy hook: a failed warm-up must not report success
+            raise SystemExit(1 if report["errors"] else 0)
+
+    from src.utils.log import get_lcel_file_callback
+    from src.utils.metrics import get_metrics_callback, get_metrics_registry, stage_timer
+    from src.pipeline.chain import build_app_chain
+    from src.pipeline.format import build_markdown, MarkdownDoc, ReferenceGroup
+
+    log_info(f"App start | q='{args.q}' | out='{args.out}' | top_k={args.top_k} | province={args.province} | kb={args.kb}")
 
     # Attach LCEL file callback to capture inputs/outputs of each step
     lc_cb = get_lcel_file_callback(preview_limit=1000)
-    chain = build_app_chain(callbacks=[lc_cb])
+    callbacks = [lc_cb]
+    if args.metrics_out:
+        callbacks.append(get_metrics_callback())
+    if workers:
+        from src.service.coordinator import Coordinator
+
+        chain = Coordinator(workers).build_chain(callbacks=callbacks, profile_rate=args.profile_rate)
+    else:
+        chain = build_app_chain(callbacks=callbacks, profile_rate=args.profile_rate)
     result = chain.invoke({
         "question": args.q,
         "top_k": args.top_k,
         "province": args.province,
+        "kb": args.kb,
+        "summary_mode": args.summary_mode,
     })
 
     # Construct strong typed MarkdownDoc
@@ -82,17 +123,28 @@ def main():
         ReferenceGroup(name=g.get("name"), items=g.get("items", []))
         for g in result.get("references", [])
     ]
+    answer = result.get("summary", "")
+    if result.get("partial"):
+        # Distributed: some query workers were down, the answer covers the other shards only
+        note = "> 注意：部分查询节点不可用，本回答仅基于其余分片的检索结果。"
+        answer = f"{note}\n\n{answer}"
+        print(note.lstrip("> "))
+        log_info("App partial answer | some query workers were unavailable")
     doc = MarkdownDoc(
         question=result.get("question", args.q),
-        answer_markdown=result.get("summary", ""),
+        answer_markdown=answer,
         references=references,
     )
 
-    content = build_markdown(doc)
+    with stage_timer("markdown"):
+        content = build_markdown(doc)
     os.makedirs(os.path.dirname(args.out), exist_ok=True)
     with open(args.out, "w", encoding="utf-8") as f:
         f.write(content)
     print(f"已生成Markdown：{args.out}")
+    if args.metrics_out:
+        get_metrics_registry().export(args.metrics_out)
+        print(f"耗时指标：{args.metrics_out}")
     print(f"日志文件：{log_file}")
     log_info(f"App end | written='{args.out}' | log='{log_file}'")
 
@@ -102,18 +154,26 @@ def init_data(
     verbose: bool = True,
     data_dir: Optional[str] = None,
     persist_dir: Optional[str] = None,
+    kb: Optional[str] = None,
+    staged: Optional[bool] = None,
 ) -> Dict:
     """Initialize Chroma vector DB from data directory.
 
     - Defaults to verbose output enabled.
     - Honors .env configuration for CHROMA_PERSIST_DIR.
+    - `kb` selects a knowledge base from the KB catalog.
+    - `staged` builds a new index generation and activates it (see init_vector_db).
     - Optional overrides via parameters.
     """
+    from src.data_init.initializer import init_vector_db
+
     # Ensure environment is loaded when used programmatically
     load_dotenv()
     return init_vector_db(
         data_dir=data_dir,
         persist_dir=persist_dir,
+        kb=kb,
+        staged=staged,
         reset=reset,
         verbose=verbose,
     )
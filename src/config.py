@@ -1,4 +1,6 @@
 import os
+from typing import Dict, Optional
+
 from dotenv import load_dotenv
 
 
@@ -9,10 +11,139 @@ DATA_DIR = os.path.join(os.path.dirname(PROJECT_ROOT), "data")
 
 CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", os.path.join(os.path.dirname(PROJECT_ROOT), ".chroma"))
 
+
+def _env_float(name: str, default: float) -> float:
+    """Numeric env setting; unset or unparsable values fall back to `default`."""
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
 # Unified debug flag controlled via env, default ON
 # MULTI_SEARCH_DEBUG accepts: 1/true/yes/on (case-insensitive) to enable
 # Any other value disables structured LCEL debug logs
 
 def debug_enabled() -> bool:
     v = os.getenv("MULTI_SEARCH_DEBUG", "1")
-    return str(v).lower() in ("1", "true", "yes", "on")
\ No newline at end of file
+    return str(v).lower() in ("1", "true", "yes", "on")
+
+
+# Logging mode: "sync" (default) writes from the calling thread; "queue" hands records
+# to a single background writer (QueueHandler/QueueListener) for long-running services
+
+def log_mode() -> str:
+    v = str(os.getenv("MULTI_SEARCH_LOG_MODE", "sync")).lower()
+    return v if v in ("sync", "queue") else "sync"
+
+
+# Sampling profiler: fraction of query runs to profile (0 disables) and output format
+# MULTI_SEARCH_PROFILE_RATE: float in [0, 1]; MULTI_SEARCH_PROFILE_FORMAT: speedscope | folded
+
+def profile_rate() -> float:
+    return min(1.0, max(0.0, _env_float("MULTI_SEARCH_PROFILE_RATE", 0.0)))
+
+
+def profile_format() -> str:
+    v = str(os.getenv("MULTI_SEARCH_PROFILE_FORMAT", "speedscope")).lower()
+    return v if v in ("speedscope", "folded") else "speedscope"
+
+
+# Summarization mode: "single" (one prompt over all groups, default), "map_reduce"
+# (one concurrent call per group, then a short merge call), "extractive" (no LLM) or
+# "retrieval" (no LLM, lead sentence of each retrieved chunk)
+
+SUMMARY_MODES = ("single", "map_reduce", "extractive", "retrieval")
+LLM_SUMMARY_MODES = ("single", "map_reduce")
+
+
+def summary_mode() -> str:
+    v = str(os.getenv("MULTI_SEARCH_SUMMARY_MODE", "single")).lower()
+    return v if v in SUMMARY_MODES else "single"
+
+
+# Speculative retrieval: while the province is resolved, build_app_chain embeds the
+# question and retrieves the province-independent groups ("core" / "all") up front
+
+def speculative_retrieval() -> bool:
+    v = os.getenv("MULTI_SEARCH_SPECULATIVE_RETRIEVAL", "1")
+    return str(v).lower() in ("1", "true", "yes", "on")
+
+
+# Query scheduler (src/service/scheduler.py): per-stage concurrency caps, queue bound
+# and default request deadline for long-running services
+
+def scheduler_settings() -> Dict:
+    return {
+        "embed_concurrency": int(_env_float("MULTI_SEARCH_EMBED_CONCURRENCY", 4)),
+        "retrieve_concurrency": int(_env_float("MULTI_SEARCH_RETRIEVE_CONCURRENCY", 4)),
+        "summarize_concurrency": int(_env_float("MULTI_SEARCH_SUMMARIZE_CONCURRENCY", 2)),
+        "max_queue": int(_env_float("MULTI_SEARCH_QUEUE_MAX", 32)),
+        "deadline_s": _env_float("MULTI_SEARCH_DEADLINE_S", 30),
+    }
+
+
+# Knowledge-base catalog (src/rag/catalog.py): tenants and their collections, plus the
+# memory budget for collections kept open. Without MULTI_SEARCH_KB_CATALOG there is one
+# KB, "default" (collection knowledge_base under CHROMA_PERSIST_DIR).
+
+def kb_catalog_settings() -> Dict:
+    return {
+        "path": os.getenv("MULTI_SEARCH_KB_CATALOG") or None,
+        "memory_budget_bytes": int(_env_float("MULTI_SEARCH_KB_MEMORY_MB", 2048) * 1024 * 1024),
+        "max_open": int(_env_float("MULTI_SEARCH_KB_MAX_OPEN", 8)),
+        # Resident cost of one chunk: 1024-d float32 vector, HNSW links, metadata
+        "bytes_per_chunk": int(_env_float("MULTI_SEARCH_KB_BYTES_PER_CHUNK", 6144)),
+    }
+
+
+# Distributed query fan-out (src/service/coordinator.py): query worker URLs, request
+# timeout and how often worker shard ownership is re-read
+
+def distributed_settings() -> Dict:
+    raw = os.getenv("MULTI_SEARCH_WORKERS") or ""
+    return {
+        "workers": [u.strip().rstrip("/") for u in raw.split(",") if u.strip()],
+        "timeout_s": _env_float("MULTI_SEARCH_WORKER_TIMEOUT_S", 30),
+        "refresh_s": _env_float("MULTI_SEARCH_WORKER_REFRESH_S", 30),
+    }
+
+
+# CPU offload (src/service/offload.py): process pool for the CPU-bound summary stages
+# (JSON repair/parse, markdown rendering, extractive scoring). 0 processes = run inline.
+# Payloads below min_chars are cheaper to handle inline than to ship to a process.
+
+def cpu_offload_settings() -> Dict:
+    return {
+        "processes": max(0, int(_env_float("MULTI_SEARCH_CPU_OFFLOAD", 0))),
+        "min_chars": int(_env_float("MULTI_SEARCH_CPU_OFFLOAD_MIN_CHARS", 4096)),
+    }
+
+
+# Warm-up (src/service/warmup.py): preload the Ollama models with keep_alive, read the
+# index files into the page cache and run one synthetic query per partition plan before
+# a node reports ready. MULTI_SEARCH_WARMUP=1 warms query workers on start.
+
+def warmup_settings() -> Dict:
+    v = str(os.getenv("MULTI_SEARCH_WARMUP", "0")).lower()
+    return {
+        "enabled": v in ("1", "true", "yes", "on"),
+        "keep_alive": os.getenv("MULTI_SEARCH_WARMUP_KEEP_ALIVE") or os.getenv("OLLAMA_KEEP_ALIVE") or "30m",
+        "question": os.getenv("MULTI_SEARCH_WARMUP_QUESTION") or "政府采购政策措施",
+    }
+
+
+# Persistent cache of parsed LLM summaries, stored as JSON (temperature=0 → deterministic per prompt)
+# MULTI_SEARCH_LLM_CACHE: path of the SQLite file, or 0/off/false/no to disable
+
+def llm_cache_settings() -> Optional[Dict]:
+    v = os.getenv("MULTI_SEARCH_LLM_CACHE", "")
+    if str(v).lower() in ("0", "off", "false", "no"):
+        return None
+    path = v or os.path.join(os.path.dirname(PROJECT_ROOT), ".cache", "llm_summary.sqlite")
+
+    return {
+        "path": path,
+        "max_entries": int(_env_float("MULTI_SEARCH_LLM_CACHE_MAX_ENTRIES", 5000)),
+        "max_bytes": int(_env_float("MULTI_SEARCH_LLM_CACHE_MAX_MB", 64) * 1024 * 1024),
+        "max_age_s": _env_float("MULTI_SEARCH_LLM_CACHE_TTL_H", 168) * 3600,
+    }
@@ -0,0 +1,127 @@
+import hashlib
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Sentence ends at Chinese/ASCII terminal punctuation (plus closing quotes/brackets) or a line break
+_SENTENCE_END = re.compile(r"[。！？；!?;]+[”’」』）》)\"']*|\n+")
+# Where an over-long sentence may be cut when it alone exceeds the chunk size
+_CLAUSE_END = re.compile(r"[，、：,:]")
+# Roughly one sentence in _CUT_EVERY is a chunk boundary candidate (content-defined)
+_CUT_EVERY = 4
+
+
+class TextChunk(NamedTuple):
+    """A chunk of a document: `text == source[start:end]`."""
+
+    text: str
+    start: int
+    end: int
+
+
+def _trim(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the sentences in text, surrounding whitespace excluded."""
+    spans: List[Tuple[int, int]] = []
+    pos = 0
+    for m in _SENTENCE_END.finditer(text):
+        span = _trim(text, pos, m.end())
+        if span:
+            spans.append(span)
+        pos = m.end()
+    span = _trim(text, pos, len(text))
+    if span:
+        spans.append(span)
+    return spans
+
+
+def _split_long(text: str, start: int, end: int, limit: int) -> Iterator[Tuple[int, int]]:
+    """Cut a sentence longer than limit at clause punctuation, else hard at limit."""
+    while end - start > limit:
+        cut = None
+        for m in _CLAUSE_END.finditer(text, start, start + limit):
+            cut = m.end()
+        if cut is None or cut <= start:
+            cut = start + limit
+        yield start, cut
+        start = cut
+    if start < end:
+        yield start, end
+
+
+def _is_cut(text: str, end: int, sentence: str) -> bool:
+    if end >= len(text) or text[end] == "\n":  # paragraph end
+        return True
+    digest = hashlib.blake2b(sentence.encode("utf-8"), digest_size=2).digest()
+    return int.from_bytes(digest, "big") % _CUT_EVERY == 0
+
+
+def chunk_text(text: str, chunk_size: int = 400, chunk_overlap: int = 40, min_size: Optional[int] = None) -> List[TextChunk]:
+    """Split text into chunks of whole sentences, at most `chunk_size` characters.
+
+    Boundaries are content-defined: once a chunk holds `min_size` characters (default
+    half of chunk_size) it ends after a sentence that closes a paragraph or whose hash
+    selects it, and it always ends before exceeding chunk_size. Because boundaries do
+    not depend on absolute positions, an edit only changes the chunks around it; the
+    chunking resynchronizes a few sentences later. Up to `chunk_overlap` characters of
+    trailing whole sentences are repeated at the start of the next chunk.
+    """
+    min_size = chunk_size // 2 if min_size is None else min_size
+    pieces: List[Tuple[int, int]] = []
+    for s, e in sentence_spans(text):
+        pieces.extend(_split_long(text, s, e, chunk_size))
+
+    chunks: List[TextChunk] = []
+    cur: List[Tuple[int, int]] = []
+    carried = 0  # leading spans of cur that are overlap from the previous chunk
+
+    def emit() -> None:
+        nonlocal cur, carried
+        s, e = cur[0][0], cur[-1][1]
+        chunks.append(TextChunk(text[s:e], s, e))
+        tail: List[Tuple[int, int]] = []
+        for span in reversed(cur[1:]):
+            if e - span[0] > chunk_overlap:
+                break
+            tail.insert(0, span)
+        cur, carried = tail, len(tail)
+
+    for span in pieces:
+        if cur and span[1] - cur[0][0] > chunk_size:
+            if len(cur) > carried:
+                emit()
+            # Drop overlap that would push this chunk over the limit
+            while cur and span[1] - cur[0][0] > chunk_size:
+                cur.pop(0)
+                carried -= 1
+        cur.append(span)
+        if span[1] - cur[0][0] >= min_size and _is_cut(text, span[1], text[span[0]:span[1]]):
+            emit()
+    if len(cur) > carried:
+        emit()
+    return chunks
+
+
+def chunk_hash(text: str) -> str:
+    """Stable content id for a chunk (16 hex chars)."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def assign_chunk_ids(chunks: List[TextChunk]) -> List[str]:
+    """Content-hash ids for one document; repeated identical chunks get `-2`, `-3`, ..."""
+    seen: Dict[str, int] = {}
+    ids: List[str] = []
+    for c in chunks:
+        h = chunk_hash(c.text)
+        n = seen[h] = seen.get(h, 0) + 1
+        ids.append(h if n == 1 else f"{h}-{n}")
+    return ids
+
+
+__all__ = ["TextChunk", "assign_chunk_ids", "chunk_hash", "chunk_text", "sentence_spans"]
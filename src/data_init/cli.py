@@ -2,8 +2,6 @@ import argparse
 import json
 from dotenv import load_dotenv
 
-from src.data_init.initializer import init_vector_db
-from src.utils.log import setup_run_logging, log_info
 
 
 def main():
@@ -13,18 +11,56 @@ def main():
     parser.add_argument("--persist-dir", default=None, help="Chroma persistence directory")
     parser.add_argument("--reset", action="store_true", help="Drop and recreate collection before init")
     parser.add_argument("--verbose", action="store_true", help="Print inserted files and chunk counts")
+    parser.add_argument("--kb", default=None, help="Knowledge base name from the KB catalog (MULTI_SEARCH_KB_CATALOG)")
+    parser.add_argument("--collection", default=None, help="Chroma collection name (default knowledge_base, or the KB's)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per vector store write (one embedding request)")
+    parser.add_argument("--no-journal", action="store_true", help="Disable the resumable progress journal")
+    parser.add_argument("--replay-dead-letters", action="store_true", help="Only retry chunks in the dead-letter file")
+    parser.add_argument("--provinces", default=None, help="Comma-separated provinces to ingest (中央 = core documents): one query worker's shard")
+    parser.add_argument("--in-place", action="store_true", help="Sync the live collection directly instead of building and activating a new index generation")
+    parser.add_argument("--keep-generations", type=int, default=2, help="Previous index generations kept for rollback")
+    parser.add_argument("--activate", default=None, metavar="GENERATION", help="Only switch the current index generation (rollback)")
     args = parser.parse_args()
 
+    # Imported after argument parsing so `--help` stays instant
+    from src.data_init.initializer import init_vector_db, replay_dead_letters
+    from src.utils.log import setup_run_logging, log_info
+
     log_path = setup_run_logging(label="init_vector_db", run_type="init_data")
 
-    summary = init_vector_db(
-        data_dir=args.data_dir if args.data_dir else None,
-        persist_dir=args.persist_dir if args.persist_dir else None,
-        reset=bool(args.reset),
-        verbose=bool(args.verbose),
-    )
+    if args.activate:
+        from src.data_init.initializer import _resolve_target
+        from src.rag.generations import activate
+
+        root, _ = _resolve_target(args.kb, args.persist_dir, args.collection)
+        summary = activate(root, args.activate)
+    elif args.replay_dead_letters:
+        summary = replay_dead_letters(
+            persist_dir=args.persist_dir if args.persist_dir else None,
+            batch_size=args.batch_size,
+            verbose=bool(args.verbose),
+            kb=args.kb,
+            collection_name=args.collection,
+            keep_generations=args.keep_generations,
+        )
+    else:
+        summary = init_vector_db(
+            data_dir=args.data_dir if args.data_dir else None,
+            persist_dir=args.persist_dir if args.persist_dir else None,
+            reset=bool(args.reset),
+            verbose=bool(args.verbose),
+            batch_size=args.batch_size,
+            journaled=not args.no_journal,
+            kb=args.kb,
+            collection_name=args.collection,
+            staged=not args.in_place,
+            keep_generations=args.keep_generations,
+            provinces=[p.strip() for p in args.provinces.split(",") if p.strip()] if args.provinces else None,
+        )
 
     log_info(json.dumps(summary, ensure_ascii=False, indent=2))
+    if summary.get("failed_chunks"):
+        print(f"有 {summary['failed_chunks']} 个切片写入失败，已记录到 {summary['dead_letter_path']}，可用 --replay-dead-letters 重试")
     print(f"初始化完成，详情见日志：{log_path}")
 
 
@@ -1,66 +1,59 @@
 import os
 import shutil
 import json
-from typing import Dict, List, Tuple
+import time
+from typing import Dict, Iterable, List, Optional, Set
 
 from langchain_chroma import Chroma
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
 from src.config import DATA_DIR, CHROMA_PERSIST_DIR
+from src.data_init.chunker import assign_chunk_ids, chunk_text
+from src.data_init.journal import DeadLetters, IngestJournal
+from src.data_init.loaders import iter_documents
 from src.llm.embeddings import get_langchain_embeddings
+from src.rag.generations import (
+    abandon_staging,
+    activate,
+    begin_staging,
+    current_generation,
+    prune_generations,
+    resolve_persist_dir,
+    staging_generation,
+)
 import logging
 
 logger = logging.getLogger("multi_search")
 
 
-def parse_kb_metadata(filename: str) -> Tuple[str, str]:
-    """Return (kb_type, province) parsed from filename like '【中央】xxx' or '【辽宁】xxx'."""
-    if filename.startswith("【中央】"):
-        return "core", "中央"
-    if filename.startswith("【") and "】" in filename:
-        prov = filename[1 : filename.index("】")]
-        return "regional", prov
-    return "regional", "未知"
-
-
 def read_all_files(data_dir: str) -> List[Dict]:
-    items = []
-    for name in os.listdir(data_dir):
-        path = os.path.join(data_dir, name)
-        if not os.path.isfile(path):
-            continue
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read()
-        kb_type, province = parse_kb_metadata(name)
-        items.append(
-            {
-                "text": content,
-                "metadata": {
-                    "kb_type": kb_type,
-                    "province": province,
-                    "source_name": name,
-                    "source_path": path,
-                },
-            }
-        )
-    return items
+    """All documents under data_dir (any registered format, see src/data_init/loaders.py)."""
+    return list(iter_documents(data_dir))
 
 
 def split_items(items: List[Dict], chunk_size: int = 400, chunk_overlap: int = 40) -> List[Dict]:
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    """Sentence-aware chunks; chunk_id is a content hash, offsets index the source text."""
     chunks: List[Dict] = []
     for item in items:
-        texts = splitter.split_text(item["text"]) if item["text"] else []
-        for idx, t in enumerate(texts):
-            if not (t or "").strip():
-                continue
+        pieces = chunk_text(item["text"], chunk_size=chunk_size, chunk_overlap=chunk_overlap) if item["text"] else []
+        for idx, (piece, cid) in enumerate(zip(pieces, assign_chunk_ids(pieces))):
             md = dict(item["metadata"])  # shallow copy
-            md["chunk_id"] = idx
-            chunks.append({"text": t, "metadata": md})
+            md["chunk_id"] = cid
+            md["chunk_index"] = idx
+            md["start_offset"] = piece.start
+            md["end_offset"] = piece.end
+            chunks.append({"text": piece.text, "metadata": md})
     return chunks
 
 
+def chunk_doc_id(md: Dict) -> str:
+    return f"{md['source_name']}::{md['chunk_id']}"
+
+
+def existing_ids(vectorstore) -> Set[str]:
+    """Ids already stored in the collection (ids only, no documents or embeddings)."""
+    return set(vectorstore.get(include=[]).get("ids", []))
+
+
 def select_embedder():
     return get_langchain_embeddings()
 
@@ -71,26 +64,117 @@ def get_vectorstore(persist_dir: str, name: str = "knowledge_base"):
     return Chroma(collection_name=name, persist_directory=persist_dir, embedding_function=embeddings)
 
 
-def add_chunks(vectorstore, chunks: List[Dict]):
-    import time
-    for c in chunks:
-        text = c["text"]
-        md = c["metadata"]
-        idv = f"{md['source_name']}::{md['chunk_id']}"
-        logger.info(f"Adding to vectorstore: {idv} len={len(text)}")
-        last_err = None
-        for attempt in range(3):
-            try:
-                vectorstore.add_texts(texts=[text], metadatas=[md], ids=[idv])
-                break
-            except Exception as e:
-                last_err = e
-                if attempt < 2:
-                    time.sleep(0.4 * (attempt + 1))
-                    continue
+def _add_with_retry(vectorstore, batch: List[Dict], ids: List[str], attempts: int = 3) -> Optional[Exception]:
+    for attempt in range(attempts):
+        try:
+            vectorstore.add_texts(texts=[c["text"] for c in batch], metadatas=[c["metadata"] for c in batch], ids=ids)
+            return None
+        except Exception as e:
+            if attempt + 1 >= attempts:
+                return e
+            time.sleep(0.4 * (attempt + 1))
+    return None
+
+
+def add_chunks(vectorstore, chunks: List[Dict], batch_size: int = 64, journal: Optional[IngestJournal] = None) -> Dict:
+    """Add chunks in batches (one embedding request per batch), retrying each batch.
+
+    A batch that still fails is retried chunk by chunk so one bad chunk does not sink
+    its neighbours; chunks that fail every retry are returned as dead-letter entries
+    instead of being skipped silently. With a journal, each batch is logged as an
+    intent before and a commit after the write.
+
+    Returns {"added": [ids], "failed": [dead-letter entries]}.
+    """
+    added: List[str] = []
+    failed: List[Dict] = []
+    batch_size = max(1, batch_size)
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i : i + batch_size]
+        ids = [chunk_doc_id(c["metadata"]) for c in batch]
+        if journal is not None:
+            journal.intent(ids)
+        err = _add_with_retry(vectorstore, batch, ids)
+        if err is None:
+            ok, bad = ids, []
+        elif len(batch) == 1:
+            ok, bad = [], [(batch[0], ids[0], err)]
+        else:
+            logger.warning(f"Batch of {len(batch)} failed after retries: {err}. Retrying chunk by chunk.")
+            ok, bad = [], []
+            for c, idv in zip(batch, ids):
+                e = _add_with_retry(vectorstore, [c], [idv])
+                if e is None:
+                    ok.append(idv)
                 else:
-                    logger.warning(f"Failed to add chunk {idv} after retries: {e}. Skipping.")
-        time.sleep(0.2)
+                    bad.append((c, idv, e))
+        if journal is not None and ok:
+            journal.commit(ok)
+        added.extend(ok)
+        if bad:
+            entries = [
+                {"id": idv, "text": c["text"], "metadata": c["metadata"], "error": f"{type(e).__name__}: {e}", "ts": time.time()}
+                for c, idv, e in bad
+            ]
+            if journal is not None:
+                journal.dead([e["id"] for e in entries], entries[-1]["error"])
+            for e in entries:
+                logger.warning(f"Failed to add chunk {e['id']} after retries: {e['error']}. Dead-lettered.")
+            failed.extend(entries)
+        logger.info(f"Added batch {i // batch_size + 1}: {len(ok)}/{len(batch)} chunks")
+    return {"added": added, "failed": failed}
+
+
+def _write_registry(persist_dir: str, registry: Dict, verbose: bool = False) -> None:
+    try:
+        os.makedirs(persist_dir, exist_ok=True)
+        path = os.path.join(persist_dir, "kb_registry.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(registry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except Exception as e:
+        if verbose:
+            logger.warning(f"Warn: failed to write kb_registry.json: {e}")
+
+
+def _resolve_target(kb: Optional[str], persist_dir: Optional[str], collection_name: Optional[str]):
+    if kb:
+        from src.rag.catalog import KBCatalog
+
+        spec = KBCatalog.from_env().spec(kb)
+        return persist_dir or spec.persist_dir, collection_name or spec.collection
+    return persist_dir or CHROMA_PERSIST_DIR, collection_name or "knowledge_base"
+
+
+class GenerationValidationError(RuntimeError):
+    """A freshly built index generation failed validation and was not activated."""
+
+
+def validate_generation(vectorstore, expected_chunks: int, samples: int = 3) -> Dict:
+    """Check a built collection before it goes live: chunk count and a sample query.
+
+    The count must equal the chunks the loaders produced (nothing lost, nothing stray)
+    and an empty collection never passes; each sampled chunk's own text is queried and
+    should come back as the top hit.
+    """
+    ids = sorted(existing_ids(vectorstore))
+    problems: List[str] = []
+    if not ids:
+        problems.append("collection is empty")
+    elif len(ids) != expected_chunks:
+        problems.append(f"collection has {len(ids)} chunks, expected {expected_chunks}")
+    picked = ids[:: max(1, len(ids) // samples)][:samples] if ids else []
+    hits = 0
+    if picked:
+        docs = vectorstore.get(ids=picked, include=["documents"]).get("documents") or []
+        for text in docs:
+            found = vectorstore.similarity_search(text, k=1)
+            hits += bool(found) and found[0].page_content == text
+        # HNSW search is approximate; an intact index returns (nearly) every exact match
+        if hits * 2 <= len(docs):
+            problems.append(f"sample query found {hits}/{len(docs)} chunks by their own text")
+    return {"ok": not problems, "chunks": len(ids), "sampled": len(picked), "sample_hits": hits, "problems": problems}
 
 
 def init_vector_db(
@@ -98,28 +182,141 @@ def init_vector_db(
     persist_dir: str = CHROMA_PERSIST_DIR,
     reset: bool = False,
     verbose: bool = False,
+    batch_size: int = 64,
+    journaled: bool = True,
+    kb: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    staged: Optional[bool] = None,
+    keep_generations: int = 2,
+    provinces: Optional[Iterable[str]] = None,
 ) -> Dict:
+    """Build or incrementally sync a knowledge base's collection from data_dir.
+
+    `kb` selects a knowledge base from the catalog (src/rag/catalog.py) for its persist
+    dir and collection; explicit `persist_dir` / `collection_name` take precedence.
+
+    With `staged` (the default once persist_dir holds index generations, see
+    src/rag/generations.py) the collection is built in a new generation directory,
+    seeded from the live one (empty with `reset`), validated and then published by
+    atomically replacing `current.json`; queries switch over without a restart and the
+    live index is never modified. Without it the collection in persist_dir is synced
+    in place.
+
+    `provinces` restricts the collection to documents of those provinces ("中央" for the
+    core documents): the shard of one query worker (src/service/worker.py).
+    """
     data_dir = data_dir or DATA_DIR
-    persist_dir = persist_dir or CHROMA_PERSIST_DIR
+    persist_dir, collection_name = _resolve_target(kb, persist_dir, collection_name)
+    if staged is None:
+        staged = current_generation(persist_dir) is not None
+    if not staged:
+        target = resolve_persist_dir(persist_dir)
+        if reset and os.path.exists(target):
+            shutil.rmtree(target)
+        vectorstore = get_vectorstore(target, name=collection_name)
+        return _sync_collection(vectorstore, data_dir, target, collection_name, verbose, batch_size, journaled, provinces)
 
-    if reset and os.path.exists(persist_dir):
-        shutil.rmtree(persist_dir)
+    root = persist_dir
+    if reset:
+        abandon_staging(root)
+    stage = begin_staging(root, seed=not reset)
+    if verbose:
+        how = "resuming" if stage["resumed"] else f"seeded from {stage.get('base') or 'empty'}"
+        logger.info(f"Building generation {stage['generation']} ({how}) under {root}")
+    vectorstore = get_vectorstore(stage["path"], name=collection_name)
+    summary = _sync_collection(vectorstore, data_dir, stage["path"], collection_name, verbose, batch_size, journaled, provinces)
 
-    vectorstore = get_vectorstore(persist_dir, name="knowledge_base")
+    if summary["failed_chunks"]:
+        # staging.json and the generation's dead letters are kept: the next init (without
+        # reset) resumes this build and only embeds the chunks still missing
+        raise GenerationValidationError(
+            f"generation {stage['generation']} not activated: {summary['failed_chunks']} of "
+            f"{summary['expected_chunks']} chunks failed (dead letters: {summary['dead_letter_path']}); "
+            "run the init again without reset to resume it"
+        )
+    check = validate_generation(vectorstore, summary["expected_chunks"])
+    if not check["ok"]:
+        abandon_staging(root)
+        raise GenerationValidationError(f"generation {stage['generation']} not activated: " + "; ".join(check["problems"]))
+    pointer = activate(
+        root,
+        stage["generation"],
+        info={"collection": collection_name, "total_chunks": summary["total_chunks"], "complete": summary["complete"], "base": stage.get("base")},
+    )
+    pruned = prune_generations(root, keep=keep_generations)
+    if verbose:
+        logger.info(f"Activated generation {stage['generation']} (previous: {pointer['previous']}) | pruned: {pruned}")
+    summary.update(
+        {
+            "persist_dir": root,
+            "generation": stage["generation"],
+            "generation_dir": stage["path"],
+            "previous_generation": pointer["previous"],
+            "pruned_generations": pruned,
+            "validation": check,
+        }
+    )
+    return summary
+
+
+def _sync_collection(
+    vectorstore,
+    data_dir: str,
+    persist_dir: str,
+    collection_name: str,
+    verbose: bool,
+    batch_size: int,
+    journaled: bool,
+    provinces: Optional[Iterable[str]] = None,
+) -> Dict:
+    journal = IngestJournal(persist_dir) if journaled else None
+    dead_letters = DeadLetters(persist_dir)
+    recovery = journal.recover(vectorstore) if journal is not None else {"resumed": False, "committed": 0}
+    if recovery["resumed"]:
+        logger.info(f"Resuming interrupted ingestion: {recovery['committed']} chunks already committed")
+
+    # Documents are chunked as they stream out of the loaders; only chunks are kept
+    chunks: List[Dict] = []
+    skipped_empty: List[str] = []
+    shard = set(provinces) if provinces else None
+    for doc in iter_documents(data_dir):
+        if shard is not None and doc["metadata"].get("province") not in shard:
+            continue
+        if not (doc["text"] or "").strip():
+            skipped_empty.append(doc["metadata"]["source_name"])
+            continue
+        chunks.extend(split_items([doc]))
+
+    # Incremental sync: ids are content hashes, so only new/changed chunks are embedded
+    # and chunks no longer produced by data_dir (edited or removed files) are deleted.
+    # Chunks committed before an interruption are in the collection and skipped here.
+    stored = existing_ids(vectorstore)
+    wanted = {chunk_doc_id(c["metadata"]) for c in chunks}
+    new_chunks = [c for c in chunks if chunk_doc_id(c["metadata"]) not in stored]
+    stale = sorted(stored - wanted)
+    if journal is not None:
+        journal.begin(len(new_chunks))
+    if stale:
+        vectorstore.delete(ids=stale)
+    result = add_chunks(vectorstore, new_chunks, batch_size=batch_size, journal=journal)
+    dead_letters.add(result["failed"])
 
-    items = read_all_files(data_dir)
-    chunks = split_items(items)
-    if chunks:
-        add_chunks(vectorstore, chunks)
+    # Counts describe what is actually in the collection, not what was attempted
+    committed = (stored & wanted) | set(result["added"])
+    missing = wanted - committed
+    failed_count = dead_letters.keep_only(missing)
+    if journal is not None:
+        journal.end()
+    collection_count = len(existing_ids(vectorstore))
+    ingested = [c for c in chunks if chunk_doc_id(c["metadata"]) in committed]
 
-    total = len(chunks)
     by_kb: Dict[str, int] = {}
     for kb_type in ("core", "regional"):
-        by_kb[kb_type] = sum(1 for c in chunks if c["metadata"].get("kb_type") == kb_type)
+        by_kb[kb_type] = sum(1 for c in ingested if c["metadata"].get("kb_type") == kb_type)
 
     file_chunk_counts: Dict[str, int] = {}
     file_meta: Dict[str, Dict] = {}
-    for c in chunks:
+    for c in ingested:
         name = c["metadata"]["source_name"]
         file_chunk_counts[name] = file_chunk_counts.get(name, 0) + 1
         if name not in file_meta:
@@ -128,7 +325,7 @@ def init_vector_db(
                 "province": c["metadata"].get("province"),
             }
 
-    # 写入地域注册信息（仅regional，排除未知）到持久化目录
+    # 写入地域注册信息（仅regional，排除未知）到持久化目录；切片未全部写入时 complete=false
     provinces_present = sorted(
         {
             m.get("province")
@@ -140,20 +337,15 @@ def init_vector_db(
     registry = {
         "provinces": provinces_present,
         "kb_types": kb_types_present,
-        "total_chunks": total,
+        "total_chunks": collection_count,
+        "expected_chunks": len(wanted),
+        "failed_chunks": len(missing),
+        "complete": not missing,
     }
-    try:
-        os.makedirs(persist_dir, exist_ok=True)
-        with open(os.path.join(persist_dir, "kb_registry.json"), "w", encoding="utf-8") as f:
-            json.dump(registry, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        if verbose:
-            logger.warning(f"Warn: failed to write kb_registry.json: {e}")
-
-    skipped_empty = [i["metadata"]["source_name"] for i in items if not (i["text"] or "").strip()]
+    _write_registry(persist_dir, registry, verbose=verbose)
 
     if verbose:
-        logger.info(f"Chroma collection: knowledge_base | persist_dir: {persist_dir}")
+        logger.info(f"Chroma collection: {collection_name} | persist_dir: {persist_dir}")
         for name, cnt in sorted(file_chunk_counts.items()):
             meta = file_meta.get(name, {})
             logger.info(
@@ -161,16 +353,115 @@ def init_vector_db(
             )
         for name in sorted(skipped_empty):
             logger.info(f"Skipped empty: {name}")
-        logger.info(f"Total chunks added: {sum(file_chunk_counts.values())} | collection count: {total}")
+        logger.info(
+            f"Total chunks: {collection_count} | added: {len(result['added'])} | unchanged: {len(stored & wanted)} "
+            f"| deleted: {len(stale)} | failed: {len(missing)}"
+        )
 
     processed_files = sorted({c["metadata"]["source_name"] for c in chunks})
     return {
         "persist_dir": persist_dir,
-        "collection": "knowledge_base",
-        "total_chunks": total,
+        "collection": collection_name,
+        "total_chunks": collection_count,
+        "expected_chunks": len(wanted),
+        "added_chunks": len(result["added"]),
+        "unchanged_chunks": len(stored & wanted),
+        "deleted_chunks": len(stale),
+        "failed_chunks": len(missing),
+        "complete": not missing,
+        "resumed": recovery["resumed"],
+        "dead_letter_path": dead_letters.path if failed_count else None,
         "processed_files": processed_files,
         "by_kb_type": by_kb,
         "file_chunk_counts": file_chunk_counts,
         "skipped_empty_files": skipped_empty,
         "registry_path": os.path.join(persist_dir, "kb_registry.json"),
-    }
\ No newline at end of file
+    }
+
+
+def replay_dead_letters(
+    persist_dir: str = CHROMA_PERSIST_DIR,
+    batch_size: int = 64,
+    verbose: bool = False,
+    kb: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    keep_generations: int = 2,
+) -> Dict:
+    """Retry the dead-lettered chunks of persist_dir without the source files.
+
+    On a persist dir holding index generations the chunks are replayed into the staging
+    generation (the build that was not activated because of them) or, when there is none,
+    into a new one seeded from the live generation; once nothing is left dead-lettered it
+    is validated and activated like a regular staged init. The live index is never
+    modified.
+
+    Entries that now succeed are removed from the dead-letter file; the registry's
+    counts are updated to match the collection.
+    """
+    root, collection_name = _resolve_target(kb, persist_dir, collection_name)
+    stage = staging_generation(root)
+    if stage is None and current_generation(root) is not None and DeadLetters(resolve_persist_dir(root)).load():
+        stage = begin_staging(root)  # a copy of the live generation, dead letters included
+    persist_dir = stage["path"] if stage is not None else resolve_persist_dir(root)
+    dead_letters = DeadLetters(persist_dir)
+    latest: Dict[str, Dict] = {e["id"]: e for e in dead_letters.load() if "id" in e}
+    vectorstore = get_vectorstore(persist_dir, name=collection_name)
+    journal = IngestJournal(persist_dir)
+    journal.recover(vectorstore)
+    journal.begin(len(latest))
+    chunks = [{"text": e["text"], "metadata": e["metadata"]} for e in latest.values()]
+    result = add_chunks(vectorstore, chunks, batch_size=batch_size, journal=journal)
+    dead_letters.add(result["failed"])
+    remaining = dead_letters.keep_only(set(latest) - set(result["added"]))
+    journal.end()
+
+    collection_count = len(existing_ids(vectorstore))
+    registry_path = os.path.join(persist_dir, "kb_registry.json")
+    try:
+        with open(registry_path, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+    except Exception:
+        registry = {"provinces": [], "kb_types": []}
+    for c in chunks:
+        if chunk_doc_id(c["metadata"]) not in result["added"]:
+            continue
+        md = c["metadata"]
+        if md.get("kb_type") == "regional" and md.get("province") and md.get("province") != "未知" and md["province"] not in registry["provinces"]:
+            registry["provinces"] = sorted(registry["provinces"] + [md["province"]])
+        if md.get("kb_type") and md["kb_type"] not in registry["kb_types"]:
+            registry["kb_types"] = sorted(registry["kb_types"] + [md["kb_type"]])
+    registry.update({"total_chunks": collection_count, "failed_chunks": remaining, "complete": remaining == 0})
+    _write_registry(persist_dir, registry, verbose=verbose)
+    if verbose:
+        logger.info(f"Replayed dead letters: {len(result['added'])}/{len(latest)} added | remaining: {remaining}")
+    summary = {
+        "persist_dir": persist_dir,
+        "replayed": len(latest),
+        "added_chunks": len(result["added"]),
+        "failed_chunks": remaining,
+        "total_chunks": collection_count,
+        "dead_letter_path": dead_letters.path if remaining else None,
+    }
+    if stage is None:
+        return summary
+
+    summary.update({"persist_dir": root, "generation": stage["generation"], "generation_dir": stage["path"], "activated": False})
+    if remaining:
+        # still incomplete: the staging generation waits for another replay or init
+        if verbose:
+            logger.info(f"Generation {stage['generation']} not activated: {remaining} chunks still dead-lettered")
+        return summary
+    check = validate_generation(vectorstore, registry.get("expected_chunks", collection_count))
+    if not check["ok"]:
+        abandon_staging(root)
+        raise GenerationValidationError(f"generation {stage['generation']} not activated: " + "; ".join(check["problems"]))
+    pointer = activate(
+        root,
+        stage["generation"],
+        info={"collection": collection_name, "total_chunks": collection_count, "complete": True, "base": stage.get("base")},
+    )
+    pruned = prune_generations(root, keep=keep_generations)
+    if verbose:
+        logger.info(f"Activated generation {stage['generation']} (previous: {pointer['previous']}) | pruned: {pruned}")
+    summary.update({"activated": True, "previous_generation": pointer["previous"], "pruned_generations": pruned, "validation": check})
+    return summary
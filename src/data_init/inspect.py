@@ -0,0 +1,295 @@
+"""Index inspection: stream a collection's metadata in pages, without its vectors.
+
+`inspect_index()` pages through the collection with `get(include=["metadatas"],
+limit, offset)`, so memory is bounded by the page size plus 8 bytes per chunk (a
+digest of its `source_name::chunk_id` key, kept to find duplicates and to diff against
+data/), whatever the collection size. Documents are never fetched, vectors only with
+`vectors=True`. It reports:
+
+- counts per kb_type, province and file;
+- orphaned chunks: metadata without source_name/chunk_id, or an id that is not the
+  chunk's `source_name::chunk_id` (written by something other than the initializer);
+- duplicates: one `source_name::chunk_id` stored under several ids, or an id returned
+  twice while paging;
+- the diff against the data directory (files missing from the index or no longer in
+  data/, and per file the chunks the initializer would add or delete; `--provinces`
+  for a worker's shard) and against `kb_registry.json` (total_chunks, provinces,
+  kb_types, complete).
+
+`export` writes the same pages as JSONL ({"id", "metadata"[, "embedding"]}).
+
+    python -m src.data_init.inspect [--kb NAME | --persist-dir DIR] [--data-dir data/] [--export meta.jsonl] [--vectors]
+"""
+import argparse
+import hashlib
+import json
+import os
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+PAGE_SIZE = 1000
+MAX_EXAMPLES = 20
+
+
+def _digest(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def open_collection(persist_dir: Optional[str] = None, collection_name: Optional[str] = None, kb: Optional[str] = None):
+    """(chromadb collection, live persist dir) for a KB or persist dir; no embedding function is loaded."""
+    import chromadb
+
+    from src.data_init.initializer import _resolve_target
+    from src.rag.generations import resolve_persist_dir
+
+    root, name = _resolve_target(kb, persist_dir, collection_name)
+    live = resolve_persist_dir(root)
+    client = chromadb.PersistentClient(path=live)
+    return client.get_collection(name), live
+
+
+def iter_pages(collection, page_size: int = PAGE_SIZE, vectors: bool = False) -> Iterator[Dict[str, List]]:
+    """Pages of {"ids", "metadatas"[, "embeddings"]} in storage order."""
+    include = ["metadatas", "embeddings"] if vectors else ["metadatas"]
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=page_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            return
+        yield page
+        offset += len(ids)
+        if len(ids) < page_size:
+            return
+
+
+class _Scan:
+    """Running totals of one pass over the collection."""
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.by_kb_type: Dict[str, int] = {}
+        self.by_province: Dict[str, int] = {}
+        self.by_file: Dict[str, int] = {}
+        self.file_meta: Dict[str, Dict[str, Any]] = {}
+        self.orphans: List[Dict[str, Any]] = []
+        self.orphan_count = 0
+        self.keys = array("Q")  # digest of source_name::chunk_id per chunk
+        self.id_digests = array("Q")
+        self.vector_dims: Dict[int, int] = {}
+        self.zero_vectors = 0
+
+    def add(self, page: Dict[str, List]) -> None:
+        embeddings = page.get("embeddings")
+        for i, (cid, md) in enumerate(zip(page["ids"], page.get("metadatas") or [])):
+            md = md or {}
+            self.total += 1
+            kb_type, province, name = md.get("kb_type"), md.get("province"), md.get("source_name")
+            self.by_kb_type[str(kb_type)] = self.by_kb_type.get(str(kb_type), 0) + 1
+            self.by_province[str(province)] = self.by_province.get(str(province), 0) + 1
+            self.id_digests.append(_digest(cid))
+            if embeddings is not None:
+                vec = embeddings[i]
+                self.vector_dims[len(vec)] = self.vector_dims.get(len(vec), 0) + 1
+                self.zero_vectors += not any(vec)
+            if name is None or md.get("chunk_id") is None:
+                self._orphan(cid, "missing source_name/chunk_id")
+                continue
+            key = f"{name}::{md['chunk_id']}"
+            if key != cid:
+                self._orphan(cid, f"id is not {key}")
+            self.by_file[name] = self.by_file.get(name, 0) + 1
+            self.file_meta.setdefault(name, {"kb_type": kb_type, "province": province})
+            self.keys.append(_digest(key))
+
+    def _orphan(self, cid: str, reason: str) -> None:
+        self.orphan_count += 1
+        if len(self.orphans) < MAX_EXAMPLES:
+            self.orphans.append({"id": cid, "reason": reason})
+
+
+def _sorted(values: array):
+    import numpy as np
+
+    return np.sort(np.frombuffer(values, dtype=np.uint64)) if len(values) else np.zeros(0, dtype=np.uint64)
+
+
+def _repeated(sorted_digests) -> Set[int]:
+    import numpy as np
+
+    if len(sorted_digests) < 2:
+        return set()
+    same = sorted_digests[1:] == sorted_digests[:-1]
+    return {int(d) for d in np.unique(sorted_digests[1:][same])}
+
+
+def _contains(sorted_digests, digests: List[int]):
+    import numpy as np
+
+    want = np.array(digests, dtype=np.uint64)
+    pos = np.searchsorted(sorted_digests, want)
+    pos[pos >= len(sorted_digests)] = 0
+    return sorted_digests[pos] == want if len(sorted_digests) else np.zeros(len(want), dtype=bool)
+
+
+def _duplicate_examples(collection, page_size: int, dup_keys: Set[int], dup_ids: Set[int]) -> List[Dict[str, Any]]:
+    """Second pass, only when duplicates were found: which ids share a key."""
+    found: Dict[str, List[str]] = {}
+    for page in iter_pages(collection, page_size):
+        for cid, md in zip(page["ids"], page.get("metadatas") or []):
+            md = md or {}
+            key = f"{md.get('source_name')}::{md.get('chunk_id')}"
+            if _digest(key) in dup_keys or _digest(cid) in dup_ids:
+                found.setdefault(key, []).append(cid)
+        if len(found) >= MAX_EXAMPLES:
+            break
+    return [{"key": k, "ids": v} for k, v in list(found.items())[:MAX_EXAMPLES]]
+
+
+def diff_data_dir(keys, by_file: Dict[str, int], data_dir: str, provinces: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Index vs data_dir: files on one side only, and per file the chunks the initializer
+    would add (in data/, not indexed) or delete (indexed, no longer produced)."""
+    from src.data_init.initializer import chunk_doc_id, split_items
+    from src.data_init.loaders import iter_documents
+
+    shard = set(provinces) if provinces else None
+    seen: Set[str] = set()
+    to_add: Dict[str, int] = {}
+    to_delete: Dict[str, int] = {}
+    for doc in iter_documents(data_dir):
+        md = doc["metadata"]
+        if shard is not None and md.get("province") not in shard:
+            continue
+        if not (doc["text"] or "").strip():
+            continue
+        name = md["source_name"]
+        seen.add(name)
+        wanted = [_digest(chunk_doc_id(c["metadata"])) for c in split_items([doc])]
+        present = int(_contains(keys, wanted).sum()) if wanted else 0
+        if present < len(wanted):
+            to_add[name] = len(wanted) - present
+        if by_file.get(name, 0) > present:
+            to_delete[name] = by_file[name] - present
+    only_index = sorted(set(by_file) - seen)
+    for name in only_index:
+        to_delete[name] = by_file[name]
+    return {
+        "data_dir": data_dir,
+        "files_not_indexed": sorted(n for n in seen if n not in by_file),
+        "files_not_in_data": only_index,
+        "chunks_to_add": to_add,
+        "chunks_to_delete": to_delete,
+        "in_sync": not to_add and not to_delete,
+    }
+
+
+def diff_registry(persist_dir: str, scan: _Scan) -> Dict[str, Any]:
+    """Index vs kb_registry.json (what the query plans are built from)."""
+    path = os.path.join(persist_dir, "kb_registry.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            registry = json.load(f)
+    except (OSError, ValueError) as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}", "in_sync": False}
+    provinces = sorted(
+        {m["province"] for m in scan.file_meta.values() if m.get("kb_type") == "regional" and m.get("province") and m["province"] != "未知"}
+    )
+    kb_types = sorted({m["kb_type"] for m in scan.file_meta.values() if m.get("kb_type")})
+    problems = []
+    if registry.get("total_chunks") != scan.total:
+        problems.append(f"total_chunks {registry.get('total_chunks')} != {scan.total} in the index")
+    if sorted(registry.get("provinces") or []) != provinces:
+        missing = sorted(set(provinces) - set(registry.get("provinces") or []))
+        extra = sorted(set(registry.get("provinces") or []) - set(provinces))
+        problems.append(f"provinces not registered: {missing}; registered without chunks: {extra}")
+    if "kb_types" in registry and sorted(registry["kb_types"]) != kb_types:
+        problems.append(f"kb_types {sorted(registry['kb_types'])} != {kb_types} in the index")
+    if registry.get("complete") is False:
+        problems.append(f"ingestion incomplete: {registry.get('failed_chunks')} chunks failed")
+    return {"path": path, "problems": problems, "in_sync": not problems}
+
+
+def inspect_index(
+    persist_dir: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    kb: Optional[str] = None,
+    data_dir: Optional[str] = None,
+    provinces: Optional[Iterable[str]] = None,
+    page_size: int = PAGE_SIZE,
+    vectors: bool = False,
+    export: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Stream the collection once and report counts, orphans, duplicates and diffs (see module docstring)."""
+    collection, live = open_collection(persist_dir, collection_name, kb)
+    scan = _Scan()
+    out = open(export, "w", encoding="utf-8") if export else None
+    try:
+        for page in iter_pages(collection, page_size, vectors):
+            scan.add(page)
+            if out is not None:
+                embeddings = page.get("embeddings")
+                for i, (cid, md) in enumerate(zip(page["ids"], page.get("metadatas") or [])):
+                    row: Dict[str, Any] = {"id": cid, "metadata": md}
+                    if embeddings is not None:
+                        row["embedding"] = [float(x) for x in embeddings[i]]
+                    out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+
+    keys, ids = _sorted(scan.keys), _sorted(scan.id_digests)
+    dup_keys, dup_ids = _repeated(keys), _repeated(ids)
+    report: Dict[str, Any] = {
+        "persist_dir": live,
+        "collection": collection.name,
+        "total_chunks": scan.total,
+        "by_kb_type": scan.by_kb_type,
+        "by_province": scan.by_province,
+        "file_chunk_counts": scan.by_file,
+        "orphans": {"count": scan.orphan_count, "examples": scan.orphans},
+        "duplicates": {
+            "keys": len(dup_keys),
+            "ids": len(dup_ids),
+            "examples": _duplicate_examples(collection, page_size, dup_keys, dup_ids) if dup_keys or dup_ids else [],
+        },
+        "registry": diff_registry(live, scan),
+    }
+    if vectors:
+        report["vectors"] = {"dims": scan.vector_dims, "zero": scan.zero_vectors}
+    if data_dir:
+        report["data"] = diff_data_dir(keys, scan.by_file, data_dir, provinces)
+    if export:
+        report["export"] = export
+    return report
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Inspect a Chroma collection's metadata in pages (no documents; vectors only with --vectors)")
+    parser.add_argument("--persist-dir", default=None, help="Chroma persistence directory (the current generation is used)")
+    parser.add_argument("--kb", default=None, help="Knowledge base name from the KB catalog (MULTI_SEARCH_KB_CATALOG)")
+    parser.add_argument("--collection", default=None, help="Chroma collection name (default knowledge_base, or the KB's)")
+    parser.add_argument("--data-dir", default=None, help="Diff the index against this data directory")
+    parser.add_argument("--provinces", default=None, help="Comma-separated provinces of a worker's shard (limits the data diff)")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    parser.add_argument("--vectors", action="store_true", help="Also fetch embeddings (dimension and zero-vector checks, export)")
+    parser.add_argument("--export", default=None, help="Write {id, metadata[, embedding]} JSONL here")
+    args = parser.parse_args()
+
+    report = inspect_index(
+        persist_dir=args.persist_dir,
+        collection_name=args.collection,
+        kb=args.kb,
+        data_dir=args.data_dir,
+        provinces=[p.strip() for p in args.provinces.split(",") if p.strip()] if args.provinces else None,
+        page_size=max(1, args.page_size),
+        vectors=args.vectors,
+        export=args.export,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
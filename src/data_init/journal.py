@@ -0,0 +1,147 @@
+import json
+import os
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set
+
+JOURNAL_FILE = "ingest_journal.jsonl"
+DEAD_LETTER_FILE = "ingest_dead_letter.jsonl"
+
+
+def _append(path: str, records: Iterable[Dict]) -> None:
+    # One write + fsync per call: a record is either fully on disk or (torn last line) ignored on read
+    data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read(path: str) -> List[Dict]:
+    out: List[Dict] = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    out.append(json.loads(line))
+                except ValueError:
+                    break  # torn write from a crash; nothing after it was acknowledged
+    except FileNotFoundError:
+        pass
+    return out
+
+
+class IngestJournal:
+    """Write-ahead progress journal for one persist dir (`ingest_journal.jsonl`).
+
+    Records, in order: `begin` (run id, planned chunk count), then per batch `intent`
+    (ids about to be added) and `commit` (ids acknowledged by the vector store), `dead`
+    for chunks that failed every retry, and `end`. A run without `end` was interrupted:
+    `recover()` reconciles its uncommitted intents against the collection so the next
+    run resumes from the last checkpoint. The journal is removed once a run ends.
+    """
+
+    def __init__(self, persist_dir: str) -> None:
+        self.path = os.path.join(persist_dir, JOURNAL_FILE)
+        self.run_id: Optional[str] = None
+
+    def unfinished(self) -> Optional[Dict]:
+        """Summary of an interrupted run: {run, planned, committed (ids), pending (ids)}, or None."""
+        run: Optional[Dict] = None
+        for r in _read(self.path):
+            op = r.get("op")
+            if op == "begin":
+                if run is not None and run["run"] == r.get("run"):
+                    continue  # resumed segment of the same run
+                run = {"run": r.get("run"), "planned": r.get("planned", 0), "committed": set(), "pending": set()}
+            elif run is None:
+                continue
+            elif op == "intent":
+                run["pending"].update(r.get("ids", []))
+            elif op == "commit":
+                ids = r.get("ids", [])
+                run["committed"].update(ids)
+                run["pending"].difference_update(ids)
+            elif op == "dead":
+                run["pending"].difference_update(r.get("ids", []))
+            elif op == "end":
+                run = None
+        return run
+
+    def recover(self, vectorstore) -> Dict:
+        """Finish the bookkeeping of an interrupted run; returns {resumed, committed, reconciled}."""
+        run = self.unfinished()
+        if run is None:
+            return {"resumed": False, "committed": 0, "reconciled": 0}
+        self.run_id = run["run"]
+        reconciled: List[str] = []
+        if run["pending"]:
+            # An add may have landed just before the crash, without its commit record
+            reconciled = list(vectorstore.get(ids=sorted(run["pending"]), include=[]).get("ids", []))
+            if reconciled:
+                self.commit(reconciled)
+        return {"resumed": True, "committed": len(run["committed"]) + len(reconciled), "reconciled": len(reconciled)}
+
+    def begin(self, planned: int) -> None:
+        if self.run_id is None:
+            self.run_id = uuid.uuid4().hex[:12]
+        _append(self.path, [{"op": "begin", "run": self.run_id, "planned": planned, "ts": time.time()}])
+
+    def intent(self, ids: List[str]) -> None:
+        _append(self.path, [{"op": "intent", "ids": ids}])
+
+    def commit(self, ids: List[str]) -> None:
+        _append(self.path, [{"op": "commit", "ids": ids}])
+
+    def dead(self, ids: List[str], error: str) -> None:
+        _append(self.path, [{"op": "dead", "ids": ids, "error": error}])
+
+    def end(self) -> None:
+        """Mark the run complete; the journal has nothing left to resume and is removed."""
+        _append(self.path, [{"op": "end", "run": self.run_id, "ts": time.time()}])
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        self.run_id = None
+
+
+class DeadLetters:
+    """Chunks that failed every retry (`ingest_dead_letter.jsonl`), stored with text and
+    metadata so they can be replayed without the source files."""
+
+    def __init__(self, persist_dir: str) -> None:
+        self.path = os.path.join(persist_dir, DEAD_LETTER_FILE)
+
+    def load(self) -> List[Dict]:
+        return _read(self.path)
+
+    def add(self, entries: List[Dict]) -> None:
+        if entries:
+            _append(self.path, entries)
+
+    def ids(self) -> Set[str]:
+        return {e["id"] for e in self.load() if "id" in e}
+
+    def keep_only(self, ids: Set[str]) -> int:
+        """Rewrite the file with just the entries whose id is in `ids` (latest entry per id)."""
+        latest: Dict[str, Dict] = {}
+        for e in self.load():
+            if e.get("id") in ids:
+                latest[e["id"]] = e
+        if not latest:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return 0
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for e in latest.values():
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        return len(latest)
+
+
+__all__ = ["DEAD_LETTER_FILE", "JOURNAL_FILE", "DeadLetters", "IngestJournal"]
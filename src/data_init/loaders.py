@@ -0,0 +1,298 @@
+import codecs
+import gzip
+import io
+import json
+import os
+import re
+import tarfile
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# A loader turns one (decompressed, peekable) byte stream into documents:
+# {"text": str, "metadata": {kb_type, province, source_name, source_path, source_format}}
+LoaderFn = Callable[[io.BufferedReader, str, str], Iterator[Dict]]
+
+_LOADERS: Dict[str, LoaderFn] = {}
+_EXTENSIONS: Dict[str, str] = {}
+_SNIFFERS: List[Tuple[str, Callable[[bytes], bool]]] = []
+
+SNIFF_BYTES = 64 * 1024
+READ_BLOCK = 256 * 1024
+# JSONL record fields tried in order for the body and the document name
+JSONL_TEXT_FIELDS = ("text", "content", "body")
+JSONL_NAME_FIELDS = ("source_name", "title", "name")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_DECLARED = re.compile(rb"""(?:<meta[^>]+charset\s*=\s*["']?|<\?xml[^>]+encoding\s*=\s*["'])([A-Za-z0-9_\-]+)""", re.I)
+# GB2312/GBK pages routinely contain characters only their superset decodes
+_ENCODING_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030"}
+
+
+def parse_kb_metadata(filename: str) -> Tuple[str, str]:
+    """Return (kb_type, province) parsed from filename like '【中央】xxx' or '【辽宁】xxx'."""
+    if filename.startswith("【中央】"):
+        return "core", "中央"
+    if filename.startswith("【") and "】" in filename:
+        prov = filename[1 : filename.index("】")]
+        return "regional", prov
+    return "regional", "未知"
+
+
+def register_loader(name: str, extensions: Tuple[str, ...] = (), sniff: Optional[Callable[[bytes], bool]] = None):
+    """Register a loader under `name`, selected by file extension or by sniffing the first bytes."""
+
+    def deco(fn: LoaderFn) -> LoaderFn:
+        _LOADERS[name] = fn
+        for ext in extensions:
+            _EXTENSIONS[ext.lower()] = name
+        if sniff is not None:
+            _SNIFFERS.append((name, sniff))
+        return fn
+
+    return deco
+
+
+def detect_encoding(head: bytes) -> str:
+    """BOM, then a declared charset (HTML meta / XML), then UTF-8 if it decodes, else GB18030."""
+    for bom, enc in _BOMS:
+        if head.startswith(bom):
+            return enc
+    m = _DECLARED.search(head[:4096])
+    if m:
+        declared = m.group(1).decode("ascii").lower()
+        declared = _ENCODING_ALIASES.get(declared, declared)
+        try:
+            return codecs.lookup(declared).name
+        except LookupError:
+            pass
+    try:
+        # Incremental decode: a multi-byte character cut at the end of head is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "gb18030"
+
+
+def _text_stream(stream: io.BufferedReader) -> io.TextIOWrapper:
+    return io.TextIOWrapper(stream, encoding=detect_encoding(stream.peek(SNIFF_BYTES)[:SNIFF_BYTES]), errors="replace")
+
+
+def _read_text(stream: io.BufferedReader) -> str:
+    reader = _text_stream(stream)
+    parts: List[str] = []
+    while True:
+        block = reader.read(READ_BLOCK)
+        if not block:
+            return "".join(parts)
+        parts.append(block)
+
+
+def _strip_extensions(name: str) -> str:
+    base = name
+    for ext in (".gz", ".tgz", ".tar"):
+        if base.lower().endswith(ext):
+            base = base[: -len(ext)]
+    root, ext = os.path.splitext(base)
+    return root if ext.lower() in _EXTENSIONS else base
+
+
+def _document(text: str, names: List[Optional[str]], path: str, fmt: str) -> Dict:
+    """Name and kb metadata from the first of `names` that parse_kb_metadata recognizes, else the first name."""
+    names = [n for n in names if n]
+    source_name = names[0]
+    kb_type, province = parse_kb_metadata(source_name)
+    for n in names[1:]:
+        if province != "未知":
+            break
+        kb, prov = parse_kb_metadata(n)
+        if prov != "未知":
+            source_name, kb_type, province = n, kb, prov
+    return {
+        "text": text,
+        "metadata": {
+            "kb_type": kb_type,
+            "province": province,
+            "source_name": source_name,
+            "source_path": path,
+            "source_format": fmt,
+        },
+    }
+
+
+def _looks_like_html(head: bytes) -> bool:
+    return re.match(rb"\s*(?:<!doctype html|<!--|<html|<head|<body|<meta|<div|<p[\s>])", head[:1024].lstrip(codecs.BOM_UTF8), re.I) is not None
+
+
+def _looks_like_jsonl(head: bytes) -> bool:
+    line = head.lstrip(codecs.BOM_UTF8).lstrip().split(b"\n", 1)[0].strip()
+    if not line.startswith(b"{"):
+        return False
+    try:
+        return isinstance(json.loads(line.decode("utf-8")), dict)
+    except ValueError:
+        return False
+
+
+@register_loader("text", extensions=(".txt", ".text", ".md"))
+def load_text(stream: io.BufferedReader, name: str, path: str) -> Iterator[Dict]:
+    yield _document(_read_text(stream), [_strip_extensions(name)], path, "text")
+
+
+class _HTMLText(HTMLParser):
+    _SKIP = {"script", "style", "noscript", "head", "template", "svg"}
+    _BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "table", "ul", "ol", "pre", "blockquote"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title: List[str] = []
+        self._skip = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag in self._SKIP:
+            self._skip += 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in self._SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title.append(data)
+        elif not self._skip:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        lines = (re.sub(r"[ \t\r\f\v\xa0]+", " ", line).strip() for line in "".join(self.parts).split("\n"))
+        return "\n".join(line for line in lines if line)
+
+
+@register_loader("html", extensions=(".html", ".htm", ".shtml"), sniff=_looks_like_html)
+def load_html(stream: io.BufferedReader, name: str, path: str) -> Iterator[Dict]:
+    parser = _HTMLText()
+    reader = _text_stream(stream)
+    while True:
+        block = reader.read(READ_BLOCK)
+        if not block:
+            break
+        parser.feed(block)
+    parser.close()
+    title = re.sub(r"\s+", " ", "".join(parser.title)).strip()
+    yield _document(parser.text(), [_strip_extensions(name), title], path, "html")
+
+
+@register_loader("jsonl", extensions=(".jsonl", ".ndjson"), sniff=_looks_like_jsonl)
+def load_jsonl(stream: io.BufferedReader, name: str, path: str) -> Iterator[Dict]:
+    """One document per JSON line; records without a text field or that fail to parse are skipped."""
+    base = _strip_extensions(name)
+    for lineno, line in enumerate(_text_stream(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(rec, dict):
+            continue
+        text = next((rec[k] for k in JSONL_TEXT_FIELDS if isinstance(rec.get(k), str)), None)
+        if text is None:
+            continue
+        title = next((rec[k] for k in JSONL_NAME_FIELDS if isinstance(rec.get(k), str) and rec[k].strip()), None)
+        # Untitled records are named `<file>#<line>`, which keeps the file's 【省份】 prefix
+        yield _document(text, [title, f"{base}#{lineno}"], f"{path}#L{lineno}", "jsonl")
+
+
+def loader_for(name: str, head: bytes) -> str:
+    """Loader name for a (decompressed) stream: extension first, then sniffers, else text."""
+    ext = os.path.splitext(name[:-3] if name.lower().endswith(".gz") else name)[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+    for lname, sniff in _SNIFFERS:
+        if sniff(head):
+            return lname
+    return "text"
+
+
+def _dispatch(stream: io.BufferedReader, name: str, path: str) -> Iterator[Dict]:
+    head = stream.peek(SNIFF_BYTES)[:SNIFF_BYTES]
+    if head.startswith(_GZIP_MAGIC):
+        # Decompress on the fly; nothing beyond the read buffer is held in memory
+        inner = io.BufferedReader(gzip.GzipFile(fileobj=stream, mode="rb"), buffer_size=SNIFF_BYTES)
+        inner_name = name[:-3] if name.lower().endswith(".gz") else name
+        if inner_name.lower().endswith(".tgz"):
+            inner_name = inner_name[:-4] + ".tar"
+        yield from _dispatch(inner, inner_name, path)
+        return
+    if name.lower().endswith(".tar") or (len(head) > 262 and head[257:262] == b"ustar"):
+        yield from _iter_tar(stream, path)
+        return
+    yield from _LOADERS[loader_for(name, head)](stream, name, path)
+
+
+class _ForwardOnly(io.RawIOBase):
+    """Raw reader over a streamed tar member (its own seekable() fails in stream mode)."""
+
+    def __init__(self, f) -> None:
+        self._f = f
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def readinto(self, b) -> int:
+        data = self._f.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+
+def _iter_tar(stream: io.BufferedReader, path: str) -> Iterator[Dict]:
+    # Stream mode ("r|"): members are read sequentially, the archive is never seeked or buffered whole
+    with tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            base = os.path.basename(member.name)
+            if not base or base.startswith("."):
+                continue
+            f = tar.extractfile(member)
+            if f is None:
+                continue
+            yield from _dispatch(io.BufferedReader(_ForwardOnly(f), buffer_size=SNIFF_BYTES), base, f"{path}!{member.name}")
+
+
+def load_documents(path: str) -> Iterator[Dict]:
+    """Documents in one file, whatever its format or compression."""
+    with open(path, "rb", buffering=SNIFF_BYTES) as raw:
+        yield from _dispatch(raw, os.path.basename(path), path)
+
+
+def iter_documents(data_dir: str) -> Iterator[Dict]:
+    """Documents of every regular, non-hidden file directly under data_dir, in name order."""
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if name.startswith(".") or not os.path.isfile(path):
+            continue
+        yield from load_documents(path)
+
+
+__all__ = [
+    "detect_encoding",
+    "iter_documents",
+    "load_documents",
+    "loader_for",
+    "parse_kb_metadata",
+    "register_loader",
+]
@@ -40,6 +40,10 @@ REGION_PATTERNS = {
 }
 
 
+# 预先按长度排好序的关键词，避免每次调用重复排序
+_ORDERED_PATTERNS = [(province, sorted(kws, key=len, reverse=True)) for province, kws in REGION_PATTERNS.items()]
+
+
 def extract_province(text: str) -> Optional[str]:
     """
     从文本中提取省份信息（关键词匹配）。
@@ -52,9 +56,8 @@ def extract_province(text: str) -> Optional[str]:
 
     normalized = text.strip()
     # 优先匹配长关键词，避免短词误判（如“安”命中“安徽”）
-    for province, keywords in REGION_PATTERNS.items():
-        # 对关键词长度排序，长的先匹配
-        for kw in sorted(keywords, key=len, reverse=True):
+    for province, keywords in _ORDERED_PATTERNS:
+        for kw in keywords:
             if kw and kw in normalized:
                 return province
     return None
@@ -0,0 +1,233 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+import httpx
+
+from src.config import _env_float
+from src.utils.singleflight import SingleFlight
+
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+
+class OllamaRequestError(RuntimeError):
+    """Raised when an Ollama request fails on every attempted endpoint."""
+
+
+class OllamaEndpoint:
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"base_url": self.base_url, "inflight": self.inflight, "requests": self.requests, "failures": self.failures}
+
+
+def _is_local(url: str) -> bool:
+    return urlparse(url).hostname in ("127.0.0.1", "localhost", "::1")
+
+
+class OllamaClient:
+    """Pooled keep-alive HTTP client for one or more Ollama instances.
+
+    - One `httpx.Client` (connection pool, keep-alive) shared by embedding and generation.
+    - At most `max_concurrency` requests in flight across all endpoints.
+    - Endpoint selection: "round_robin" or "least_loaded" (fewest in-flight requests).
+    - Transport errors, 429 and 5xx are retried up to `retries` times with exponential
+      backoff and full jitter, preferring a different endpoint on each attempt.
+    - Local endpoints bypass proxy env vars (trust_env=False) instead of mutating NO_PROXY.
+    - With `coalesce`, identical concurrent embed/generate payloads share one request
+      (single-flight); callers must treat returned lists as read-only.
+    """
+
+    def __init__(
+        self,
+        base_urls: Optional[Sequence[str]] = None,
+        strategy: str = "round_robin",
+        max_concurrency: int = 8,
+        max_connections: int = 16,
+        timeout: float = 120.0,
+        connect_timeout: float = 5.0,
+        retries: int = 2,
+        backoff: float = 0.3,
+        transport: Optional[httpx.BaseTransport] = None,
+        coalesce: bool = True,
+    ) -> None:
+        urls = [u for u in (base_urls or [DEFAULT_BASE_URL]) if u]
+        self.endpoints = [OllamaEndpoint(u) for u in urls]
+        self.strategy = strategy if strategy in ("round_robin", "least_loaded") else "round_robin"
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._flights = {"embed": SingleFlight("embed"), "generate": SingleFlight("generate")} if coalesce else None
+        self._http = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            trust_env=not all(_is_local(e.base_url) for e in self.endpoints),
+            transport=transport,
+        )
+
+    def _pick(self, exclude: Sequence[OllamaEndpoint] = ()) -> OllamaEndpoint:
+        with self._lock:
+            pool = [e for e in self.endpoints if e not in exclude] or self.endpoints
+            start = next(self._rr)
+            ordered = [pool[(start + i) % len(pool)] for i in range(len(pool))]
+            ep = min(ordered, key=lambda e: e.inflight) if self.strategy == "least_loaded" else ordered[0]
+            ep.inflight += 1
+            ep.requests += 1
+            return ep
+
+    def _release(self, ep: OllamaEndpoint, failed: bool) -> None:
+        with self._lock:
+            ep.inflight -= 1
+            if failed:
+                ep.failures += 1
+
+    def post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        tried: List[OllamaEndpoint] = []
+        last_err: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            # Concurrency slot is held per attempt, not across backoff sleeps
+            with self._slots:
+                ep = self._pick(exclude=tried)
+                tried.append(ep)
+                failed = True
+                try:
+                    resp = self._http.post(ep.base_url + path, json=payload)
+                    if resp.status_code == 429 or resp.status_code >= 500:
+                        last_err = OllamaRequestError(f"{ep.base_url}{path} -> HTTP {resp.status_code}: {resp.text[:200]}")
+                    elif resp.status_code >= 400:
+                        # Client errors (unknown model, bad request) are not retryable
+                        raise OllamaRequestError(f"{ep.base_url}{path} -> HTTP {resp.status_code}: {resp.text[:200]}")
+                    else:
+                        failed = False
+                        return resp.json()
+                except httpx.TransportError as e:
+                    last_err = e
+                finally:
+                    self._release(ep, failed)
+            if attempt < self.retries:
+                time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+        raise OllamaRequestError(f"Ollama request {path} failed after {self.retries + 1} attempts: {last_err}")
+
+    def _post_coalesced(self, kind: str, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self._flights is None:
+            return self.post(path, payload)
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return self._flights[kind].do(key, lambda: self.post(path, payload))[0]
+
+    def embed(self, model: str, texts: List[str], keep_alive: Optional[str] = None) -> List[List[float]]:
+        payload: Dict[str, Any] = {"model": model, "input": texts}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return self._post_coalesced("embed", "/api/embed", payload)["embeddings"]
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        format: Optional[str] = None,
+        keep_alive: Optional[str] = None,
+    ) -> str:
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        if format:
+            payload["format"] = format
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return self._post_coalesced("generate", "/api/generate", payload).get("response") or ""
+
+    def preload(self, model: str, kind: str = "generate", keep_alive: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Load `model` into memory on every endpoint and keep it for `keep_alive`.
+
+        Generation models get Ollama's empty-prompt load request, embedding models a
+        one-word embed. Unlike `post`, each endpoint is asked directly (no balancing,
+        retries or coalescing): returns one {"base_url", "ok", "ms", "error"} per endpoint.
+        """
+        if kind == "embed":
+            path, payload = "/api/embed", {"model": model, "input": ["warmup"]}
+        else:
+            path, payload = "/api/generate", {"model": model, "prompt": "", "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        out: List[Dict[str, Any]] = []
+        for ep in self.endpoints:
+            t0 = time.perf_counter()
+            error = None
+            with self._slots:
+                try:
+                    resp = self._http.post(ep.base_url + path, json=payload)
+                    if resp.status_code >= 400:
+                        error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+                except httpx.HTTPError as e:
+                    error = f"{type(e).__name__}: {e}"
+            out.append({"base_url": ep.base_url, "ok": error is None, "ms": (time.perf_counter() - t0) * 1000, "error": error})
+        return out
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [e.snapshot() for e in self.endpoints]
+
+    def close(self) -> None:
+        self._http.close()
+
+
+def base_urls_from_env() -> List[str]:
+    """OLLAMA_BASE_URL may list several instances separated by commas."""
+    raw = os.getenv("OLLAMA_BASE_URL") or DEFAULT_BASE_URL
+    return [u.strip() for u in raw.split(",") if u.strip()]
+
+
+def client_from_env(base_urls: Optional[Sequence[str]] = None) -> OllamaClient:
+    return OllamaClient(
+        base_urls=list(base_urls) if base_urls else base_urls_from_env(),
+        strategy=os.getenv("OLLAMA_LB", "round_robin"),
+        max_concurrency=int(_env_float("OLLAMA_MAX_CONCURRENCY", 8)),
+        max_connections=int(_env_float("OLLAMA_MAX_CONNECTIONS", 16)),
+        timeout=_env_float("OLLAMA_TIMEOUT", 120.0),
+        connect_timeout=_env_float("OLLAMA_CONNECT_TIMEOUT", 5.0),
+        retries=int(_env_float("OLLAMA_RETRIES", 2)),
+        coalesce=os.getenv("OLLAMA_COALESCE", "1").lower() in ("1", "true", "yes", "on"),
+    )
+
+
+_clients: Dict[tuple, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_shared_client(base_url: Optional[str] = None) -> OllamaClient:
+    """Process-wide client per endpoint set (env OLLAMA_BASE_URL unless base_url given)."""
+    urls = tuple(u.strip() for u in base_url.split(",") if u.strip()) if base_url else tuple(base_urls_from_env())
+    with _clients_lock:
+        client = _clients.get(urls)
+        if client is None:
+            client = _clients[urls] = client_from_env(urls)
+        return client
+
+
+def reset_shared_clients() -> None:
+    with _clients_lock:
+        for c in _clients.values():
+            c.close()
+        _clients.clear()
+
+
+__all__ = [
+    "OllamaClient",
+    "OllamaRequestError",
+    "get_shared_client",
+    "reset_shared_clients",
+    "client_from_env",
+]
@@ -1,36 +1,36 @@
 import os
-from typing import Optional
+from typing import List, Optional
 
 from langchain_core.embeddings import Embeddings
-from typing import Optional
-import os
-from urllib.parse import urlparse
-from langchain_ollama import OllamaEmbeddings
-
-
-def _ensure_local_no_proxy(base_url: Optional[str]) -> None:
-    try:
-        url = base_url or os.getenv("OLLAMA_BASE_URL")
-        if not url:
-            return
-        p = urlparse(url)
-        host = p.hostname
-        if host in ("127.0.0.1", "localhost"):
-            existing = os.getenv("NO_PROXY") or os.getenv("no_proxy") or ""
-            parts = [s.strip() for s in existing.split(",") if s.strip()]
-            if host not in parts:
-                parts.append(host)
-            os.environ["NO_PROXY"] = ",".join(parts)
-    except Exception:
-        # 环境变量设置失败不影响主流程
-        pass
+
+from src.llm.client import OllamaClient, get_shared_client
+
+DEFAULT_EMBED_MODEL = "bge-m3:latest"
+
+
+def embed_model(model: Optional[str] = None) -> str:
+    """The embedding model: `model`, else OLLAMA_EMBED_MODEL, else DEFAULT_EMBED_MODEL."""
+    return model or os.getenv("OLLAMA_EMBED_MODEL", DEFAULT_EMBED_MODEL)
+
+
+class PooledOllamaEmbeddings(Embeddings):
+    """LangChain Embeddings backed by the shared pooled Ollama client (strict, no fallback)."""
+
+    def __init__(self, model: str, client: OllamaClient, batch_size: int = 64, keep_alive: Optional[str] = None) -> None:
+        self.model = model
+        self.client = client
+        self.batch_size = max(1, batch_size)
+        self.keep_alive = keep_alive
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            out.extend(self.client.embed(self.model, list(texts[i : i + self.batch_size]), keep_alive=self.keep_alive))
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed(self.model, [text], keep_alive=self.keep_alive)[0]
 
 
 def get_langchain_embeddings(model: Optional[str] = None, base_url: Optional[str] = None) -> Embeddings:
-    m = model or os.getenv("OLLAMA_EMBED_MODEL", "bge-m3:latest")
-    kwargs = {"model": m}
-    url = base_url or os.getenv("OLLAMA_BASE_URL")
-    if url:
-        kwargs["base_url"] = url
-        _ensure_local_no_proxy(url)
-    return OllamaEmbeddings(**kwargs)
\ No newline at end of file
+    return PooledOllamaEmbeddings(embed_model(model), get_shared_client(base_url), keep_alive=os.getenv("OLLAMA_KEEP_ALIVE"))
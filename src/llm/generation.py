@@ -0,0 +1,61 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.llms import LLM
+
+from src.llm.client import OllamaClient, get_shared_client
+
+DEFAULT_LLM_MODEL = "qwen3:0.6b"
+
+
+def llm_model(model: Optional[str] = None) -> str:
+    """The generation model: `model`, else OLLAMA_LLM_MODEL, else DEFAULT_LLM_MODEL."""
+    return model or os.getenv("OLLAMA_LLM_MODEL", DEFAULT_LLM_MODEL)
+
+
+class PooledOllamaLLM(LLM):
+    """LangChain LLM calling Ollama `/api/generate` through the shared pooled client.
+
+    Being a LangChain LLM, invocations still emit on_llm_start/on_llm_end callbacks
+    (LCEL file log, latency metrics).
+    """
+
+    model: str = DEFAULT_LLM_MODEL
+    temperature: float = 0.0
+    format: Optional[str] = None
+    keep_alive: Optional[str] = None
+    base_url: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "ollama-pooled"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "temperature": self.temperature, "format": self.format}
+
+    @property
+    def client(self) -> OllamaClient:
+        return get_shared_client(self.base_url)
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        return {"temperature": self.temperature}
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        options = dict(self.options)
+        if stop:
+            options["stop"] = stop
+        return self.client.generate(self.model, prompt, options=options, format=self.format, keep_alive=self.keep_alive)
+
+
+def get_langchain_llm(model: Optional[str] = None, base_url: Optional[str] = None, **kwargs: Any) -> PooledOllamaLLM:
+    params: Dict[str, Any] = {
+        "model": llm_model(model),
+        "temperature": 0,
+        "format": "json",
+        "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE"),
+        "base_url": base_url,
+    }
+    params.update(kwargs)
+    return PooledOllamaLLM(**params)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.config import llm_cache_settings
+from src.utils.log import log_debug
+
+
+def summary_cache_key(model: str, options: Dict[str, Any], prompt: str, kind: str = "summary") -> str:
+    """Stable key over (kind, model, generation options, prompt hash).
+
+    `kind` names the value stored under the key: "summary" for a `SummaryStructured`
+    dump (single-prompt path), "json" for the repaired JSON of one map/reduce call.
+    """
+    prompt_sha = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    material = json.dumps({"kind": kind, "model": model, "options": options, "prompt": prompt_sha}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """Persistent on-disk cache of parsed LLM summaries (SQLite, one file).
+
+    Values are stored as JSON (never pickled: the file may not have been written by
+    this process), so `put` takes JSON-serializable values; a hit skips the LLM call
+    and the repair path. Entries older than
+    `max_age_s` are dropped; beyond `max_entries` / `max_bytes` the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024, max_age_s: float = 7 * 86400) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summary_cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_summary_cache_accessed ON summary_cache(accessed)")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM summary_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.max_age_s and now - row[1] > self.max_age_s):
+                if row is not None:
+                    self._db.execute("DELETE FROM summary_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE summary_cache SET accessed = ? WHERE key = ?", (now, key))
+        try:
+            obj = json.loads(row[0])
+        except Exception:
+            # Unreadable entry (e.g. written by an older pickle-based version): a miss, dropped
+            self.delete(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return obj
+
+    def put(self, key: str, obj: Any) -> None:
+        blob = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO summary_cache(key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._evict(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM summary_cache WHERE key = ?", (key,))
+
+    def _evict(self, now: float) -> None:
+        if self.max_age_s:
+            self._db.execute("DELETE FROM summary_cache WHERE created < ?", (now - self.max_age_s,))
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summary_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk from least recently used until both limits hold
+        drop = []
+        for key, size in self._db.execute("SELECT key, size FROM summary_cache ORDER BY accessed ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            drop.append((key,))
+            count -= 1
+            total -= size
+        self._db.executemany("DELETE FROM summary_cache WHERE key = ?", drop)
+        log_debug(f"Summary cache evicted | entries={len(drop)} | remaining={count}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summary_cache").fetchone()
+        return {"path": self.path, "entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM summary_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+_cache: Optional[SummaryCache] = None
+_cache_path: Optional[str] = None
+_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    """Process-wide cache configured from env; None when disabled."""
+    global _cache, _cache_path
+    settings = llm_cache_settings()
+    if settings is None:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache_path != settings["path"]:
+            _cache = SummaryCache(
+                settings["path"],
+                max_entries=settings["max_entries"],
+                max_bytes=settings["max_bytes"],
+                max_age_s=settings["max_age_s"],
+            )
+            _cache_path = settings["path"]
+        return _cache
+
+
+__all__ = ["SummaryCache", "get_summary_cache", "summary_cache_key"]
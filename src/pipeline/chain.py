@@ -1,29 +1,39 @@
+import threading
 from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 
 from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables import RunnableParallel
-import os
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
+from src.config import speculative_retrieval
 from src.llm.embeddings import get_langchain_embeddings
-from src.config import CHROMA_PERSIST_DIR
-from src.geo.region import extract_province
-from src.rag.partition import build_partition_filters_precise
-from src.pipeline.summary import summarize_with_ollama
+from src.rag.catalog import get_catalog
+from src.rag.plan import resolve_province
+from src.pipeline.summary import summarize
+from src.pipeline.types import Contexts, GroupResult, RetrievedChunk, as_contexts
 from src.utils.log import log_debug
+from src.utils.metrics import TimedEmbeddings, get_metrics_registry
+from src.utils.profiling import get_profiling_callback
+
+
+# Plan groups whose filter does not depend on the province: retrieved speculatively
+# while the province is still being resolved (see `_prefetch`)
+SPECULATIVE_GROUPS = ("core", "all")
 
 
 def _enrich_input(inputs: Dict[str, Any]) -> Dict[str, Any]:
-    province = inputs.get("province") or extract_province(inputs["question"])
-    out = {**inputs, "province": province}
-    log_debug(f"EnrichInput | province={province}")
+    province = inputs.get("province") or resolve_province(inputs["question"])
+    kb = inputs.get("kb") or get_catalog().default
+    out = {**inputs, "province": province, "kb": kb}
+    log_debug(f"EnrichInput | province={province} | kb={kb}")
     return out
 
 
 def _build_filters(inputs: Dict[str, Any]) -> Dict[str, Any]:
     province = inputs.get("province")
-    filters_list = build_partition_filters_precise(province)
+    # Precompiled per-province plan; filter dicts are shared and read-only
+    filters_list = get_catalog().plans(inputs.get("kb")).get(province).filters_list
     names = ", ".join([f.get("name") for f in filters_list])
     log_debug(f"BuildFilters | province={province} | groups={names}")
     return {**inputs, "filters_list": filters_list}
@@ -50,87 +60,159 @@ def _compact_where(where: Optional[Dict[str, Any]]) -> str:
         return "Unknown"
 
 
+def _embed_question(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    # Embed once per request; every group searches with the same vector
+    embeddings = TimedEmbeddings(get_langchain_embeddings())
+    vec = embeddings.embed_query(inputs["question"])
+    log_debug(f"EmbedQuestion | dim={len(vec)}")
+    return {**inputs, "question_vector": vec}
+
+
+def _group_retriever(vectorstore, name: str, where: Optional[Dict[str, Any]], top_k: int):
+    tags = ["retrieve", f"filter:{_compact_where(where)}"]
+    return RunnableLambda(
+        lambda v: vectorstore.similarity_search_by_vector(v, k=top_k, filter=where)
+    ).with_config(run_name=f"Retrieve[{name}]", tags=tags)
+
+
+_speculative_pool: Optional[ThreadPoolExecutor] = None
+_speculative_lock = threading.Lock()
+
+
+def _speculative_executor() -> ThreadPoolExecutor:
+    global _speculative_pool
+    with _speculative_lock:
+        if _speculative_pool is None:
+            _speculative_pool = ContextThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-retrieve")
+        return _speculative_pool
+
+
+def _search_leased(kb_name: str, name: str, where: Optional[Dict[str, Any]], top_k: int, vec: List[float]) -> List:
+    # Leased for the duration of the search only: the future may outlive the request
+    with get_catalog().lease(kb_name) as kb:
+        return _group_retriever(kb.vectorstore, name, where, top_k).invoke(vec)
+
+
+def _prefetch(inputs: Dict[str, Any], speculative: bool = True) -> Dict[str, Any]:
+    """Embed the question and, if `speculative`, start retrieving the province-independent groups.
+
+    Runs alongside EnrichInput/BuildFilters, so it only reads what is known before the
+    province is resolved: the question, the KB (explicit or the catalog default) and
+    top_k. The speculative groups are those of the KB's no-province plan named in
+    SPECULATIVE_GROUPS ("core" under the province partition, "all" under flat); their
+    filters do not mention a province. Their searches are submitted as futures and not
+    waited for here, so only the embedding is on the critical path: `_run_multi_query`
+    joins a future alongside the other groups when the resolved plan has the same group.
+    """
+    vec = inputs.get("question_vector")
+    if vec is None:
+        vec = _embed_question(inputs)["question_vector"]
+    out: Dict[str, Any] = {"question_vector": vec}
+    if not speculative:
+        return out
+
+    top_k = inputs.get("top_k") or 3
+    catalog = get_catalog()
+    kb_name = inputs.get("kb") or catalog.default
+    groups = [f for f in catalog.plans(kb_name).get(None).filters_list if f.get("name") in SPECULATIVE_GROUPS]
+    if not groups:
+        return out
+    pool = _speculative_executor()
+    # name -> (where, k, future of docs): reused only if the resolved plan asks for exactly this
+    out["prefetched"] = {
+        f.get("name"): (f.get("where"), top_k, pool.submit(_search_leased, kb_name, f.get("name"), f.get("where"), top_k, vec))
+        for f in groups
+    }
+    log_debug("Prefetch | speculative=" + ", ".join(out["prefetched"].keys()))
+    return out
+
+
+def _merge_prefetch(branches: Dict[str, Any]) -> Dict[str, Any]:
+    return {**branches["plan"], **branches["prefetch"]}
+
+
+def _count_speculation(prefetched: Dict[str, Any], used: Dict[str, Any]) -> None:
+    if not prefetched:
+        return
+    registry = get_metrics_registry()
+    for name in prefetched:
+        registry.inc("speculative_retrieval", "hit" if name in used else "miss", label="outcome")
+
+
 def _run_multi_query(inputs: Dict[str, Any]) -> Dict[str, Any]:
     question = inputs["question"]
     top_k = inputs.get("top_k") or 3
     filters_list = inputs["filters_list"]
+    prefetched = inputs.get("prefetched") or {}
 
     log_debug(f"RunMultiQuery start | top_k={top_k} | groups={len(filters_list)}")
 
-    # Build vectorstore & retrievers per group
+    # The KB's shared vectorstore (opened lazily by the catalog, leased so it is not
+    # evicted mid-query); retrieval is by the precomputed question vector
     load_dotenv()
-    persist_dir = os.getenv("CHROMA_PERSIST_DIR", CHROMA_PERSIST_DIR)
-    embeddings = get_langchain_embeddings()
-    vectorstore = Chroma(collection_name="knowledge_base", persist_directory=persist_dir, embedding_function=embeddings)
+    with get_catalog().lease(inputs.get("kb")) as kb:
+        vectorstore = kb.vectorstore
+        vec = inputs.get("question_vector")
+        if vec is None:
+            vec = vectorstore.embeddings.embed_query(question)
 
-    retrievers = {
-        f["name"]: vectorstore.as_retriever(search_kwargs={"k": top_k, "filter": f.get("where")})
-        for f in filters_list
-    }
-    log_debug("Retrievers built | " + ", ".join([f"{name}" for name in retrievers.keys()]))
-
-    # Parallel run of query across retrievers using LCEL RunnableParallel
-    where_by_name = {f.get("name"): f.get("where") for f in filters_list}
-    parallel_map = {}
-    for name, retr in retrievers.items():
-        w = where_by_name.get(name)
-        tags = ["retrieve", f"filter:{_compact_where(w)}"]
-        parallel_map[name] = RunnableLambda(lambda q, r=retr: r.invoke(q)).with_config(
-            run_name=f"Retrieve[{name}]",
-            tags=tags,
+        # Groups being retrieved speculatively (same filter and k) are joined, not re-run
+        joined: Dict[str, Any] = {}
+        parallel_map = {}
+        for f in filters_list:
+            name, w = f.get("name"), f.get("where")
+            hit = prefetched.get(name)
+            if hit is not None and hit[0] == w and hit[1] == top_k:
+                joined[name] = hit[2]
+                continue
+            parallel_map[name] = _group_retriever(vectorstore, name, w, top_k)
+        for name, (_, _, future) in prefetched.items():
+            if name not in joined:
+                future.cancel()  # a miss still running finishes in the background
+        _count_speculation(prefetched, joined)
+        log_debug(
+            f"Retrievers built | kb={kb.spec.name} | "
+            + ", ".join(parallel_map.keys())
+            + (f" | prefetched={', '.join(joined.keys())}" if joined else "")
         )
-    parallel = RunnableParallel(parallel_map)
-    docs_by_group: Dict[str, List] = parallel.invoke(question)
-
-    # Format contexts to expected structure
-    contexts: List[Dict[str, Any]] = []
-    for f in filters_list:
-        name = f.get("name")
-        docs = docs_by_group.get(name, [])
-        items: List[Dict[str, Any]] = []
-        for doc in docs:
-            md = getattr(doc, "metadata", {}) or {}
-            text = getattr(doc, "page_content", "")
-            source_name = md.get("source_name")
-            chunk_id = md.get("chunk_id")
-            ref = f"{source_name}::{chunk_id}" if (source_name is not None and chunk_id is not None) else None
-            items.append({
-                "text": text,
-                "kb_type": md.get("kb_type"),
-                "province": md.get("province"),
-                "source_name": source_name,
-                "chunk_id": chunk_id,
-                "ref": ref,
-            })
-        contexts.append({"name": name, "where": f.get("where"), "results": items})
-
-    log_debug("RunMultiQuery end | counts=" + ", ".join([f"{c['name']}={len(c['results'])}" for c in contexts]))
+        # Parallel run of query across the remaining groups using LCEL RunnableParallel;
+        # the speculative futures have been running since the embedding was ready
+        docs_by_group: Dict[str, List] = RunnableParallel(parallel_map).invoke(vec) if parallel_map else {}
+        for name, future in joined.items():
+            docs_by_group[name] = future.result()
+
+    # One chunk object per hit, shared by prompt building, rendering and references
+    contexts = Contexts(
+        GroupResult(f.get("name"), f.get("where"), map(RetrievedChunk.from_doc, docs_by_group.get(f.get("name"), [])), gi)
+        for gi, f in enumerate(filters_list, start=1)
+    )
+
+    log_debug("RunMultiQuery end | counts=" + ", ".join([f"{g.name}={len(g.results)}" for g in contexts]))
 
     return {
         "question": question,
         "province": inputs.get("province"),
+        "kb": inputs.get("kb"),
         "contexts": contexts,
+        "summary_mode": inputs.get("summary_mode"),
     }
 
 
 def _summarize_and_refs(inputs: Dict[str, Any]) -> Dict[str, Any]:
-    contexts = inputs["contexts"]
+    contexts = as_contexts(inputs["contexts"])
     question = inputs["question"]
     province = inputs.get("province")
 
-    log_debug("Summarize start")
-    summary_md = summarize_with_ollama(contexts, question, province=province)
+    mode = inputs.get("summary_mode")
+    log_debug(f"Summarize start | mode={mode or 'env'}")
+    summary_md = summarize(contexts, question, province=province, mode=mode)
     log_debug(f"Summarize end | md_len={len(summary_md)}")
 
     # Build references per group for final markdown rendering (as strings)
-    references: List[Dict[str, Any]] = []
-    for gi, group in enumerate(contexts, start=1):
-        items: List[str] = []
-        for i, it in enumerate(group.get("results", []), start=1):
-            name = it.get("source_name")
-            sid = f"[{gi}-{i}]"
-            items.append(f"{sid} {name}")
-        references.append({"name": group.get("name"), "items": items})
+    references: List[Dict[str, Any]] = [
+        {"name": group.name, "items": [f"{chunk.sid} {chunk.source_name}" for chunk in group.results]}
+        for group in contexts
+    ]
 
     log_debug("References built | groups=" + ", ".join([f"{r['name']}={len(r['items'])}" for r in references]))
 
@@ -141,15 +223,53 @@ def _summarize_and_refs(inputs: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def build_app_chain(callbacks: Optional[List] = None):
-    callbacks = callbacks or []
+def build_stage_runnables(callbacks: Optional[List] = None) -> Dict[str, Any]:
+    """The pipeline as separately invokable stages: plan → embed → retrieve → summarize.
+
+    `build_app_chain` pipes them together; `src.service.scheduler.QueryScheduler` runs
+    them one by one so each stage can be queued and capped on its own.
+    """
+    callbacks = list(callbacks or [])
     enrich_input = RunnableLambda(_enrich_input).with_config(run_name="EnrichInput", tags=["pipeline"], callbacks=callbacks)
 
     build_filters = RunnableLambda(_build_filters).with_config(run_name="BuildFilters", tags=["pipeline"], callbacks=callbacks)
 
+    embed_question = RunnableLambda(_embed_question).with_config(run_name="EmbedQuestion", tags=["pipeline"], callbacks=callbacks)
+
     run_multi_query = RunnableLambda(_run_multi_query).with_config(run_name="RunMultiQuery", tags=["pipeline"], callbacks=callbacks)
 
     summarize_and_refs = RunnableLambda(_summarize_and_refs).with_config(run_name="SummarizeAndRefs", tags=["pipeline"], callbacks=callbacks)
 
-    chain = enrich_input | build_filters | run_multi_query | summarize_and_refs
-    return chain.with_config(run_name="AppChain", tags=["app"], callbacks=callbacks)
\ No newline at end of file
+    return {
+        "plan": enrich_input | build_filters,
+        "embed": embed_question,
+        "retrieve": run_multi_query,
+        "summarize": summarize_and_refs,
+    }
+
+
+def build_app_chain(callbacks: Optional[List] = None, profile_rate: Optional[float] = None, speculative: Optional[bool] = None):
+    """The query chain, pipelined: the question is embedded while the province and plan
+    are resolved, so the critical path is max(embed, plan) rather than their sum.
+
+    With `speculative` (default MULTI_SEARCH_SPECULATIVE_RETRIEVAL, on) the embed branch
+    also starts retrieving the province-independent groups in the background (see
+    `_prefetch`); RunMultiQuery searches the groups that depend on the province and
+    joins those futures, so the critical path is embed + max(all groups).
+    """
+    callbacks = list(callbacks or [])
+    # Opt-in sampling profiler (rate defaults to MULTI_SEARCH_PROFILE_RATE, 0 = off)
+    profiler = get_profiling_callback(rate=profile_rate)
+    if profiler.rate > 0:
+        callbacks.append(profiler)
+    if speculative is None:
+        speculative = speculative_retrieval()
+    stages = build_stage_runnables(callbacks)
+    prefetch = RunnableLambda(lambda inputs: _prefetch(inputs, speculative)).with_config(
+        run_name="Prefetch", tags=["pipeline"], callbacks=callbacks
+    )
+    front = RunnableParallel(plan=stages["plan"], prefetch=prefetch) | RunnableLambda(_merge_prefetch).with_config(
+        run_name="MergePrefetch", tags=["pipeline"], callbacks=callbacks
+    )
+    chain = front | stages["retrieve"] | stages["summarize"]
+    return chain.with_config(run_name="AppChain", tags=["app"], callbacks=callbacks)
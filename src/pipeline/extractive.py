@@ -0,0 +1,155 @@
+"""Extractive answer mode: pick the sentences of the retrieved chunks closest to the
+question and render them in the usual grouped markdown, without calling the LLM.
+
+Scoring is vectorized with numpy. `lexical` (default) weights the question's character
+bigrams by IDF over the candidate sentences and scores each sentence by cosine against
+the question. `embeddings` embeds the sentences in one batch and scores them by cosine
+against the question embedding; that needs the embedding model, so the low-latency /
+load-shedding tier uses lexical scoring.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.pipeline.summary import SummaryItem, SummaryStructured, _GROUP_ALIASES, _structured_to_markdown
+from src.pipeline.types import Contexts, ContextsLike, as_contexts
+from src.utils.log import log_debug
+from src.utils.metrics import stage_timer
+
+_SENT_END = re.compile(r"(?<=[。！？；!?;])|\n+")
+_NON_WORD = re.compile(r"[\s，、。！？；：,.!?;:“”‘’\"'（）()《》【】\[\]]+")
+_MIN_SENT_CHARS = 6
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split Chinese text on sentence-final punctuation (kept) and line breaks."""
+    return [s.strip() for s in _SENT_END.split(text or "") if s and len(s.strip()) >= _MIN_SENT_CHARS]
+
+
+def _grams(s: str) -> List[str]:
+    s = _NON_WORD.sub("", s)
+    return [s[i : i + 2] for i in range(len(s) - 1)] if len(s) > 1 else ([s] if s else [])
+
+
+def score_lexical(question: str, sentences: Sequence[str]):
+    """IDF-weighted bigram cosine between the question and each sentence (numpy array)."""
+    import numpy as np
+
+    vocab: Dict[str, int] = {}
+    for g in _grams(question):
+        vocab.setdefault(g, len(vocab))
+    n = len(sentences)
+    if not vocab or n == 0:
+        return np.zeros(n, dtype=np.float32)
+    rows: List[int] = []
+    cols: List[int] = []
+    lens = np.ones(n, dtype=np.float32)
+    for r, s in enumerate(sentences):
+        gs = _grams(s)
+        lens[r] = max(1, len(gs))
+        for g in gs:
+            j = vocab.get(g)
+            if j is not None:
+                rows.append(r)
+                cols.append(j)
+    hits = np.zeros((n, len(vocab)), dtype=np.float32)
+    hits[np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)] = 1.0
+    idf = np.log((n + 1.0) / (hits.sum(axis=0) + 1.0)) + 1.0
+    return (hits @ idf) / (np.sqrt(lens) * np.linalg.norm(idf))
+
+
+def score_embeddings(question: str, sentences: Sequence[str], embeddings):
+    """Cosine between the question embedding and one batched embedding of the sentences."""
+    import numpy as np
+
+    if not sentences:
+        return np.zeros(0, dtype=np.float32)
+    q = np.asarray(embeddings.embed_query(question), dtype=np.float32)
+    m = np.asarray(embeddings.embed_documents(list(sentences)), dtype=np.float32)
+    denom = np.linalg.norm(m, axis=1) * (np.linalg.norm(q) or 1.0)
+    denom[denom == 0] = 1.0
+    return (m @ q) / denom
+
+
+def _candidates(contexts: Contexts) -> Tuple[List[str], List[Tuple[int, str, int]]]:
+    """All sentences plus (group index, ref, position in chunk) for each."""
+    sents: List[str] = []
+    meta: List[Tuple[int, str, int]] = []
+    for gi, group in enumerate(contexts):
+        for chunk in group.results:
+            if chunk.ref is None:
+                continue
+            for pos, s in enumerate(split_sentences(chunk.text)):
+                sents.append(s)
+                meta.append((gi, chunk.ref, pos))
+    return sents, meta
+
+
+def extract_summary(
+    contexts: ContextsLike,
+    question: str,
+    per_group: int = 3,
+    scorer: str = "lexical",
+    embeddings=None,
+) -> SummaryStructured:
+    """Top `per_group` sentences per group (best first, no repeats) as a SummaryStructured.
+
+    A first pass takes at most one sentence per chunk so a group's points cite several
+    chunks; a second pass fills the remaining slots by score.
+    """
+    import numpy as np
+
+    contexts = as_contexts(contexts)
+    sents, meta = _candidates(contexts)
+    if scorer == "embeddings" and embeddings is not None:
+        scores = score_embeddings(question, sents, embeddings)
+    else:
+        scores = score_lexical(question, sents)
+    # Small lead-sentence prior breaks ties between equally relevant sentences
+    if len(sents):
+        scores = scores - 1e-3 * np.fromiter((m[2] for m in meta), dtype=np.float32, count=len(meta))
+
+    order = np.argsort(-scores, kind="stable")
+    picked: List[List[Tuple[float, str, str]]] = [[] for _ in contexts]
+    seen = set()
+    cited = set()
+    for fill in (False, True):
+        for idx in order:
+            gi, ref, _pos = meta[idx]
+            s = sents[idx]
+            if len(picked[gi]) >= per_group or s in seen or (not fill and ref in cited):
+                continue
+            seen.add(s)
+            cited.add(ref)
+            picked[gi].append((float(scores[idx]), s, ref))
+    for p in picked:
+        p.sort(key=lambda t: -t[0])
+
+    groups: Dict[str, List[SummaryItem]] = {"core": [], "target": [], "others": []}
+    for gi, group in enumerate(contexts):
+        field = _GROUP_ALIASES.get(group.name, "others")
+        groups[field].extend(SummaryItem.model_construct(text=s, ref=ref) for _score, s, ref in picked[gi])
+
+    heads = [p[0][1] for p in picked if p]
+    summary = "".join(heads[:3]) if heads else "未检索到相关内容。"
+    log_debug(f"Extractive | sentences={len(sents)} | picked=" + ",".join(str(len(p)) for p in picked))
+    return SummaryStructured.model_construct(summary=summary, **groups)
+
+
+def summarize_extractive(
+    contexts: ContextsLike,
+    question: str,
+    province: Optional[str] = None,
+    per_group: int = 3,
+) -> str:
+    """LLM-free answer tier: grouped markdown with [gi-i] refs from the best-matching sentences.
+
+    `province` is accepted for parity with the LLM modes; group membership already encodes it.
+    """
+    contexts = as_contexts(contexts)
+    with stage_timer("summary_extractive"):
+        obj = extract_summary(contexts, question, per_group=per_group)
+    with stage_timer("summary_render"):
+        return _structured_to_markdown(obj, contexts)
+
+
+__all__ = ["extract_summary", "split_sentences", "score_lexical", "score_embeddings", "summarize_extractive"]
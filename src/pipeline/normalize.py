@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+_SPACE = re.compile(r"\s+")
+# Whitespace touching a CJK character carries no meaning ("四川 采购" == "四川采购")
+_CJK_SPACE = re.compile(r"(?<=[\u3000-\u9fff\uff00-\uffef]) | (?=[\u3000-\u9fff\uff00-\uffef])")
+_TRAILING = re.compile(r"[\s?？!！。.，,；;~～]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question for request keys: NFKC (full-width → ASCII),
+    collapsed whitespace, no spaces next to CJK characters, no trailing punctuation,
+    lower-cased ASCII."""
+    s = unicodedata.normalize("NFKC", question or "")
+    s = _SPACE.sub(" ", s).strip()
+    s = _CJK_SPACE.sub("", s)
+    s = _TRAILING.sub("", s)
+    return s.lower()
+
+
+__all__ = ["normalize_question"]
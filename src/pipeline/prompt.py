@@ -1,10 +1,14 @@
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
+
+from src.pipeline.types import ContextsLike, GroupResult, RetrievedChunk, as_contexts
 
 
 def group_cn_name(name: str) -> str:
     if name == "core":
         return "核心组"
+    if name == "all":
+        return "全部文档"
     if name == "target_region":
         return "目标地域组"
     if name == "other_regions" or name == "others":
@@ -12,25 +16,21 @@ def group_cn_name(name: str) -> str:
     return name or "其他组"
 
 
-def format_ctx_item(idx: int, item: Dict, max_chars: int = 600) -> str:
-    text = (item.get("text") or "").strip()
+def format_ctx_item(idx: int, chunk: RetrievedChunk, max_chars: int = 600) -> str:
+    text = chunk.text.strip()
     if len(text) > max_chars:
         text = text[: max_chars - 3] + "..."
-    src = item.get("source_name") or ""
-    prov = item.get("province") or ""
-    kb = item.get("kb_type") or ""
-    cid = item.get("chunk_id")
-    sid = f"{src}::{cid}" if (src is not None and cid is not None) else src
-    return f"[{idx}] ({kb}/{prov}) {sid}\n{text}"
+    src = chunk.source_name or ""
+    ref = chunk.ref or (f"{src}::{chunk.chunk_id}" if chunk.chunk_id is not None else src)
+    return f"[{idx}] ({chunk.kb_type or ''}/{chunk.province or ''}) {ref}\n{text}"
 
 
-def build_summary_prompt(contexts: List[Dict], question: str, province: Optional[str] = None) -> str:
+def build_summary_prompt(contexts: ContextsLike, question: str, province: Optional[str] = None) -> str:
     compiled_ctx: List[str] = []
-    for gi, group in enumerate(contexts, start=1):
-        gname = group_cn_name(group.get("name"))
-        compiled_ctx.append(f"=== 组{gi}: {gname} ===")
-        for i, it in enumerate(group.get("results", []), start=1):
-            compiled_ctx.append(format_ctx_item(i, it))
+    for group in as_contexts(contexts):
+        compiled_ctx.append(f"=== 组{group.index}: {group_cn_name(group.name)} ===")
+        for i, chunk in enumerate(group.results, start=1):
+            compiled_ctx.append(format_ctx_item(i, chunk))
     prov_str = province or ""
     prompt = (
         "你是政府采购领域的专业助手。请基于下方检索到的切片，回答用户问题。\n"
@@ -46,4 +46,46 @@ def build_summary_prompt(contexts: List[Dict], question: str, province: Optional
     return prompt
 
 
-__all__ = ["build_summary_prompt", "group_cn_name"]
\ No newline at end of file
+def build_group_prompt(group: Union[GroupResult, Dict], gi: int, question: str, province: Optional[str] = None) -> str:
+    """Map step: short prompt over one group's chunks; the model returns that group's points."""
+    if not isinstance(group, GroupResult):
+        group = GroupResult.from_dict(group, gi)
+    compiled_ctx: List[str] = [f"=== 组{gi}: {group_cn_name(group.name)} ==="]
+    for i, chunk in enumerate(group.results, start=1):
+        compiled_ctx.append(format_ctx_item(i, chunk))
+    prov_str = province or ""
+    return (
+        "你是政府采购领域的专业助手。请只根据下方这一组检索切片，提炼与用户问题相关的要点。\n"
+        "【输出要求（仅JSON）】\n"
+        "- 仅输出一个JSON对象，不要任何解释、思考过程或代码块。\n"
+        "- 结构：{\"points\": [{\"text\": string, \"ref\": \"<source_name>::<chunk_id>\"}]}\n"
+        "- ref 必须取自下方切片的 “source_name::chunk_id”；该组无相关信息时返回空数组。\n"
+        f"用户问题：{question}\n"
+        f"识别省份：{prov_str}\n\n"
+        "检索上下文：\n" + "\n".join(compiled_ctx)
+    )
+
+
+def build_reduce_prompt(group_points: List[Dict], question: str, province: Optional[str] = None) -> str:
+    """Reduce step: merge per-group points (text only, no refs) into the overall summary.
+
+    group_points: [{"name": <group name>, "points": [<text>, ...]}] in group order.
+    """
+    lines: List[str] = []
+    for gi, g in enumerate(group_points, start=1):
+        lines.append(f"=== 组{gi}: {group_cn_name(g.get('name'))} ===")
+        lines.extend(f"- {t}" for t in g.get("points", []))
+    prov_str = province or ""
+    return (
+        "你是政府采购领域的专业助手。下方是各组检索切片已提炼的要点，请据此回答用户问题。\n"
+        "【输出要求（仅JSON）】\n"
+        "- 仅输出一个JSON对象，不要任何解释、思考过程或代码块。\n"
+        "- 结构：{\"summary\": string}\n"
+        "- summary 用2到4句话综合各组要点作答，区分目标省份与其他地区，不要逐条复述。\n"
+        f"用户问题：{question}\n"
+        f"识别省份：{prov_str}\n\n"
+        "各组要点：\n" + "\n".join(lines)
+    )
+
+
+__all__ = ["build_summary_prompt", "build_group_prompt", "build_reduce_prompt", "group_cn_name"]
\ No newline at end of file
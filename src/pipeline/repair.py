@@ -0,0 +1,180 @@
+"""Tolerant JSON recovery for small-model output.
+
+`lenient_json` extracts the first JSON object from LLM text in a single left-to-right
+pass and recovers what it can from malformed or truncated output:
+
+- leading chatter, ``` fences and <think>...</think> blocks before the object
+- trailing text after the object
+- truncated strings / arrays / objects (closed at end of input)
+- trailing or missing commas, single-quoted strings, unquoted keys
+- Python/JS literals (True/False/None, null)
+
+Well-formed JSON takes the C decoder fast path; the scanner only runs when that fails.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+_WS = " \t\r\n"
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_STOP = set(_WS) | set(",:]}")
+_DECODER = json.JSONDecoder()
+
+
+class _Scanner:
+    __slots__ = ("s", "i", "n")
+
+    def __init__(self, s: str, start: int) -> None:
+        self.s = s
+        self.i = start
+        self.n = len(s)
+
+    def ws(self) -> None:
+        s, i, n = self.s, self.i, self.n
+        while i < n and s[i] in _WS:
+            i += 1
+        self.i = i
+
+    def value(self) -> Any:
+        self.ws()
+        if self.i >= self.n:
+            return None
+        c = self.s[self.i]
+        if c == "{":
+            return self.obj()
+        if c == "[":
+            return self.arr()
+        if c == '"' or c == "'":
+            return self.string(c)
+        return self.bare()
+
+    def obj(self) -> dict:
+        self.i += 1
+        out: dict = {}
+        while True:
+            self.ws()
+            if self.i >= self.n:
+                return out
+            c = self.s[self.i]
+            if c == "}":
+                self.i += 1
+                return out
+            if c == ",":
+                self.i += 1
+                continue
+            if c == "]":
+                # Mismatched bracket from the model: treat as end of object
+                self.i += 1
+                return out
+            key = self.string(c) if c in "\"'" else self.bare()
+            self.ws()
+            if self.i < self.n and self.s[self.i] == ":":
+                self.i += 1
+            else:
+                # Key without value (truncated or malformed)
+                if self.i >= self.n:
+                    return out
+            val = self.value()
+            out[str(key)] = val
+
+    def arr(self) -> list:
+        self.i += 1
+        out: list = []
+        while True:
+            self.ws()
+            if self.i >= self.n:
+                return out
+            c = self.s[self.i]
+            if c == "]":
+                self.i += 1
+                return out
+            if c == ",":
+                self.i += 1
+                continue
+            if c == "}":
+                self.i += 1
+                return out
+            out.append(self.value())
+
+    def string(self, quote: str) -> str:
+        s, n = self.s, self.n
+        i = self.i + 1
+        buf: List[str] = []
+        start = i
+        while i < n:
+            c = s[i]
+            if c == quote:
+                buf.append(s[start:i])
+                self.i = i + 1
+                return "".join(buf)
+            if c == "\\" and i + 1 < n:
+                buf.append(s[start:i])
+                e = s[i + 1]
+                if e == "u" and i + 5 < n:
+                    try:
+                        buf.append(chr(int(s[i + 2 : i + 6], 16)))
+                        i += 6
+                    except ValueError:
+                        buf.append(e)
+                        i += 2
+                else:
+                    buf.append(_ESCAPES.get(e, e))
+                    i += 2
+                start = i
+                continue
+            i += 1
+        # Unterminated string: keep what arrived
+        buf.append(s[start:n])
+        self.i = n
+        return "".join(buf)
+
+    def bare(self) -> Any:
+        s, n = self.s, self.n
+        i = self.i
+        while i < n and s[i] not in _STOP:
+            i += 1
+        tok = s[self.i : i]
+        if i == self.i:
+            # Missing value: a closing bracket belongs to the enclosing container and is
+            # left for it; a stray ',' or ':' is skipped so the caller makes progress
+            if i < n and s[i] not in "]}":
+                self.i += 1
+            return None
+        self.i = i
+        if tok in _LITERALS:
+            return _LITERALS[tok]
+        try:
+            return int(tok)
+        except ValueError:
+            pass
+        try:
+            return float(tok)
+        except ValueError:
+            return tok
+
+
+def _candidate(text: str) -> Tuple[str, int]:
+    """Return (text, index of the first '{') after dropping a leading think block."""
+    end_think = text.rfind("</think>")
+    if end_think != -1:
+        text = text[end_think + len("</think>") :]
+    return text, text.find("{")
+
+
+def lenient_json(text: str) -> Optional[Any]:
+    """Parse the first JSON object in text, repairing it in one pass; None if there is none."""
+    if not text:
+        return None
+    text, start = _candidate(text)
+    if start == -1:
+        return None
+    try:
+        # Fast path (C decoder); also accepts trailing text after the object
+        obj, _ = _DECODER.raw_decode(text, start)
+        return obj
+    except ValueError:
+        pass
+    return _Scanner(text, start).value()
+
+
+__all__ = ["lenient_json"]
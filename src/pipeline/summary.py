@@ -1,166 +1,34 @@
-import os
 import json
-from typing import Dict, List, Optional
-from urllib.parse import urlparse
+from typing import Any, Dict, List, Optional, Tuple
 
-from src.pipeline.prompt import build_summary_prompt
-
-DEFAULT_LLM_MODEL = "qwen3:0.6b"
+from src.config import summary_mode
+from src.pipeline.prompt import build_group_prompt, group_cn_name, build_reduce_prompt, build_summary_prompt
+from src.llm.generation import DEFAULT_LLM_MODEL, get_langchain_llm, llm_model
+from src.pipeline.cache import get_summary_cache, summary_cache_key
+from src.pipeline.repair import lenient_json
+from src.pipeline.types import Contexts, ContextsLike, GroupResult, as_contexts
+from langchain_core.runnables.config import ContextThreadPoolExecutor
 from pydantic import BaseModel
-from langchain_core.output_parsers import PydanticOutputParser
+from src.service.offload import compact_contexts, context_chars, offload_for
 from src.utils.log import log_debug
+from src.utils.metrics import stage_timer
 
 
-def _ensure_local_no_proxy(base_url: Optional[str]) -> None:
-    try:
-        if not base_url:
-            return
-        p = urlparse(base_url)
-        host = p.hostname
-        if host in ("127.0.0.1", "localhost"):
-            existing = os.getenv("NO_PROXY") or os.getenv("no_proxy") or ""
-            parts = [s.strip() for s in existing.split(",") if s.strip()]
-            if host not in parts:
-                parts.append(host)
-            os.environ["NO_PROXY"] = ",".join(parts)
-    except Exception:
-        pass
-
-
-def _build_sid_map(contexts: List[Dict]) -> Dict[str, str]:
-    m: Dict[str, str] = {}
-    for gi, group in enumerate(contexts, start=1):
-        for i, it in enumerate(group.get("results", []), start=1):
-            name = it.get("source_name")
-            cid = it.get("chunk_id")
-            if name is not None and cid is not None:
-                m[f"{name}::{cid}"] = f"[{gi}-{i}]"
-    return m
-
-
-def _extract_points_from_group(group: Dict, gi: int) -> List[str]:
+def _extract_points_from_group(group: GroupResult) -> List[str]:
     out: List[str] = []
-    for i, it in enumerate(group.get("results", []), start=1):
-        t = (it.get("text") or "").strip()
+    for chunk in group.results:
+        t = chunk.text.strip()
         if not t:
             continue
         snippet = t.split("。")[0].strip() or t[:60].strip()
-        out.append(f"- {snippet} [{gi}-{i}]")
+        out.append(f"- {snippet} {chunk.sid}")
     return out
 
 
-def _json_to_markdown(obj: Dict, sid_map: Dict[str, str], contexts: List[Dict]) -> str:
-    summary = (obj.get("summary") or "").strip()
-    core = obj.get("core") or []
-    target = obj.get("target") or []
-    others = obj.get("others") or []
-    parts: List[str] = []
-    if summary:
-        parts.append("### 总结")
-        parts.append(summary)
-        parts.append("")
-    parts.append("## 核心组")
-    added = 0
-    if core:
-        for item in core:
-            t = (item.get("text") or "").strip()
-            ref_key = (item.get("ref") or "").strip()
-            r = sid_map.get(ref_key)
-            if t and r:
-                parts.append(f"- {t} {r}")
-                added += 1
-    if added == 0:
-        if len(contexts) >= 1:
-            parts.extend(_extract_points_from_group(contexts[0], 1))
-            if len(contexts[0].get("results", [])) == 0:
-                parts.append("该组未检索到相关内容")
-        else:
-            parts.append("该组未检索到相关内容")
-    parts.append("")
-    parts.append("## 目标地域组")
-    added = 0
-    if target:
-        for item in target:
-            t = (item.get("text") or "").strip()
-            ref_key = (item.get("ref") or "").strip()
-            r = sid_map.get(ref_key)
-            if t and r:
-                parts.append(f"- {t} {r}")
-                added += 1
-    if added == 0:
-        if len(contexts) >= 2:
-            parts.extend(_extract_points_from_group(contexts[1], 2))
-            if len(contexts[1].get("results", [])) == 0:
-                parts.append("该组未检索到相关内容")
-        else:
-            parts.append("该组未检索到相关内容")
-    parts.append("")
-    parts.append("## 其他组")
-    added = 0
-    if others:
-        for item in others:
-            t = (item.get("text") or "").strip()
-            ref_key = (item.get("ref") or "").strip()
-            r = sid_map.get(ref_key)
-            if t and r:
-                parts.append(f"- {t} {r}")
-                added += 1
-    if added == 0:
-        gi = 3 if len(contexts) >= 3 else 2
-        idx = gi - 1
-        if len(contexts) > idx:
-            parts.extend(_extract_points_from_group(contexts[idx], gi))
-            if len(contexts[idx].get("results", [])) == 0:
-                parts.append("该组未检索到相关内容")
-        else:
-            parts.append("该组未检索到相关内容")
-    return "\n".join(parts)
-
-
-def _inject_fallback_into_raw(markdown: str, contexts: List[Dict]) -> str:
-    lines = markdown.splitlines()
-    def find_section(title: str) -> tuple[int, int]:
-        start = None
-        for idx, ln in enumerate(lines):
-            if ln.strip() == title:
-                start = idx
-                break
-        if start is None:
-            return -1, -1
-        end = len(lines)
-        for idx in range(start + 1, len(lines)):
-            if lines[idx].strip().startswith("## ") and lines[idx].strip() != title:
-                end = idx
-                break
-        return start, end
-    def has_bullets(s: int, e: int) -> bool:
-        for ln in lines[s+1:e]:
-            if ln.strip().startswith("- "):
-                return True
-            if ln.strip() and not ln.strip().startswith("###") and not ln.strip().startswith("##"):
-                return True
-        return False
-    s,e = find_section("## 核心组")
-    if s != -1 and not has_bullets(s,e):
-        bullets = _extract_points_from_group(contexts[0], 1)
-        lines = lines[:e] + bullets + lines[e:]
-    s,e = find_section("## 目标地域组")
-    if s != -1 and not has_bullets(s,e):
-        bullets = _extract_points_from_group(contexts[1], 2)
-        lines = lines[:e] + bullets + lines[e:]
-    s,e = find_section("## 其他组")
-    if s != -1 and not has_bullets(s,e):
-        gi = 3 if len(contexts) >= 3 else 2
-        idx = gi - 1
-        bullets = _extract_points_from_group(contexts[idx], gi)
-        lines = lines[:e] + bullets + lines[e:]
-    return "\n".join(lines)
-
-
-def _build_generic_summary(contexts: List[Dict], province: Optional[str]) -> str:
-    def first_snippet(group: Dict) -> str:
-        for it in group.get("results", []):
-            t = (it.get("text") or "").strip()
+def _generic_summary_text(contexts: Contexts, province: Optional[str]) -> str:
+    def first_snippet(group: GroupResult) -> str:
+        for chunk in group.results:
+            t = chunk.text.strip()
             if not t:
                 continue
             s = t.split("。")[0].strip()
@@ -172,42 +40,12 @@ def _build_generic_summary(contexts: List[Dict], province: Optional[str]) -> str
     others_s = first_snippet(contexts[others_idx]) if len(contexts) > others_idx else "无检索要点"
     prov = province or "目标省份"
     return (
-        "### 总结\n"
         f"核心组：{core_s}。\n"
         f"目标地域组（{prov}）：{target_s}。\n"
-        f"其他组：{others_s}。\n"
-        ""
+        f"其他组：{others_s}。"
     )
 
 
-def _groups_have_bullets(markdown: str) -> bool:
-    lines = markdown.splitlines()
-    def find_section(title: str) -> tuple[int, int]:
-        start = None
-        for idx, ln in enumerate(lines):
-            if ln.strip() == title:
-                start = idx
-                break
-        if start is None:
-            return -1, -1
-        end = len(lines)
-        for idx in range(start + 1, len(lines)):
-            if lines[idx].strip().startswith("## ") and lines[idx].strip() != title:
-                end = idx
-                break
-        return start, end
-    def has_bullets(s: int, e: int) -> bool:
-        for ln in lines[s+1:e]:
-            if ln.strip().startswith("- "):
-                return True
-        return False
-    for title in ("## 核心组", "## 目标地域组", "## 其他组"):
-        s,e = find_section(title)
-        if s != -1 and not has_bullets(s,e):
-            return False
-    return True
-
-
 class SummaryItem(BaseModel):
     text: str
     ref: Optional[str] = None
@@ -220,8 +58,54 @@ class SummaryStructured(BaseModel):
     others: List[SummaryItem] = []
 
 
-def _structured_to_markdown(obj: SummaryStructured, contexts: List[Dict]) -> str:
-    sid_map = _build_sid_map(contexts)
+# Keys small models use instead of the requested ones
+_GROUP_ALIASES = {
+    "core": "core",
+    "all": "core",  # flat (single-group) knowledge bases
+    "target": "target",
+    "target_region": "target",
+    "others": "others",
+    "other": "others",
+    "other_regions": "others",
+}
+
+
+def _coerce_items(raw) -> List[SummaryItem]:
+    if isinstance(raw, dict):
+        raw = [raw]
+    if not isinstance(raw, list):
+        return []
+    out: List[SummaryItem] = []
+    for it in raw:
+        if isinstance(it, dict):
+            text = it.get("text")
+            ref = it.get("ref")
+            if text is None:
+                continue
+            out.append(SummaryItem.model_construct(text=str(text), ref=None if ref is None else str(ref)))
+        elif isinstance(it, str) and it.strip():
+            out.append(SummaryItem.model_construct(text=it, ref=None))
+    return out
+
+
+def _coerce_summary(raw) -> Optional[SummaryStructured]:
+    """Map a (possibly repaired) JSON object onto SummaryStructured without re-validation."""
+    if not isinstance(raw, dict):
+        return None
+    groups: Dict[str, List[SummaryItem]] = {"core": [], "target": [], "others": []}
+    for key, val in raw.items():
+        field = _GROUP_ALIASES.get(key)
+        if field:
+            groups[field].extend(_coerce_items(val))
+    summary = raw.get("summary")
+    if isinstance(summary, (list, dict)):
+        summary = json.dumps(summary, ensure_ascii=False)
+    return SummaryStructured.model_construct(summary="" if summary is None else str(summary), **groups)
+
+
+def _structured_to_markdown(obj: SummaryStructured, contexts: ContextsLike) -> str:
+    contexts = as_contexts(contexts)
+    sid_map = contexts.sid_map()
     parts: List[str] = []
     if obj.summary.strip():
         parts.append("### 总结")
@@ -239,14 +123,17 @@ def _structured_to_markdown(obj: SummaryStructured, contexts: List[Dict]) -> str
                 added += 1
         if added == 0:
             if len(contexts) >= gi:
-                bullets = _extract_points_from_group(contexts[gi - 1], gi)
-                parts.extend(bullets)
-                if len(contexts[gi - 1].get("results", [])) == 0:
+                parts.extend(_extract_points_from_group(contexts[gi - 1]))
+                if not contexts[gi - 1].results:
                     parts.append("该组未检索到相关内容")
             else:
                 parts.append("该组未检索到相关内容")
         parts.append("")
 
+    if len(contexts) == 1 and contexts[0].name == "all":
+        # Flat knowledge base: one group, whatever key the model filed its points under
+        render_group(group_cn_name("all"), obj.core + obj.target + obj.others, 1)
+        return "\n".join(parts)
     render_group("核心组", obj.core, 1)
     render_group("目标地域组", obj.target, 2)
     gi = 3 if len(contexts) >= 3 else 2
@@ -254,65 +141,164 @@ def _structured_to_markdown(obj: SummaryStructured, contexts: List[Dict]) -> str
     return "\n".join(parts)
 
 
+def _parse_and_render(text: str, contexts: ContextsLike, province: Optional[str]) -> Tuple[str, Optional[SummaryStructured]]:
+    """One tolerant pass over the LLM output, then render; empty groups are filled from
+    contexts. Returns the markdown and the parsed summary (None if the output had no JSON)."""
+    contexts = as_contexts(contexts)
+    with stage_timer("summary_parse"):
+        parsed = _coerce_summary(lenient_json(text))
+    obj = parsed
+    if obj is None:
+        log_debug("LLM output has no JSON object; using snippet summary")
+        obj = SummaryStructured(summary=_generic_summary_text(contexts, province))
+    with stage_timer("summary_render"):
+        return _structured_to_markdown(obj, contexts), parsed
+
+
+def _render(obj: SummaryStructured, contexts: ContextsLike) -> str:
+    with stage_timer("summary_render"):
+        return _structured_to_markdown(obj, contexts)
+
+
+def _render_maybe_offloaded(obj: SummaryStructured, contexts: Contexts) -> str:
+    offload = offload_for(context_chars(contexts))
+    if offload is not None:
+        return offload.call(_render, obj, compact_contexts(contexts))
+    return _render(obj, contexts)
+
+
 def summarize_with_ollama(
-    contexts: List[Dict],
+    contexts: ContextsLike,
     question: str,
-    model: str = DEFAULT_LLM_MODEL,
+    model: Optional[str] = None,
     province: Optional[str] = None,
 ) -> str:
+    contexts = as_contexts(contexts)
+    model = llm_model(model)
     prompt = build_summary_prompt(contexts, question, province=province)
     try:
-        from langchain_ollama import OllamaLLM
-        base_url = os.getenv("OLLAMA_BASE_URL")
-        kwargs = {"model": model, "temperature": 0, "format": "json"}
-        if base_url:
-            kwargs["base_url"] = base_url
-            _ensure_local_no_proxy(base_url)
-        log_debug(f"Ollama init | model={model} | base_url={'default' if not base_url else base_url}")
-        llm = OllamaLLM(**kwargs)
-
-        # Parse to strong types; fall back to deterministic markdown
-        parser = PydanticOutputParser(pydantic_object=SummaryStructured)
+        llm = get_langchain_llm(model)
+        cache = get_summary_cache()
+        cache_key = summary_cache_key(model, {**llm.options, "format": llm.format}, prompt) if cache else None
+        if cache:
+            cached = _coerce_summary(cache.get(cache_key))
+            if cached is not None:
+                log_debug(f"LLM cache hit | key={cache_key[:12]}")
+                return _render_maybe_offloaded(cached, contexts)
+        log_debug(f"Ollama init | model={model} | endpoints={[e.base_url for e in llm.client.endpoints]}")
+
         text = llm.invoke(prompt)
         log_debug(f"LLM raw response length={len(text) if isinstance(text, str) else 'N/A'}")
-        if isinstance(text, str) and text.strip():
-            s = text.strip()
-            try:
-                obj = parser.parse(s)
-                return _structured_to_markdown(obj, contexts)
-            except Exception:
-                # Fall back to previous behavior on parse errors
-                if s.startswith("{") and s.endswith("}"):
-                    try:
-                        raw = json.loads(s)
-                        sid_map = _build_sid_map(contexts)
-                        return _json_to_markdown(raw, sid_map, contexts)
-                    except Exception:
-                        pass
-                s = _inject_fallback_into_raw(s, contexts)
-                if not _groups_have_bullets(s):
-                    s = _build_generic_summary(contexts, province)
-                    core_b = _extract_points_from_group(contexts[0], 1) if len(contexts) >= 1 else []
-                    target_b = _extract_points_from_group(contexts[1], 2) if len(contexts) >= 2 else []
-                    gi = 3 if len(contexts) >= 3 else 2
-                    idx = gi - 1
-                    others_b = _extract_points_from_group(contexts[idx], gi) if len(contexts) > idx else []
-                    s = s + "\n".join([
-                        "## 核心组",
-                        *core_b,
-                        "",
-                        "## 目标地域组",
-                        *target_b,
-                        "",
-                        "## 其他组",
-                        *others_b,
-                    ])
-                return s
-        raise RuntimeError("Empty LLM response")
+        if not isinstance(text, str) or not text.strip():
+            raise RuntimeError("Empty LLM response")
+        # Parse + render are CPU-bound: run them in the offload pool when enabled
+        offload = offload_for(len(text) + context_chars(contexts))
+        if offload is not None:
+            markdown, obj = offload.call(_parse_and_render, text, compact_contexts(contexts), province)
+        else:
+            markdown, obj = _parse_and_render(text, contexts, province)
+        if obj is not None and cache:
+            cache.put(cache_key, obj.model_dump())
+        return markdown
     except Exception as e:
         raise e
 
+
+def _invoke_json(llm, model: str, prompt: str) -> Optional[Any]:
+    """One LLM call → repaired JSON; results are cached per prompt under the "json" kind."""
+    cache = get_summary_cache()
+    cache_key = summary_cache_key(model, {**llm.options, "format": llm.format}, prompt, kind="json") if cache else None
+    if cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    text = llm.invoke(prompt)
+    raw = lenient_json(text) if isinstance(text, str) else None
+    if raw is not None and cache:
+        cache.put(cache_key, raw)
+    return raw
+
+
+def _group_points(raw) -> List[SummaryItem]:
+    if isinstance(raw, dict):
+        # Expected {"points": [...]}; accept any single list-valued key from small models
+        raw = raw.get("points", next((v for v in raw.values() if isinstance(v, list)), None))
+    return _coerce_items(raw)
+
+
+def summarize_map_reduce(
+    contexts: ContextsLike,
+    question: str,
+    model: Optional[str] = None,
+    province: Optional[str] = None,
+) -> str:
+    """Map: one short prompt per group, run concurrently. Reduce: one short call that writes
+    the overall summary from the group points.
+
+    Group items come straight from the map outputs, so `source_name::chunk_id` refs are
+    kept exactly as cited; the reduce call only sees point texts and returns `summary`.
+    """
+    contexts = as_contexts(contexts)
+    model = llm_model(model)
+    llm = get_langchain_llm(model)
+    log_debug(f"MapReduce start | model={model} | groups={len(contexts)}")
+    todo = [(g.index, g) for g in contexts if g.results]
+    with stage_timer("summary_map"):
+        if todo:
+            # Context-copying pool so LLM calls stay attached to the chain's callbacks
+            with ContextThreadPoolExecutor(max_workers=len(todo), thread_name_prefix="summary-map") as ex:
+                raws = list(ex.map(lambda t: _invoke_json(llm, model, build_group_prompt(t[1], t[0], question, province)), todo))
+        else:
+            raws = []
+    points: Dict[int, List[SummaryItem]] = {gi: _group_points(raw) for (gi, _), raw in zip(todo, raws)}
+
+    groups: Dict[str, List[SummaryItem]] = {"core": [], "target": [], "others": []}
+    reduce_in: List[Dict] = []
+    for g in contexts:
+        items = points.get(g.index, [])
+        groups[_GROUP_ALIASES.get(g.name, "others")].extend(items)
+        reduce_in.append({"name": g.name, "points": [it.text for it in items]})
+    log_debug("MapReduce map end | points=" + ", ".join(f"{r['name']}={len(r['points'])}" for r in reduce_in))
+
+    summary = ""
+    if any(r["points"] for r in reduce_in):
+        with stage_timer("summary_reduce"):
+            raw = _invoke_json(llm, model, build_reduce_prompt(reduce_in, question, province))
+        if isinstance(raw, dict) and raw.get("summary") is not None:
+            summary = str(raw["summary"])
+    if not summary.strip():
+        summary = _generic_summary_text(contexts, province)
+    obj = SummaryStructured.model_construct(summary=summary, **groups)
+    return _render_maybe_offloaded(obj, contexts)
+
+
+def summarize(
+    contexts: ContextsLike,
+    question: str,
+    model: Optional[str] = None,
+    province: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> str:
+    """Dispatch on summary mode (argument, else MULTI_SEARCH_SUMMARY_MODE)."""
+    contexts = as_contexts(contexts)
+    mode = mode or summary_mode()
+    if mode == "retrieval":
+        return _render_maybe_offloaded(SummaryStructured(), contexts)
+    if mode == "extractive":
+        from src.pipeline.extractive import summarize_extractive
+
+        offload = offload_for(context_chars(contexts))
+        if offload is not None:
+            return offload.call(summarize_extractive, compact_contexts(contexts, full_text=True), question, province)
+        return summarize_extractive(contexts, question, province=province)
+    if mode == "map_reduce":
+        return summarize_map_reduce(contexts, question, model=model, province=province)
+    return summarize_with_ollama(contexts, question, model=model, province=province)
+
+
 __all__ = [
+    "summarize",
     "summarize_with_ollama",
+    "summarize_map_reduce",
     "DEFAULT_LLM_MODEL",
 ]
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""Retrieved chunks and per-group results as they flow through the pipeline.
+
+`_run_multi_query` creates one RetrievedChunk per hit and one GroupResult per filter
+group, once; prompt building, summarization, markdown rendering and the references read
+those same objects by attribute. Each chunk carries its precomputed `ref`
+("source_name::chunk_id", what the LLM cites) and `sid` ("[gi-i]", what the answer
+shows), and Contexts builds the ref → sid map at most once per request.
+
+Mapping-style `get()` / `[]` access is kept for callers written against the old dict
+contexts, and `as_contexts()` converts plain dicts (JSON from query workers, tests) at
+the entry points. `to_dict()` gives the wire/JSON form.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+class RetrievedChunk:
+    """One retrieved chunk; `score` is the distance when the search returned one."""
+
+    __slots__ = ("text", "source_name", "chunk_id", "kb_type", "province", "score", "ref", "sid")
+
+    def __init__(
+        self,
+        text: str = "",
+        source_name: Optional[str] = None,
+        chunk_id: Any = None,
+        kb_type: Optional[str] = None,
+        province: Optional[str] = None,
+        score: Optional[float] = None,
+        ref: Optional[str] = None,
+    ) -> None:
+        self.text = text or ""
+        self.source_name = source_name
+        self.chunk_id = chunk_id
+        self.kb_type = kb_type
+        self.province = province
+        self.score = score
+        if ref is None and source_name is not None and chunk_id is not None:
+            ref = f"{source_name}::{chunk_id}"
+        self.ref = ref
+        self.sid = ""  # set when the chunk is placed in a group
+
+    @classmethod
+    def from_doc(cls, doc, score: Optional[float] = None) -> "RetrievedChunk":
+        md = getattr(doc, "metadata", None) or {}
+        return cls(
+            getattr(doc, "page_content", ""),
+            md.get("source_name"),
+            md.get("chunk_id"),
+            md.get("kb_type"),
+            md.get("province"),
+            score,
+        )
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "RetrievedChunk":
+        return cls(
+            d.get("text") or "",
+            d.get("source_name"),
+            d.get("chunk_id"),
+            d.get("kb_type"),
+            d.get("province"),
+            d.get("score"),
+            d.get("ref"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = {
+            "text": self.text,
+            "kb_type": self.kb_type,
+            "province": self.province,
+            "source_name": self.source_name,
+            "chunk_id": self.chunk_id,
+            "ref": self.ref,
+        }
+        if self.score is not None:
+            out["score"] = self.score
+        return out
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"RetrievedChunk({self.ref or self.source_name!r}, {self.sid or '-'}, {len(self.text)} chars)"
+
+
+class GroupResult:
+    """Chunks retrieved for one filter group; `index` is the group's 1-based position."""
+
+    __slots__ = ("name", "where", "results", "index")
+
+    def __init__(self, name: Optional[str], where: Optional[Dict] = None, results: Iterable[RetrievedChunk] = (), index: int = 1) -> None:
+        self.name = name
+        self.where = where
+        self.index = index
+        self.results: List[RetrievedChunk] = list(results)
+        for i, chunk in enumerate(self.results, start=1):
+            chunk.sid = f"[{index}-{i}]"
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], index: int) -> "GroupResult":
+        chunks = [c if isinstance(c, RetrievedChunk) else RetrievedChunk.from_dict(c) for c in d.get("results") or []]
+        return cls(d.get("name"), d.get("where"), chunks, index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "where": self.where, "results": [c.to_dict() for c in self.results]}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"GroupResult({self.name!r}, {len(self.results)} chunks)"
+
+
+class Contexts(list):
+    """The groups of one request, in order; caches the ref → sid map."""
+
+    __slots__ = ("_sid_map",)
+
+    def sid_map(self) -> Dict[str, str]:
+        m = getattr(self, "_sid_map", None)
+        if m is None:
+            m = {c.ref: c.sid for g in self for c in g.results if c.ref is not None}
+            self._sid_map = m
+        return m
+
+    def text_chars(self) -> int:
+        return sum(len(c.text) for g in self for c in g.results)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [g.to_dict() for g in self]
+
+
+# What the summary/prompt entry points accept
+ContextsLike = Iterable[Union[GroupResult, Dict[str, Any]]]
+
+
+def as_contexts(contexts: ContextsLike) -> Contexts:
+    """Contexts for a list of GroupResults or plain group dicts (no copy if already Contexts)."""
+    if isinstance(contexts, Contexts):
+        return contexts
+    out = Contexts()
+    for gi, g in enumerate(contexts, start=1):
+        if isinstance(g, GroupResult):
+            out.append(g if g.index == gi else GroupResult(g.name, g.where, g.results, gi))
+        else:
+            out.append(GroupResult.from_dict(g, gi))
+    return out
+
+
+__all__ = ["Contexts", "ContextsLike", "GroupResult", "RetrievedChunk", "as_contexts"]
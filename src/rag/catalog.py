@@ -0,0 +1,369 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.config import CHROMA_PERSIST_DIR, kb_catalog_settings
+from src.rag.generations import current_generation, pointer_mtime, resolve_persist_dir
+from src.rag.partition import PARTITION_RULES
+from src.rag.plan import PlanTable
+from src.utils.log import log_debug
+from src.utils.metrics import MetricsRegistry, get_metrics_registry
+
+DEFAULT_KB = "default"
+DEFAULT_COLLECTION = "knowledge_base"
+# How often an open KB checks its persist root for a newly activated index generation
+_GENERATION_CHECK_S = 1.0
+
+
+class UnknownKB(KeyError):
+    """Raised for a knowledge base name that is not in the catalog."""
+
+
+class KBSpec:
+    """One tenant: its collection, persist dir (holding kb_registry.json) and partition rule.
+
+    Each KB should have its own persist dir: that is the unit Chroma loads and frees.
+    When the persist dir holds index generations (src/rag/generations.py) the KB is
+    served from the current one.
+    """
+
+    __slots__ = ("name", "collection", "persist_dir", "partition")
+
+    def __init__(self, name: str, collection: str = DEFAULT_COLLECTION, persist_dir: str = CHROMA_PERSIST_DIR, partition: str = "province") -> None:
+        if partition not in PARTITION_RULES:
+            raise ValueError(f"KB {name}: unknown partition rule {partition!r} (expected one of {sorted(PARTITION_RULES)})")
+        self.name = name
+        self.collection = collection
+        self.persist_dir = persist_dir
+        self.partition = partition
+
+    @property
+    def registry_path(self) -> str:
+        return os.path.join(resolve_persist_dir(self.persist_dir), "kb_registry.json")
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"name": self.name, "collection": self.collection, "persist_dir": self.persist_dir, "partition": self.partition}
+
+    def __repr__(self) -> str:
+        return f"KBSpec({self.name!r}, collection={self.collection!r}, persist_dir={self.persist_dir!r}, partition={self.partition!r})"
+
+
+def load_catalog_file(path: str) -> Dict[str, Any]:
+    """Parse a catalog file into {"default": name, "specs": {name: KBSpec}}.
+
+    Format (relative paths are resolved against the file's directory; `persist_dir`
+    defaults to `<root>/<name>`, `root` to the file's directory)::
+
+        {"default": "procurement", "root": "kbs",
+         "kbs": {"procurement": {"collection": "knowledge_base", "persist_dir": ".chroma"},
+                 "regulations": {"collection": "regulations", "partition": "flat"}}}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    root = os.path.join(base, data.get("root") or ".")
+    specs: Dict[str, KBSpec] = {}
+    for name, cfg in (data.get("kbs") or {}).items():
+        cfg = cfg or {}
+        persist_dir = os.path.join(base, cfg["persist_dir"]) if cfg.get("persist_dir") else os.path.join(root, name)
+        specs[name] = KBSpec(
+            name,
+            collection=cfg.get("collection") or DEFAULT_COLLECTION,
+            persist_dir=os.path.normpath(persist_dir),
+            partition=cfg.get("partition") or "province",
+        )
+    if not specs:
+        raise ValueError(f"KB catalog {path} defines no knowledge bases")
+    default = data.get("default") or next(iter(specs))
+    if default not in specs:
+        raise ValueError(f"KB catalog {path}: default {default!r} is not defined")
+    return {"default": default, "specs": specs}
+
+
+class KBHandle:
+    """A KB in use: its spec, its plan table, and (opened on first use) its vectorstore.
+
+    A handle is bound to the index generation that was current when it was created
+    (`persist_dir`, `generation`); `superseded()` reports when another one was activated.
+    """
+
+    def __init__(self, spec: KBSpec, bytes_per_chunk: int) -> None:
+        self.spec = spec
+        self.pointer = pointer_mtime(spec.persist_dir)
+        current = current_generation(spec.persist_dir)
+        self.generation = current["generation"] if current else None
+        self.persist_dir = resolve_persist_dir(spec.persist_dir)
+        self.plans = PlanTable(os.path.join(self.persist_dir, "kb_registry.json"), partition=spec.partition)
+        self.bytes_per_chunk = bytes_per_chunk
+        self.last_used = time.monotonic()
+        self.leases = 0
+        self.chunks = 0
+        self.retired = False
+        self._checked = time.monotonic()
+        self._store = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._store is not None
+
+    @property
+    def vectorstore(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self.chunks = _registry_chunks(self.plans.path)
+                    self._store = _open_vectorstore(self.spec, self.persist_dir)
+        return self._store
+
+    def superseded(self) -> bool:
+        """Whether the persist root's `current` pointer changed since this handle was made
+        (checked at most every _GENERATION_CHECK_S)."""
+        now = time.monotonic()
+        if now - self._checked < _GENERATION_CHECK_S:
+            return False
+        self._checked = now
+        return pointer_mtime(self.spec.persist_dir) != self.pointer
+
+    def estimated_bytes(self) -> int:
+        """Resident estimate: registry chunk count (read at open) times the per-chunk cost; 0 when closed."""
+        return self.chunks * self.bytes_per_chunk if self._store is not None else 0
+
+    def close(self) -> None:
+        with self._lock:
+            store, self._store = self._store, None
+        if store is not None:
+            _close_vectorstore(store)
+
+
+def _registry_chunks(path: str) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("total_chunks") or 0)
+    except Exception:
+        return 0
+
+
+def _open_vectorstore(spec: KBSpec, persist_dir: str):
+    from langchain_chroma import Chroma
+
+    from src.llm.embeddings import get_langchain_embeddings
+    from src.utils.metrics import TimedEmbeddings
+
+    embeddings = TimedEmbeddings(get_langchain_embeddings())
+    log_debug(f"KB open | kb={spec.name} | collection={spec.collection} | dir={persist_dir}")
+    return Chroma(collection_name=spec.collection, persist_directory=persist_dir, embedding_function=embeddings)
+
+
+def _close_vectorstore(store) -> None:
+    # Releases this client's reference; chromadb stops the system (and frees its
+    # indexes) when the last client for the persist dir is closed
+    client = getattr(store, "_client", None)
+    close = getattr(client, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class KBCatalog:
+    """Knowledge bases served by one process, opened lazily and evicted LRU.
+
+    `get(name)` returns the KB's handle; its plan table is built on first use and its
+    vectorstore opened on first retrieval. When the open KBs' estimated resident size
+    exceeds `memory_budget_bytes`, or more than `max_open` are open, the least recently
+    used KBs that are not leased are closed (their handle is dropped; the next use
+    reopens). Use `lease(name)` around retrieval so a KB is not closed mid-query.
+    Evictions are counted as `kb_evicted{kb=<name>}`; `kb_open` and
+    `kb_resident_bytes` gauges track what is loaded.
+
+    When a new index generation is activated for a KB, the next `get` replaces its
+    handle; the old one is closed once its last lease is released (`kb_reloaded`).
+    """
+
+    def __init__(
+        self,
+        specs: Dict[str, KBSpec],
+        default: Optional[str] = None,
+        memory_budget_bytes: Optional[int] = None,
+        max_open: Optional[int] = None,
+        bytes_per_chunk: Optional[int] = None,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        s = kb_catalog_settings()
+        if not specs:
+            raise ValueError("KBCatalog needs at least one knowledge base")
+        self.specs = dict(specs)
+        self.default = default or next(iter(self.specs))
+        self.memory_budget_bytes = s["memory_budget_bytes"] if memory_budget_bytes is None else memory_budget_bytes
+        self.max_open = max(1, s["max_open"] if max_open is None else max_open)
+        self.bytes_per_chunk = s["bytes_per_chunk"] if bytes_per_chunk is None else bytes_per_chunk
+        self.registry = registry or get_metrics_registry()
+        self._handles: "OrderedDict[str, KBHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, registry: Optional[MetricsRegistry] = None) -> "KBCatalog":
+        """Catalog from MULTI_SEARCH_KB_CATALOG, else the single default KB under CHROMA_PERSIST_DIR."""
+        s = kb_catalog_settings()
+        if s["path"]:
+            parsed = load_catalog_file(s["path"])
+            return cls(parsed["specs"], default=parsed["default"], registry=registry)
+        persist_dir = os.getenv("CHROMA_PERSIST_DIR", CHROMA_PERSIST_DIR)
+        return cls({DEFAULT_KB: KBSpec(DEFAULT_KB, persist_dir=persist_dir)}, registry=registry)
+
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def spec(self, name: Optional[str] = None) -> KBSpec:
+        name = name or self.default
+        try:
+            return self.specs[name]
+        except KeyError:
+            raise UnknownKB(name) from None
+
+    def _get_locked(self, spec: KBSpec) -> Tuple[KBHandle, Optional[KBHandle]]:
+        """(current handle, superseded handle to retire or None); caller holds self._lock."""
+        retired = None
+        handle = self._handles.get(spec.name)
+        if handle is not None and handle.superseded():
+            retired, handle = handle, None
+        if handle is None:
+            handle = self._handles[spec.name] = KBHandle(spec, self.bytes_per_chunk)
+        self._handles.move_to_end(spec.name)
+        handle.last_used = time.monotonic()
+        return handle, retired
+
+    def _after_get(self, handle: KBHandle, retired: Optional[KBHandle]) -> None:
+        if retired is not None:
+            log_debug(f"KB reload | kb={handle.spec.name} | generation {retired.generation} -> {handle.generation}")
+            self.registry.inc("kb_reloaded", handle.spec.name, label="kb")
+            self._retire(retired)
+
+    def get(self, name: Optional[str] = None) -> KBHandle:
+        spec = self.spec(name)
+        with self._lock:
+            handle, retired = self._get_locked(spec)
+        self._after_get(handle, retired)
+        return handle
+
+    def _retire(self, handle: KBHandle) -> None:
+        # In-flight queries keep the old generation until they release their lease
+        with self._lock:
+            handle.retired = True
+            idle = handle.leases == 0
+        if idle:
+            handle.close()
+
+    def plans(self, name: Optional[str] = None) -> PlanTable:
+        return self.get(name).plans
+
+    def vectorstore(self, name: Optional[str] = None):
+        handle = self.get(name)
+        store = handle.vectorstore
+        self._enforce_budget(keep=handle.spec.name)
+        return store
+
+    @contextmanager
+    def lease(self, name: Optional[str] = None) -> Iterator[KBHandle]:
+        """The KB's handle with its vectorstore open, protected from eviction while held."""
+        spec = self.spec(name)
+        # Lookup and lease under one lock: eviction or a reload cannot close the
+        # handle between the two
+        with self._lock:
+            handle, retired = self._get_locked(spec)
+            handle.leases += 1
+        self._after_get(handle, retired)
+        try:
+            handle.vectorstore
+            self._enforce_budget(keep=handle.spec.name)
+            yield handle
+        finally:
+            with self._lock:
+                handle.leases -= 1
+                close = handle.retired and handle.leases == 0
+            if close:
+                handle.close()
+
+    def _enforce_budget(self, keep: Optional[str] = None) -> None:
+        with self._lock:
+            open_handles = [h for h in self._handles.values() if h.is_open]
+            resident = sum(h.estimated_bytes() for h in open_handles)
+            victims: List[KBHandle] = []
+            for h in open_handles:  # least recently used first
+                if resident <= self.memory_budget_bytes and len(open_handles) - len(victims) <= self.max_open:
+                    break
+                if h.spec.name == keep or h.leases > 0:
+                    continue
+                victims.append(h)
+                resident -= h.estimated_bytes()
+                self._handles.pop(h.spec.name, None)
+            self.registry.set_gauge("kb_open", "catalog", len(open_handles) - len(victims), label="component")
+            self.registry.set_gauge("kb_resident_bytes", "catalog", resident, label="component")
+        for h in victims:
+            log_debug(f"KB evict | kb={h.spec.name} | idle={time.monotonic() - h.last_used:.1f}s")
+            h.close()
+            self.registry.inc("kb_evicted", h.spec.name, label="kb")
+
+    def evict(self, name: str) -> bool:
+        with self._lock:
+            handle = self._handles.pop(name, None)
+        if handle is None:
+            return False
+        handle.close()
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            handles, self._handles = list(self._handles.values()), OrderedDict()
+        for h in handles:
+            h.close()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {"open": h.is_open, "generation": h.generation, "leases": h.leases, "estimated_bytes": h.estimated_bytes(), "idle_s": time.monotonic() - h.last_used}
+                for name, h in self._handles.items()
+            }
+
+
+_catalog: Optional[KBCatalog] = None
+_catalog_key: Optional[tuple] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> KBCatalog:
+    """Process-wide catalog; rebuilt when MULTI_SEARCH_KB_CATALOG or CHROMA_PERSIST_DIR changes."""
+    global _catalog, _catalog_key
+    key = (kb_catalog_settings()["path"], os.getenv("CHROMA_PERSIST_DIR", CHROMA_PERSIST_DIR))
+    with _catalog_lock:
+        if _catalog is None or _catalog_key != key:
+            if _catalog is not None:
+                _catalog.close()
+            _catalog, _catalog_key = KBCatalog.from_env(), key
+        return _catalog
+
+
+def reset_catalog() -> None:
+    global _catalog, _catalog_key
+    with _catalog_lock:
+        if _catalog is not None:
+            _catalog.close()
+        _catalog, _catalog_key = None, None
+
+
+__all__ = [
+    "DEFAULT_KB",
+    "KBCatalog",
+    "KBHandle",
+    "KBSpec",
+    "UnknownKB",
+    "get_catalog",
+    "load_catalog_file",
+    "reset_catalog",
+]
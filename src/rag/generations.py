@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# Layout of a persist root that serves index generations:
+#   <root>/generations/<id>/   one complete Chroma persist dir (+ kb_registry.json)
+#   <root>/current.json        {"generation": id, "path": "generations/<id>", ...}
+#   <root>/staging.json        generation being built (resumed by the next init)
+# A root without current.json is a plain persist dir (the collection lives in root).
+GENERATIONS_DIR = "generations"
+CURRENT_FILE = "current.json"
+STAGING_FILE = "staging.json"
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path: str, data: Dict) -> None:
+    # Readers see either the old file or the new one: write, fsync, rename, fsync the dir
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def generation_dir(root: str, generation: str) -> str:
+    return os.path.join(root, GENERATIONS_DIR, generation)
+
+
+def current_generation(root: str) -> Optional[Dict]:
+    """The published generation of root ({generation, path, ...}), or None for a plain persist dir."""
+    data = _read_json(os.path.join(root, CURRENT_FILE))
+    if not data or not data.get("generation"):
+        return None
+    return data
+
+
+def resolve_persist_dir(root: str) -> str:
+    """Directory holding the live collection: the current generation, else root itself."""
+    current = current_generation(root)
+    if current is None:
+        return root
+    return generation_dir(root, current["generation"])
+
+
+def pointer_mtime(root: str) -> Optional[int]:
+    """mtime (ns) of root's current pointer; cheap change detection for readers."""
+    try:
+        return os.stat(os.path.join(root, CURRENT_FILE)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def list_generations(root: str) -> List[str]:
+    """Generation ids under root, oldest first (ids sort by creation time)."""
+    try:
+        names = os.listdir(os.path.join(root, GENERATIONS_DIR))
+    except OSError:
+        return []
+    return sorted(n for n in names if os.path.isdir(generation_dir(root, n)))
+
+
+def _seed(root: str, target: str) -> Optional[str]:
+    """Copy the live collection into target so unchanged chunks are not re-embedded."""
+    current = current_generation(root)
+    if current is not None:
+        source = generation_dir(root, current["generation"])
+        if os.path.isdir(source):
+            shutil.copytree(source, target, dirs_exist_ok=True)
+            return current["generation"]
+        return None
+    if os.path.exists(os.path.join(root, "chroma.sqlite3")):
+        # Legacy layout: the collection sits directly in root
+        skip = {GENERATIONS_DIR, CURRENT_FILE, STAGING_FILE}
+        shutil.copytree(root, target, ignore=lambda d, names: [n for n in names if d == root and n in skip], dirs_exist_ok=True)
+        return "legacy"
+    return None
+
+
+def staging_generation(root: str) -> Optional[Dict]:
+    """The unfinished staging generation of root ({generation, path, base, ...}), or None."""
+    staging = _read_json(os.path.join(root, STAGING_FILE))
+    if not staging or not staging.get("generation") or not os.path.isdir(generation_dir(root, staging["generation"])):
+        return None
+    current = current_generation(root)
+    if current and current["generation"] == staging["generation"]:
+        return None
+    return {**staging, "path": generation_dir(root, staging["generation"])}
+
+
+def begin_staging(root: str, seed: bool = True) -> Dict:
+    """Directory to build the next generation in: {generation, path, base, resumed}.
+
+    An unfinished staging generation (left by an interrupted init) is resumed; otherwise
+    a new one is created, seeded with a copy of the live collection unless `seed` is
+    False (reset). The live generation is never written to.
+    """
+    staging = staging_generation(root)
+    if staging is not None:
+        return {**staging, "resumed": True}
+    now = time.time_ns()
+    generation = time.strftime("%Y%m%d-%H%M%S", time.localtime(now / 1e9)) + f"-{now % 10**9:09d}"
+    path = generation_dir(root, generation)
+    os.makedirs(path)
+    base = _seed(root, path) if seed else None
+    info = {"generation": generation, "base": base, "created": time.time()}
+    _write_json_atomic(os.path.join(root, STAGING_FILE), info)
+    return {**info, "path": path, "resumed": False}
+
+
+def abandon_staging(root: str) -> None:
+    """Forget the staging generation (its directory is kept for inspection, then pruned)."""
+    try:
+        os.remove(os.path.join(root, STAGING_FILE))
+    except OSError:
+        pass
+
+
+def activate(root: str, generation: str, info: Optional[Dict] = None) -> Dict:
+    """Atomically point root's `current` at generation; readers switch on their next check."""
+    if not os.path.isdir(generation_dir(root, generation)):
+        raise FileNotFoundError(generation_dir(root, generation))
+    previous = current_generation(root)
+    pointer = {
+        **(info or {}),
+        "generation": generation,
+        "path": os.path.join(GENERATIONS_DIR, generation),
+        "previous": previous["generation"] if previous else None,
+        "activated": time.time(),
+    }
+    _write_json_atomic(os.path.join(root, CURRENT_FILE), pointer)
+    staging = _read_json(os.path.join(root, STAGING_FILE))
+    if staging and staging.get("generation") == generation:
+        abandon_staging(root)
+    return pointer
+
+
+def prune_generations(root: str, keep: int = 2) -> List[str]:
+    """Delete all but the current generation and the `keep` newest others; returns deleted ids.
+
+    Old generations are kept for a while so that readers still holding them (until
+    their next pointer check) and rollbacks (`activate` an older id) keep working.
+    """
+    current = current_generation(root)
+    protected = {current["generation"]} if current else set()
+    staging = _read_json(os.path.join(root, STAGING_FILE))
+    if staging and staging.get("generation"):
+        protected.add(staging["generation"])
+    others = [g for g in list_generations(root) if g not in protected]
+    doomed = others[: max(0, len(others) - keep)]
+    for g in doomed:
+        shutil.rmtree(generation_dir(root, g), ignore_errors=True)
+    return doomed
+
+
+__all__ = [
+    "CURRENT_FILE",
+    "GENERATIONS_DIR",
+    "STAGING_FILE",
+    "abandon_staging",
+    "activate",
+    "begin_staging",
+    "current_generation",
+    "generation_dir",
+    "list_generations",
+    "pointer_mtime",
+    "prune_generations",
+    "resolve_persist_dir",
+    "staging_generation",
+]
@@ -3,11 +3,16 @@ import os
 import json
 from src.geo.region import REGION_PATTERNS
 from src.config import CHROMA_PERSIST_DIR
+from src.rag.generations import resolve_persist_dir
 
 
-def _load_provinces_from_registry() -> List[str]:
+def registry_path() -> str:
     persist_dir = os.getenv("CHROMA_PERSIST_DIR", CHROMA_PERSIST_DIR)
-    path = os.path.join(persist_dir, "kb_registry.json")
+    return os.path.join(resolve_persist_dir(persist_dir), "kb_registry.json")
+
+
+def _load_provinces_from_registry(path: Optional[str] = None) -> List[str]:
+    path = path or registry_path()
     try:
         with open(path, "r", encoding="utf-8") as f:
             data = json.load(f)
@@ -50,7 +55,7 @@ def build_partition_filters(province: Optional[str]) -> List[Dict]:
         ]
 
 
-def build_partition_filters_precise(province: Optional[str]) -> List[Dict]:
+def build_partition_filters_precise(province: Optional[str], provinces_all: Optional[List[str]] = None) -> List[Dict]:
     """
     精确版过滤器构造：第三组直接用元数据过滤排除目标省份，避免“先取topK再后置过滤”。
 
@@ -60,8 +65,10 @@ def build_partition_filters_precise(province: Optional[str]) -> List[Dict]:
       2) 目标地域文档：{"province": <省份>}
       3) 其他地域文档：{"$and": [{"kb_type": "regional"}, {"province": {"$in": 可穷举地域且不含目标省份}}]}
     - 若省份为 None：分两组（与原版一致）
+    - provinces_all：可穷举地域列表，缺省时读取注册表（查询计划表预先传入，避免每次读盘）
     """
-    provinces_all = _load_provinces_from_registry()
+    if provinces_all is None:
+        provinces_all = _load_provinces_from_registry()
     if province and province in provinces_all:
         provinces_others = [p for p in provinces_all if p != province]
         return [
@@ -82,4 +89,24 @@ def build_partition_filters_precise(province: Optional[str]) -> List[Dict]:
             {"name": "others", "where": {"kb_type": "regional"}},
         ]
 
-__all__ = ["build_partition_filters", "build_partition_filters_precise"]
\ No newline at end of file
+def build_flat_filters(province: Optional[str] = None, provinces_all: Optional[List[str]] = None) -> List[Dict]:
+    """
+    不分地域的单组过滤器：适用于没有省份划分的知识库（如制度汇编、法规库）。
+    """
+    return [{"name": "all", "where": None}]
+
+
+# 知识库目录（src/rag/catalog.py）中每个知识库按名称选择划分规则
+PARTITION_RULES = {
+    "province": build_partition_filters_precise,
+    "flat": build_flat_filters,
+}
+
+
+__all__ = [
+    "PARTITION_RULES",
+    "build_flat_filters",
+    "build_partition_filters",
+    "build_partition_filters_precise",
+    "registry_path",
+]
\ No newline at end of file
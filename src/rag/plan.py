@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.geo.region import extract_province
+from src.rag.partition import PARTITION_RULES, _load_provinces_from_registry, registry_path
+
+# Registry mtime is checked at most this often; edits take effect within one interval
+_CHECK_INTERVAL_S = 1.0
+
+
+class FrozenDict(dict):
+    """Read-only dict for shared filter definitions.
+
+    Still a `dict`, so Chroma's where validation and `json.dumps` accept it as is.
+    Nested lists (the `$in` operand) stay lists because Chroma requires them; treat
+    them as read-only too.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_freeze(v) for v in value]
+    return value
+
+
+class QueryPlan:
+    """Precompiled retrieval plan for one province (or None): the frozen group filters."""
+
+    __slots__ = ("province", "filters_list", "group_names")
+
+    def __init__(self, province: Optional[str], filters_list: Iterable[Dict[str, Any]]) -> None:
+        self.province = province
+        self.filters_list: Tuple[FrozenDict, ...] = tuple(_freeze(f) for f in filters_list)
+        self.group_names: Tuple[str, ...] = tuple(f["name"] for f in self.filters_list)
+
+    def __repr__(self) -> str:
+        return f"QueryPlan(province={self.province!r}, groups={list(self.group_names)})"
+
+
+class PlanTable:
+    """Province → QueryPlan, built once from the KB registry.
+
+    One plan per registered province plus the no-province plan (about 35 entries), so
+    the plan stage is a dict lookup instead of a registry read and filter rebuild per
+    request. The table is rebuilt when kb_registry.json changes (mtime, checked at most
+    once per second). Provinces outside the registry (explicit overrides) are planned
+    on first use and kept until the next rebuild. `partition` names the rule in
+    `PARTITION_RULES` that turns a province into groups.
+    """
+
+    def __init__(self, path: Optional[str] = None, partition: str = "province") -> None:
+        self.path = path or registry_path()
+        self.partition = partition
+        self._build_filters = PARTITION_RULES[partition]
+        self._lock = threading.Lock()
+        self._plans: Dict[Optional[str], QueryPlan] = {}
+        self._provinces: List[str] = []
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+        self.builds = 0
+        self._build()
+
+    def _registry_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def _build(self) -> None:
+        self._mtime = self._registry_mtime()
+        provinces = _load_provinces_from_registry(self.path)
+        plans: Dict[Optional[str], QueryPlan] = {None: QueryPlan(None, self._build_filters(None, provinces))}
+        for p in provinces:
+            plans[p] = QueryPlan(p, self._build_filters(p, provinces))
+        self._provinces = provinces
+        self._plans = plans
+        self._checked = time.monotonic()
+        self.builds += 1
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild if the registry changed since the last build; returns True when rebuilt."""
+        with self._lock:
+            if not force:
+                now = time.monotonic()
+                if now - self._checked < _CHECK_INTERVAL_S:
+                    return False
+                self._checked = now
+                if self._registry_mtime() == self._mtime:
+                    return False
+            self._build()
+            return True
+
+    def get(self, province: Optional[str]) -> QueryPlan:
+        self.refresh()
+        plan = self._plans.get(province)
+        if plan is None:
+            with self._lock:
+                plan = self._plans.get(province)
+                if plan is None:
+                    plan = QueryPlan(province, self._build_filters(province, self._provinces))
+                    self._plans = {**self._plans, province: plan}
+        return plan
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def provinces(self) -> List[str]:
+        return list(self._provinces)
+
+
+def get_plan_table(kb: Optional[str] = None) -> PlanTable:
+    """Plan table of a knowledge base in the process-wide catalog (default KB when None)."""
+    from src.rag.catalog import get_catalog
+
+    return get_catalog().plans(kb)
+
+
+@lru_cache(maxsize=4096)
+def resolve_province(question: str) -> Optional[str]:
+    """extract_province memoized on the question text (repeat questions are common)."""
+    return extract_province(question)
+
+
+def reset_plan_state() -> None:
+    """Drop the catalog (plan tables, open vectorstores) and memoized provinces (tests, re-init)."""
+    from src.rag.catalog import reset_catalog
+
+    reset_catalog()
+    resolve_province.cache_clear()
+
+
+__all__ = [
+    "FrozenDict",
+    "PlanTable",
+    "QueryPlan",
+    "get_plan_table",
+    "reset_plan_state",
+    "resolve_province",
+]
@@ -2,50 +2,44 @@ import argparse
 import json
 from typing import Dict, List, Optional
 
-import os
 import time
 from dotenv import load_dotenv
 
-from langchain_chroma import Chroma
-
-from src.config import CHROMA_PERSIST_DIR
-from src.llm.embeddings import get_langchain_embeddings
-from src.utils.log import setup_run_logging, log_info
-
 
 def simple_query(
     question: str,
     top_k: int = 4,
     where: Optional[Dict] = None,
+    kb: Optional[str] = None,
 ) -> List[Dict]:
-    """Query the knowledge_base collection via LangChain Chroma and return top-k chunks.
+    """Query a knowledge base's collection (default KB when kb is None) and return top-k chunks.
 
     Returns a list of items with: id, distance, text, kb_type, province, source_name, chunk_id.
     """
-    load_dotenv()
+    from src.rag.catalog import get_catalog
 
-    persist_dir = os.getenv("CHROMA_PERSIST_DIR", CHROMA_PERSIST_DIR)
-    embeddings = get_langchain_embeddings()
-    vectorstore = Chroma(collection_name="knowledge_base", persist_directory=persist_dir, embedding_function=embeddings)
+    load_dotenv()
 
     where_arg = where if (where and len(where) > 0) else None
 
-    # Use embed_query and relevance scores per LangChain API recommendation
-    query_vec = embeddings.embed_query(question)
-
-    # Lightweight retry around vector search to handle transient failures
-    last_err: Optional[Exception] = None
-    for attempt in range(3):
-        try:
-            results = vectorstore.similarity_search_by_vector_with_relevance_scores(query_vec, k=top_k, filter=where_arg)
-            break
-        except Exception as e:
-            last_err = e
-            if attempt < 2:
-                time.sleep(0.3 * (attempt + 1))
-                continue
-            else:
-                raise
+    with get_catalog().lease(kb) as handle:
+        vectorstore = handle.vectorstore
+        # Use embed_query and relevance scores per LangChain API recommendation
+        query_vec = vectorstore.embeddings.embed_query(question)
+
+        # Lightweight retry around vector search to handle transient failures
+        last_err: Optional[Exception] = None
+        for attempt in range(3):
+            try:
+                results = vectorstore.similarity_search_by_vector_with_relevance_scores(query_vec, k=top_k, filter=where_arg)
+                break
+            except Exception as e:
+                last_err = e
+                if attempt < 2:
+                    time.sleep(0.3 * (attempt + 1))
+                    continue
+                else:
+                    raise
 
     out: List[Dict] = []
     for doc, score in results:
@@ -74,8 +68,11 @@ def main():
     parser.add_argument("-k", "--top-k", type=int, default=3, help="Top-k results")
     parser.add_argument("--kb-type", choices=["core", "regional"], help="Filter by kb_type")
     parser.add_argument("--province", help="Filter by province")
+    parser.add_argument("--kb", default=None, help="Knowledge base name from the KB catalog (default KB if omitted)")
     args = parser.parse_args()
 
+    from src.utils.log import setup_run_logging, log_info
+
     log_path = setup_run_logging(label=args.q, run_type="q")
 
     where: Dict = {}
@@ -84,7 +81,7 @@ def main():
     if args.province:
         where["province"] = args.province
 
-    results = simple_query(args.q, top_k=args.top_k, where=where or None)
+    results = simple_query(args.q, top_k=args.top_k, where=where or None, kb=args.kb)
     log_info(json.dumps(results, ensure_ascii=False, indent=2))
     print(f"查询完成，详情见日志：{log_path}")
 
@@ -0,0 +1 @@
+"""Query service layer: scheduling and admission around the pipeline stages."""
@@ -0,0 +1,356 @@
+"""Coordinator: runs the query pipeline over several query workers (src/service/worker.py).
+
+Planning and question embedding run locally; retrieval is fanned out to the workers that
+own each group's provinces and merged on distance; LLM summarization is load-balanced
+across the workers (each with its own Ollama endpoints). `stages()` has the same shape as
+`build_stage_runnables`, so `QueryScheduler(stages=coordinator.stages())` adds admission
+control on top.
+
+    python -m src.service.coordinator --workers http://127.0.0.1:8101,http://127.0.0.1:8102 --q "四川..."
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from langchain_core.runnables import RunnableLambda
+
+from src.config import LLM_SUMMARY_MODES, distributed_settings
+from src.pipeline.types import as_contexts
+from src.rag.catalog import DEFAULT_KB
+from src.rag.partition import PARTITION_RULES, build_partition_filters_precise
+from src.rag.plan import QueryPlan, resolve_province
+from src.utils.log import log_debug
+from src.utils.metrics import MetricsRegistry, get_metrics_registry
+
+
+class WorkerUnavailable(RuntimeError):
+    """Raised when no worker can serve a retrieval: every routed request failed, or no
+    healthy worker holds the KB."""
+
+
+class WorkerClient:
+    """One worker as seen by the coordinator: its health document and load."""
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.info: Dict[str, Any] = {}
+        self.healthy = False
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+
+    def kb(self, name: str) -> Optional[Dict[str, Any]]:
+        return (self.info.get("kbs") or {}).get(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "name": self.info.get("name"),
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+def merge_group(results: Sequence[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """Nearest `top_k` items over several shards' results (by `score`, a distance);
+    a chunk returned by more than one worker (replicas) is kept once."""
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for item in sorted((it for r in results for it in r), key=lambda it: it.get("score", float("inf"))):
+        key = item.get("ref") or item.get("text")
+        if key in seen:
+            continue
+        seen.add(key)
+        merged.append(item)
+        if len(merged) >= top_k:
+            break
+    return merged
+
+
+class Coordinator:
+    """Fan-out of retrieval and summarization across query workers.
+
+    Routing uses each worker's health document (per KB: provinces and kb_types in its
+    shard, refreshed every `refresh_s`): `core` goes to workers holding core documents,
+    `target_region` to the owners of the question's province, `other_regions`/`others`
+    to every worker holding some other province, any other group (e.g. flat `all`) to
+    every worker with the KB. Each worker gets one request with all its groups. A worker
+    that fails is marked unhealthy until the next refresh and the answer is built from
+    the other shards (`partial=True` while any worker is down, counter `worker_errors`;
+    carried through `summarize` to the chain's result). When no worker can answer at
+    all, `retrieve` raises WorkerUnavailable instead of returning empty groups.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[Sequence[str]] = None,
+        timeout_s: Optional[float] = None,
+        refresh_s: Optional[float] = None,
+        registry: Optional[MetricsRegistry] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+    ) -> None:
+        s = distributed_settings()
+        urls = list(workers) if workers else s["workers"]
+        if not urls:
+            raise ValueError("Coordinator needs at least one worker URL (MULTI_SEARCH_WORKERS)")
+        self.workers = [WorkerClient(u) for u in urls]
+        self.refresh_s = s["refresh_s"] if refresh_s is None else refresh_s
+        self.registry = registry or get_metrics_registry()
+        self._http = httpx.Client(
+            timeout=httpx.Timeout(s["timeout_s"] if timeout_s is None else timeout_s, connect=5.0),
+            limits=httpx.Limits(max_connections=8 * len(urls), max_keepalive_connections=8 * len(urls)),
+            trust_env=False,
+            transport=transport,
+        )
+        self._pool = ThreadPoolExecutor(max_workers=max(4, 2 * len(urls)), thread_name_prefix="coordinator")
+        self._lock = threading.Lock()
+        self._rr = itertools.count()
+        self._refreshed = 0.0
+        self._plans: Dict[tuple, QueryPlan] = {}
+
+    # -- worker state -------------------------------------------------------------------
+
+    def refresh(self, force: bool = False) -> None:
+        """Re-read every worker's health document (at most every refresh_s unless forced)."""
+        if not force and time.monotonic() - self._refreshed < self.refresh_s:
+            return
+
+        def probe(w: WorkerClient) -> None:
+            try:
+                resp = self._http.get(w.base_url + "/health")
+                resp.raise_for_status()
+                # A worker still warming up reports ready=false: no traffic until it is warm
+                w.info = resp.json()
+                w.healthy = bool(w.info.get("ready", True))
+            except Exception as e:
+                w.healthy = False
+                log_debug(f"Coordinator health failed | {w.base_url} | {type(e).__name__}: {e}")
+
+        list(self._pool.map(probe, self.workers))
+        with self._lock:
+            self._refreshed = time.monotonic()
+            self._plans.clear()  # shard ownership may have changed
+        log_debug("Coordinator workers | " + ", ".join(f"{w.base_url}={'up' if w.healthy else 'down'}" for w in self.workers))
+
+    def _holders(self, kb: str) -> List[WorkerClient]:
+        return [w for w in self.workers if w.healthy and w.kb(kb) is not None]
+
+    def default_kb(self) -> str:
+        self.refresh()
+        for w in self.workers:
+            if w.healthy and w.info.get("default_kb"):
+                return w.info["default_kb"]
+        return DEFAULT_KB
+
+    def provinces(self, kb: str) -> List[str]:
+        """Provinces held by any worker for kb, in first-seen order."""
+        out: List[str] = []
+        for w in self._holders(kb):
+            for p in w.kb(kb).get("provinces", []):
+                if p not in out:
+                    out.append(p)
+        return out
+
+    def _route(self, kb: str, group: str, province: Optional[str]) -> List[WorkerClient]:
+        holders = self._holders(kb)
+        if group == "core":
+            return [w for w in holders if "core" in w.kb(kb).get("kb_types", [])]
+        if group == "target_region":
+            return [w for w in holders if province in w.kb(kb).get("provinces", [])]
+        if group in ("other_regions", "others"):
+            return [w for w in holders if any(p != province for p in w.kb(kb).get("provinces", []))]
+        return holders
+
+    def _post(self, w: WorkerClient, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            w.inflight += 1
+            w.requests += 1
+        failed = True
+        try:
+            resp = self._http.post(w.base_url + path, json=payload)
+            resp.raise_for_status()
+            failed = False
+            return resp.json()
+        finally:
+            with self._lock:
+                w.inflight -= 1
+                if failed:
+                    w.failures += 1
+                    w.healthy = False
+            if failed:
+                self.registry.inc("worker_errors", w.base_url, label="worker")
+
+    # -- pipeline stages ----------------------------------------------------------------
+
+    def plan(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        self.refresh()
+        kb = inputs.get("kb") or self.default_kb()
+        province = inputs.get("province") or resolve_province(inputs["question"])
+        key = (kb, province)
+        plan = self._plans.get(key)
+        if plan is None:
+            holders = self._holders(kb)
+            partition = holders[0].kb(kb).get("partition", "province") if holders else "province"
+            build = PARTITION_RULES.get(partition, build_partition_filters_precise)
+            plan = QueryPlan(province, build(province, self.provinces(kb)))
+            with self._lock:
+                self._plans[key] = plan
+        log_debug(f"Coordinator plan | kb={kb} | province={province} | groups={', '.join(plan.group_names)}")
+        return {**inputs, "province": province, "kb": kb, "filters_list": plan.filters_list}
+
+    def retrieve(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        kb = inputs["kb"]
+        province = inputs.get("province")
+        top_k = inputs.get("top_k") or 3
+        filters_list = inputs["filters_list"]
+        vec = inputs.get("question_vector")
+        if vec is None:
+            from src.llm.embeddings import get_langchain_embeddings
+
+            vec = get_langchain_embeddings().embed_query(inputs["question"])
+
+        # One request per worker carrying every group routed to it
+        requests: Dict[WorkerClient, List[Dict[str, Any]]] = {}
+        for f in filters_list:
+            for w in self._route(kb, f["name"], province):
+                requests.setdefault(w, []).append({"name": f["name"], "where": f.get("where")})
+
+        def call(item):
+            w, groups = item
+            try:
+                return self._post(w, "/retrieve", {"kb": kb, "vector": list(vec), "top_k": top_k, "groups": groups})["groups"]
+            except Exception as e:
+                log_debug(f"Coordinator retrieve failed | {w.base_url} | {type(e).__name__}: {e}")
+                return None
+
+        if not requests:
+            raise WorkerUnavailable(f"no healthy worker holds kb {kb!r}")
+        t0 = time.perf_counter()
+        responses = list(self._pool.map(call, requests.items()))
+        self.registry.observe("fanout", time.perf_counter() - t0)
+        if all(r is None for r in responses):
+            # Nothing retrieved anywhere: an empty answer would look like a valid one
+            raise WorkerUnavailable(f"all {len(responses)} workers failed for kb {kb!r}")
+        # Partial: a shard failed now, or a worker is down and its shard was not asked
+        partial = any(r is None for r in responses) or any(not w.healthy for w in self.workers)
+        contexts = as_contexts(
+            {"name": f["name"], "where": f.get("where"), "results": merge_group([r.get(f["name"], []) for r in responses if r is not None], top_k)}
+            for f in filters_list
+        )
+        log_debug(
+            f"Coordinator retrieve | workers={len(requests)} | partial={partial} | "
+            + ", ".join(f"{g.name}={len(g.results)}" for g in contexts)
+        )
+        return {
+            "question": inputs["question"],
+            "province": province,
+            "kb": kb,
+            "contexts": contexts,
+            "summary_mode": inputs.get("summary_mode"),
+            "partial": partial,
+        }
+
+    def _pick_summarizer(self, exclude: Sequence[WorkerClient]) -> Optional[WorkerClient]:
+        with self._lock:
+            pool = [w for w in self.workers if w.healthy and w not in exclude]
+            if not pool:
+                return None
+            start = next(self._rr)
+            ordered = [pool[(start + i) % len(pool)] for i in range(len(pool))]
+            return min(ordered, key=lambda w: w.inflight)
+
+    def summarize(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        from src.config import summary_mode as default_summary_mode
+        from src.pipeline.chain import _summarize_and_refs
+
+        mode = inputs.get("summary_mode") or default_summary_mode()
+        # Carried to the final result: the answer was built from a subset of the shards
+        partial = bool(inputs.get("partial"))
+        if mode in LLM_SUMMARY_MODES:
+            payload = {"question": inputs.get("question"), "province": inputs.get("province"), "summary_mode": mode}
+            payload["contexts"] = as_contexts(inputs.get("contexts") or []).to_dicts()
+            tried: List[WorkerClient] = []
+            while True:
+                w = self._pick_summarizer(tried)
+                if w is None:
+                    break
+                tried.append(w)
+                try:
+                    out = self._post(w, "/summarize", payload)
+                    return {"question": out["question"], "summary": out["summary"], "references": out["references"], "partial": partial}
+                except Exception as e:
+                    log_debug(f"Coordinator summarize failed | {w.base_url} | {type(e).__name__}: {e}")
+            log_debug("Coordinator summarize | no worker available, summarizing locally")
+        # Non-LLM modes (and the last resort) need no model: run them here
+        return {**_summarize_and_refs({**inputs, "summary_mode": mode}), "partial": partial}
+
+    def stages(self, callbacks: Optional[List] = None) -> Dict[str, Any]:
+        """plan / embed / retrieve / summarize runnables (see build_stage_runnables)."""
+        from src.pipeline.chain import _embed_question
+
+        callbacks = list(callbacks or [])
+
+        def stage(fn, name: str):
+            return RunnableLambda(fn).with_config(run_name=name, tags=["pipeline", "distributed"], callbacks=callbacks)
+
+        return {
+            "plan": stage(self.plan, "CoordinatorPlan"),
+            "embed": stage(_embed_question, "EmbedQuestion"),
+            "retrieve": stage(self.retrieve, "FanOutRetrieve"),
+            "summarize": stage(self.summarize, "RemoteSummarize"),
+        }
+
+    def build_chain(self, callbacks: Optional[List] = None, profile_rate: Optional[float] = None):
+        """The distributed query chain; `profile_rate` as in `build_app_chain`."""
+        from src.utils.profiling import get_profiling_callback
+
+        callbacks = list(callbacks or [])
+        profiler = get_profiling_callback(rate=profile_rate)
+        if profiler.rate > 0:
+            callbacks.append(profiler)
+        stages = self.stages(callbacks)
+        chain = stages["plan"] | stages["embed"] | stages["retrieve"] | stages["summarize"]
+        return chain.with_config(run_name="DistributedChain", tags=["app"], callbacks=callbacks)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [w.snapshot() for w in self.workers]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+        self._http.close()
+
+
+def main():
+    import argparse
+    import json
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Query across several query workers")
+    parser.add_argument("--workers", default=None, help="Comma-separated worker URLs (default MULTI_SEARCH_WORKERS)")
+    parser.add_argument("--q", required=True)
+    parser.add_argument("-k", "--top-k", type=int, default=3)
+    parser.add_argument("--province", default=None)
+    parser.add_argument("--kb", default=None)
+    parser.add_argument("--summary-mode", default=None)
+    args = parser.parse_args()
+    urls = [u.strip() for u in args.workers.split(",") if u.strip()] if args.workers else None
+    coordinator = Coordinator(urls)
+    try:
+        out = coordinator.build_chain().invoke(
+            {"question": args.q, "top_k": args.top_k, "province": args.province, "kb": args.kb, "summary_mode": args.summary_mode}
+        )
+        print(json.dumps({**out, "workers": coordinator.snapshot()}, ensure_ascii=False, indent=2))
+    finally:
+        coordinator.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""CPU offload: run the CPU-bound summary stages in a process pool.
+
+In a threaded server the JSON repair/parse of the LLM output, the markdown rendering and
+extractive scoring hold the GIL and stall the threads that only wait on Ollama or Chroma.
+With MULTI_SEARCH_CPU_OFFLOAD=N those stages run in N worker processes instead, and the
+request thread just waits on a future (the GIL is released while it blocks).
+
+Messages are kept compact: contexts are cut down to the fields the stage reads (group
+name, source_name, chunk_id and text; parse/render only needs each chunk's leading
+sentence), so a request ships a few KB instead of its full retrieval payload. Payloads
+below `min_chars` stay inline, where pickling would cost more than the work itself.
+
+Stage timings measured in the child (`summary_parse`, `summary_render`, ...) are folded
+into the parent's registry; the rest of the round trip is recorded as `offload_wait`.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config import cpu_offload_settings
+from src.pipeline.types import Contexts, ContextsLike, GroupResult, RetrievedChunk, as_contexts
+from src.utils.log import log_debug
+from src.utils.metrics import MetricsRegistry, get_metrics_registry
+
+_in_child = False
+
+
+def _lead(text: Optional[str]) -> str:
+    """Shortest prefix of text with the same fallback bullet: its first sentence, else its first 60 chars."""
+    t = (text or "").strip()
+    i = t.find("。")
+    return t if i < 0 else t[: max(i + 1, 61)]
+
+
+def compact_contexts(contexts: ContextsLike, full_text: bool = False) -> Contexts:
+    """Contexts reduced to what summary rendering reads; `full_text` keeps whole chunks
+    (extractive scoring needs every sentence)."""
+    out = Contexts()
+    for g in as_contexts(contexts):
+        chunks = [
+            RetrievedChunk(c.text if full_text else _lead(c.text), c.source_name, c.chunk_id, ref=c.ref)
+            for c in g.results
+        ]
+        out.append(GroupResult(g.name, None, chunks, g.index))
+    return out
+
+
+def context_chars(contexts: ContextsLike) -> int:
+    return as_contexts(contexts).text_chars()
+
+
+def _init_child() -> None:
+    global _in_child
+    _in_child = True
+    # Import once per process so the first task does not pay for it
+    import src.pipeline.extractive  # noqa: F401
+    import src.pipeline.summary  # noqa: F401
+
+
+def _run_task(fn: Callable, args: Tuple) -> Tuple[Any, Dict[str, float], float]:
+    registry = get_metrics_registry()
+    registry.reset()
+    t0 = time.perf_counter()
+    out = fn(*args)
+    busy = time.perf_counter() - t0
+    timings = {stage: registry.histogram(stage).total for stage in registry.stages()}
+    return out, timings, busy
+
+
+def _noop() -> int:
+    return 0
+
+
+class CPUOffload:
+    """Process pool for module-level CPU-bound functions (picklable arguments and result).
+
+    `call(fn, *args)` blocks the calling thread until a worker process returns. If the
+    pool breaks (a child was killed), the call runs inline and the pool is recreated.
+    """
+
+    def __init__(self, processes: int, min_chars: int = 4096, registry: Optional[MetricsRegistry] = None) -> None:
+        self.processes = max(1, processes)
+        self.min_chars = min_chars
+        self.registry = registry or get_metrics_registry()
+        # No plain fork: the parent is multi-threaded (HTTP pools, logging, schedulers)
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=self._ctx, initializer=_init_child)
+
+    def worth(self, chars: int) -> bool:
+        return chars >= self.min_chars
+
+    def call(self, fn: Callable, *args: Any) -> Any:
+        pool = self._pool
+        t0 = time.perf_counter()
+        try:
+            out, timings, busy = pool.submit(_run_task, fn, args).result()
+        except BrokenProcessPool as e:
+            log_debug(f"CPU offload pool broken, running inline | {fn.__name__} | {e}")
+            self.registry.inc("offload_errors", fn.__name__, label="function")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = self._new_pool()
+            pool.shutdown(wait=False)
+            return fn(*args)
+        for stage, seconds in timings.items():
+            self.registry.observe(stage, seconds)
+        self.registry.observe("offload_wait", max(0.0, time.perf_counter() - t0 - busy))
+        return out
+
+    def warm(self) -> None:
+        """Start every worker process (and its imports) ahead of the first request."""
+        for fut in [self._pool.submit(_noop) for _ in range(self.processes)]:
+            fut.result()
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+_offload: Optional[CPUOffload] = None
+_offload_key: Optional[Tuple] = None
+_offload_lock = threading.Lock()
+
+
+def get_offload() -> Optional[CPUOffload]:
+    """Process-wide offload pool configured from env; None when disabled (or in a worker process)."""
+    global _offload, _offload_key
+    if _in_child:
+        return None
+    s = cpu_offload_settings()
+    if s["processes"] <= 0:
+        return None
+    key = (s["processes"], s["min_chars"])
+    with _offload_lock:
+        if _offload is None or _offload_key != key:
+            if _offload is not None:
+                _offload.close()
+            _offload = CPUOffload(s["processes"], s["min_chars"])
+            _offload_key = key
+            log_debug(f"CPU offload | processes={s['processes']} | min_chars={s['min_chars']}")
+        return _offload
+
+
+def offload_for(chars: int) -> Optional[CPUOffload]:
+    """The offload pool if enabled and a payload of `chars` is worth shipping, else None."""
+    offload = get_offload()
+    return offload if offload is not None and offload.worth(chars) else None
+
+
+def reset_offload() -> None:
+    global _offload, _offload_key
+    with _offload_lock:
+        if _offload is not None:
+            _offload.close()
+        _offload = None
+        _offload_key = None
+
+
+__all__ = [
+    "CPUOffload",
+    "compact_contexts",
+    "context_chars",
+    "get_offload",
+    "offload_for",
+    "reset_offload",
+]
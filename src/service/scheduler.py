@@ -0,0 +1,221 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.config import LLM_SUMMARY_MODES, scheduler_settings, summary_mode as default_summary_mode
+from src.pipeline.normalize import normalize_question
+from src.utils.log import log_debug
+from src.utils.metrics import MetricsRegistry, get_metrics_registry
+from src.utils.singleflight import SingleFlight
+
+QUEUED_STAGES = ("embed", "retrieve", "summarize")
+
+
+class QueryRejected(RuntimeError):
+    """Raised when a request is shed: the stage queue is full or its deadline cannot be met."""
+
+    def __init__(self, stage: str, reason: str) -> None:
+        self.stage = stage
+        self.reason = reason
+        super().__init__(f"query rejected at {stage}: {reason}")
+
+
+class StageQueue:
+    """Bounded wait queue plus concurrency cap for one pipeline stage.
+
+    At most `concurrency` requests run the stage at once and at most `max_queue` wait for
+    a slot. A request that finds the queue full, or that cannot get a slot within its
+    timeout, raises QueryRejected. Depth and in-flight counts are published as gauges
+    (`queue_depth`, `inflight`); wait and service times as `queue_wait[<stage>]` and
+    `service[<stage>]` histograms.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, registry: MetricsRegistry) -> None:
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.registry = registry
+        self.waiting = 0
+        self.running = 0
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.concurrency)
+        self._publish()
+
+    def _publish(self) -> None:
+        self.registry.set_gauge("queue_depth", self.name, self.waiting)
+        self.registry.set_gauge("inflight", self.name, self.running)
+
+    def wait_estimate(self) -> float:
+        """Expected queueing delay for a new arrival: work ahead of it spread over the slots."""
+        with self._lock:
+            ahead = self.waiting + (1 if self.running >= self.concurrency else 0)
+        if ahead == 0:
+            return 0.0
+        h = self.registry.histogram(f"service[{self.name}]")
+        mean = (h.total / h.count) if h is not None and h.count else 0.0
+        return ahead * mean / self.concurrency
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        with self._lock:
+            if self.waiting >= self.max_queue and self.running >= self.concurrency:
+                raise QueryRejected(self.name, "queue_full")
+            self.waiting += 1
+            self._publish()
+        t0 = time.perf_counter()
+        ok = self._slots.acquire() if timeout is None else self._slots.acquire(timeout=max(0.0, timeout))
+        with self._lock:
+            self.waiting -= 1
+            if ok:
+                self.running += 1
+            self._publish()
+        self.registry.observe(f"queue_wait[{self.name}]", time.perf_counter() - t0)
+        if not ok:
+            raise QueryRejected(self.name, "deadline")
+        t1 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registry.observe(f"service[{self.name}]", time.perf_counter() - t1)
+            with self._lock:
+                self.running -= 1
+                self._publish()
+            self._slots.release()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"waiting": self.waiting, "running": self.running, "concurrency": self.concurrency, "max_queue": self.max_queue}
+
+
+class QueryScheduler:
+    """Admission control around the pipeline stages for long-running services.
+
+    Each request runs plan (inline) → embed → retrieve → summarize, with embed, retrieve
+    and summarize behind their own `StageQueue`. Before each queued stage the scheduler
+    checks that the time left until the request's deadline covers the expected queueing
+    delay plus the p95 service time of that stage and the ones after it (learned from
+    the metrics registry). When it does not:
+
+    - embed / retrieve: the request is rejected (QueryRejected); there are no contexts to
+      degrade to yet.
+    - summarize (LLM modes): the request is degraded to "extractive", or to "retrieval"
+      when even that does not fit; with `degrade=False` it is rejected instead.
+
+    The result is the chain's output plus `tier` (the summary mode actually used) and
+    `degraded`. Rejections and degradations are counted (`rejected`, `degraded`).
+
+    With `coalesce`, concurrent requests with the same normalized (question, province,
+    top_k, summary mode, kb) share one execution, run under the first request's deadline;
+    the others wait at most until their own deadline and get `coalesced=True`.
+    """
+
+    def __init__(
+        self,
+        embed_concurrency: Optional[int] = None,
+        retrieve_concurrency: Optional[int] = None,
+        summarize_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        deadline_s: Optional[float] = None,
+        summary_mode: Optional[str] = None,
+        degrade: bool = True,
+        callbacks: Optional[List] = None,
+        registry: Optional[MetricsRegistry] = None,
+        stages: Optional[Dict[str, Any]] = None,
+        coalesce: bool = True,
+    ) -> None:
+        s = scheduler_settings()
+        self.registry = registry or get_metrics_registry()
+        self.deadline_s = s["deadline_s"] if deadline_s is None else deadline_s
+        self.summary_mode = summary_mode
+        self.degrade = degrade
+        limit = s["max_queue"] if max_queue is None else max_queue
+        caps = {
+            "embed": s["embed_concurrency"] if embed_concurrency is None else embed_concurrency,
+            "retrieve": s["retrieve_concurrency"] if retrieve_concurrency is None else retrieve_concurrency,
+            "summarize": s["summarize_concurrency"] if summarize_concurrency is None else summarize_concurrency,
+        }
+        self.queues = {name: StageQueue(name, caps[name], limit, self.registry) for name in QUEUED_STAGES}
+        if stages is None:
+            from src.pipeline.chain import build_stage_runnables
+
+            stages = build_stage_runnables(callbacks)
+        self.stages = stages
+        self._flight = SingleFlight("query", self.registry) if coalesce else None
+
+    def _p95(self, key: str) -> float:
+        h = self.registry.histogram(f"service[{key}]")
+        return h.percentile(0.95) if h is not None else 0.0
+
+    def _run_queued(self, name: str, state: Dict[str, Any], left: Callable[[], float], after: float) -> Dict[str, Any]:
+        q = self.queues[name]
+        # Time this stage may spend waiting: what is left minus its own and later stages' p95
+        budget = left() - after - self._p95(name)
+        if budget <= 0 or budget < q.wait_estimate():
+            raise QueryRejected(name, "deadline")
+        with q.slot(timeout=budget):
+            return self.stages[name].invoke(state)
+
+    def _summarize(self, state: Dict[str, Any], mode: str, left: Callable[[], float]) -> Tuple[Dict[str, Any], str]:
+        if mode in LLM_SUMMARY_MODES:
+            # Keep room for the extractive fallback when waiting on an LLM slot
+            after = self._p95("extractive") if self.degrade else 0.0
+            try:
+                return self._run_queued("summarize", {**state, "summary_mode": mode}, left, after=after), mode
+            except QueryRejected:
+                if not self.degrade:
+                    raise
+            mode = "extractive"
+        if mode == "extractive" and left() < self._p95("extractive"):
+            mode = "retrieval"
+        with self.registry.timer(f"service[{mode}]"):
+            return self.stages["summarize"].invoke({**state, "summary_mode": mode}), mode
+
+    def run(
+        self,
+        question: str,
+        top_k: int = 3,
+        province: Optional[str] = None,
+        deadline_s: Optional[float] = None,
+        summary_mode: Optional[str] = None,
+        kb: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        budget = self.deadline_s if deadline_s is None else deadline_s
+        requested = summary_mode or self.summary_mode or default_summary_mode()
+        if self._flight is None:
+            return {**self._run(question, top_k, province, budget, requested, kb), "coalesced": False}
+        key = (normalize_question(question), province, top_k, requested, kb)
+        try:
+            out, shared = self._flight.do(key, lambda: self._run(question, top_k, province, budget, requested, kb), timeout=max(0.0, budget))
+        except TimeoutError:
+            self.registry.inc("rejected", "coalesce:deadline", label="reason")
+            raise QueryRejected("coalesce", "deadline")
+        return {**out, "coalesced": shared}
+
+    def _run(self, question: str, top_k: int, province: Optional[str], budget: float, requested: str, kb: Optional[str] = None) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        deadline = t0 + budget
+
+        def left() -> float:
+            return deadline - time.perf_counter()
+
+        state = self.stages["plan"].invoke({"question": question, "top_k": top_k, "province": province, "kb": kb, "summary_mode": requested})
+        try:
+            state = self._run_queued("embed", state, left, after=self._p95("retrieve"))
+            state = self._run_queued("retrieve", state, left, after=0.0)
+            out, tier = self._summarize(state, requested, left)
+        except QueryRejected as e:
+            self.registry.inc("rejected", f"{e.stage}:{e.reason}", label="reason")
+            log_debug(f"Scheduler reject | stage={e.stage} | reason={e.reason} | waited={time.perf_counter() - t0:.3f}s")
+            raise
+        if tier != requested:
+            self.registry.inc("degraded", f"{requested}->{tier}", label="transition")
+            log_debug(f"Scheduler degrade | {requested} -> {tier} | left={left():.3f}s")
+        self.registry.observe("request", time.perf_counter() - t0)
+        return {**out, "tier": tier, "degraded": tier != requested}
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {name: q.snapshot() for name, q in self.queues.items()}
+
+
+__all__ = ["QueryRejected", "QueryScheduler", "StageQueue"]
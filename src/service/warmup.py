@@ -0,0 +1,151 @@
+"""Warm-up: make a node fast for its first query before it reports ready.
+
+After a deploy the first query pays for Ollama loading the embedding and generation
+models and for Chroma loading the HNSW index from disk. `warm_up()` does that work up
+front, in order:
+
+1. models: a keep-alive preload of the embedding and generation models on every Ollama
+   endpoint (`OllamaClient.preload`, `keep_alive` from MULTI_SEARCH_WARMUP_KEEP_ALIVE);
+2. index: reads every file of each KB's active index generation (page cache), then
+   opens its vectorstore;
+3. queries: embeds one synthetic question and runs the retrieval of every partition
+   plan (no province, then each province) against each KB.
+
+Query workers started with `--warmup` (or MULTI_SEARCH_WARMUP=1) serve `/health` at once
+but answer `/ready` with 503, and report `"ready": false` so the coordinator routes no
+traffic to them, until warm-up has finished. `python src/app.py --warmup` runs it
+from the command line.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.config import warmup_settings
+from src.utils.log import log_debug
+from src.utils.metrics import MetricsRegistry, get_metrics_registry
+
+_READ_BLOCK = 1 << 20
+
+
+def touch_files(path: str) -> int:
+    """Read every file under `path` once so its pages are in the OS cache; returns bytes read."""
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                with open(os.path.join(root, name), "rb", buffering=0) as f:
+                    while True:
+                        block = f.read(_READ_BLOCK)
+                        if not block:
+                            break
+                        total += len(block)
+            except OSError:
+                continue
+    return total
+
+
+def preload_models(keep_alive: Optional[str] = None, client=None) -> Dict[str, List[Dict[str, Any]]]:
+    """Preload the embedding and generation models on every Ollama endpoint."""
+    from src.llm.client import get_shared_client
+    from src.llm.embeddings import embed_model
+    from src.llm.generation import llm_model
+
+    client = client or get_shared_client()
+    keep_alive = keep_alive or warmup_settings()["keep_alive"]
+    # Same resolution as the query path, so the models warmed are the ones queries use
+    return {
+        "embed": client.preload(embed_model(), "embed", keep_alive),
+        "generate": client.preload(llm_model(), "generate", keep_alive),
+    }
+
+
+def touch_index(catalog, kb: str) -> int:
+    """Page in one KB's active index files and open its vectorstore; returns bytes read."""
+    handle = catalog.get(kb)
+    read = touch_files(handle.persist_dir)
+    catalog.vectorstore(kb)
+    return read
+
+
+def synthetic_queries(catalog, kb: str, vector: Sequence[float], top_k: int = 1) -> int:
+    """Run the retrieval of every partition plan of `kb` once; returns the number of plans."""
+    plans = catalog.plans(kb)
+    provinces: List[Optional[str]] = [None, *plans.provinces()]
+    with catalog.lease(kb) as handle:
+        store = handle.vectorstore
+        for province in provinces:
+            for f in plans.get(province).filters_list:
+                store.similarity_search_by_vector(list(vector), k=top_k, filter=f.get("where"))
+    return len(provinces)
+
+
+def warm_up(
+    catalog=None,
+    kbs: Optional[Sequence[str]] = None,
+    keep_alive: Optional[str] = None,
+    question: Optional[str] = None,
+    models: bool = True,
+    index: bool = True,
+    client=None,
+    embeddings=None,
+    registry: Optional[MetricsRegistry] = None,
+) -> Dict[str, Any]:
+    """Run the warm-up steps (see module docstring) and return a report.
+
+    `kbs` defaults to every KB in the catalog. A failing step is recorded under
+    `errors` and the remaining steps still run, so the index is warm once the cause
+    is fixed; callers gating readiness treat any error as a failed warm-up.
+    Step durations are recorded as `warmup[models]`, `warmup[index]`, `warmup[queries]`.
+    """
+    registry = registry or get_metrics_registry()
+    s = warmup_settings()
+    report: Dict[str, Any] = {"errors": []}
+    t0 = time.perf_counter()
+
+    if models:
+        with registry.timer("warmup[models]"):
+            report["models"] = preload_models(keep_alive or s["keep_alive"], client)
+        for kind, rows in report["models"].items():
+            report["errors"].extend(f"preload {kind} {r['base_url']}: {r['error']}" for r in rows if not r["ok"])
+
+    if index:
+        if catalog is None:
+            from src.rag.catalog import get_catalog
+
+            catalog = get_catalog()
+        names = list(kbs) if kbs else catalog.names()
+        report["index"] = {}
+        with registry.timer("warmup[index]"):
+            for kb in names:
+                try:
+                    report["index"][kb] = {"bytes": touch_index(catalog, kb)}
+                except Exception as e:
+                    report["errors"].append(f"index {kb}: {type(e).__name__}: {e}")
+
+        vector = None
+        try:
+            if embeddings is None:
+                from src.llm.embeddings import get_langchain_embeddings
+
+                embeddings = get_langchain_embeddings()
+            vector = embeddings.embed_query(question or s["question"])
+        except Exception as e:
+            report["errors"].append(f"embed question: {type(e).__name__}: {e}")
+        if vector is not None:
+            with registry.timer("warmup[queries]"):
+                for kb in names:
+                    if kb not in report["index"]:
+                        continue
+                    try:
+                        report["index"][kb]["plans"] = synthetic_queries(catalog, kb, vector)
+                    except Exception as e:
+                        report["errors"].append(f"queries {kb}: {type(e).__name__}: {e}")
+
+    report["seconds"] = time.perf_counter() - t0
+    log_debug(f"Warm-up done | {report['seconds']:.2f}s | index={report.get('index')} | errors={len(report['errors'])}")
+    for err in report["errors"]:
+        log_debug(f"Warm-up error | {err}")
+    return report
+
+
+__all__ = ["preload_models", "synthetic_queries", "touch_files", "touch_index", "warm_up"]
@@ -0,0 +1,256 @@
+"""Query worker: serves retrieval and summarization for the knowledge bases of one process.
+
+A worker owns a shard of the corpus: its KB catalog (MULTI_SEARCH_KB_CATALOG, or
+CHROMA_PERSIST_DIR) holds only the provinces ingested into it (`python -m
+src.data_init.cli --provinces ...`), and its summaries use its own Ollama endpoints
+(OLLAMA_BASE_URL). The coordinator (src/service/coordinator.py) fans queries out to
+workers over HTTP/JSON:
+
+- `GET /health`: worker name, readiness and, per KB, the provinces and kb_types it holds.
+- `GET /ready`: 200 once the worker is warmed up (see src/service/warmup.py), else 503
+  (with the warm-up errors if it failed).
+- `POST /retrieve`: `{kb, vector, top_k, groups: [{name, where}]}` → per-group items
+  with their distance (`score`, lower is closer), nearest first.
+- `POST /summarize`: `{question, province, contexts, summary_mode}` → `{question, summary, references}`.
+
+    python -m src.service.worker --port 8101 --name shard-a [--warmup]
+"""
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import warmup_settings
+from src.utils.log import log_debug
+from src.utils.metrics import MetricsRegistry, get_metrics_registry
+
+
+def _registry_info(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        data = {}
+    return {
+        "provinces": list(data.get("provinces") or []),
+        "kb_types": list(data.get("kb_types") or []),
+        "total_chunks": int(data.get("total_chunks") or 0),
+    }
+
+
+class QueryWorker:
+    """Retrieval and summarization over this process's KB catalog (no HTTP; see WorkerServer)."""
+
+    def __init__(self, catalog=None, name: Optional[str] = None, registry: Optional[MetricsRegistry] = None, max_parallel: int = 8) -> None:
+        if catalog is None:
+            from src.rag.catalog import get_catalog
+
+            catalog = get_catalog()
+        self.catalog = catalog
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.registry = registry or get_metrics_registry()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="worker-retrieve")
+        self._ready = threading.Event()
+        self._ready.set()
+        self.warmup_report: Optional[Dict[str, Any]] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def warmup_errors(self) -> List[str]:
+        return list((self.warmup_report or {}).get("errors") or [])
+
+    def warm_up(self, **kwargs: Any) -> Dict[str, Any]:
+        """Not ready until models, index pages and one query per plan are warm (see warm_up).
+
+        The worker becomes ready only if every step succeeded; otherwise it stays not
+        ready (503 on /ready, with the errors) until a later warm_up() succeeds.
+        """
+        from src.service.warmup import warm_up
+
+        self._ready.clear()
+        try:
+            self.warmup_report = warm_up(self.catalog, registry=self.registry, **kwargs)
+        except Exception as e:
+            self.warmup_report = {"errors": [f"warm-up: {type(e).__name__}: {e}"]}
+        if not self.warmup_errors:
+            self._ready.set()
+        return self.warmup_report
+
+    def health(self) -> Dict[str, Any]:
+        kbs: Dict[str, Any] = {}
+        for kb in self.catalog.names():
+            handle = self.catalog.get(kb)
+            kbs[kb] = {**_registry_info(handle.plans.path), "generation": handle.generation, "partition": handle.spec.partition}
+        out = {"name": self.name, "ready": self.ready, "default_kb": self.catalog.default, "kbs": kbs}
+        if not self.ready and self.warmup_errors:
+            out["warmup_errors"] = self.warmup_errors
+        return out
+
+    def retrieve(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        from src.pipeline.types import RetrievedChunk
+
+        groups: List[Dict[str, Any]] = req.get("groups") or []
+        top_k = int(req.get("top_k") or 3)
+        vec = req["vector"]
+        t0 = time.perf_counter()
+        with self.catalog.lease(req.get("kb")) as kb:
+            store = kb.vectorstore
+
+            def search(group: Dict[str, Any]) -> List[Dict[str, Any]]:
+                # Chroma returns (doc, distance); distances from shards built with the
+                # same embedding model are directly comparable
+                hits = store.similarity_search_by_vector_with_relevance_scores(vec, k=top_k, filter=group.get("where"))
+                return [RetrievedChunk.from_doc(doc, float(score)).to_dict() for doc, score in hits]
+
+            results = list(self._pool.map(search, groups))
+        self.registry.observe("worker_retrieve", time.perf_counter() - t0)
+        log_debug(f"Worker retrieve | kb={kb.spec.name} | " + ", ".join(f"{g.get('name')}={len(r)}" for g, r in zip(groups, results)))
+        return {"worker": self.name, "groups": {g.get("name"): r for g, r in zip(groups, results)}}
+
+    def summarize(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        from src.pipeline.chain import _summarize_and_refs
+
+        t0 = time.perf_counter()
+        out = _summarize_and_refs(
+            {
+                "question": req["question"],
+                "province": req.get("province"),
+                "contexts": req.get("contexts") or [],
+                "summary_mode": req.get("summary_mode"),
+            }
+        )
+        self.registry.observe("worker_summarize", time.perf_counter() - t0)
+        return {**out, "worker": self.name}
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MultiSearchWorker/0.1"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # quiet
+        pass
+
+    @property
+    def worker(self) -> QueryWorker:
+        return self.server.worker  # type: ignore[attr-defined]
+
+    def _send_json(self, obj, status: int = 200) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b"{}"
+        return json.loads(raw.decode("utf-8") or "{}")
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/health":
+            self._send_json(self.worker.health())
+        elif path == "/ready":
+            ready = self.worker.ready
+            body: Dict[str, Any] = {"ready": ready}
+            if not ready and self.worker.warmup_errors:
+                body["errors"] = self.worker.warmup_errors
+            self._send_json(body, 200 if ready else 503)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        handler = {"/retrieve": self.worker.retrieve, "/summarize": self.worker.summarize}.get(path)
+        if handler is None:
+            self._send_json({"error": "not found"}, 404)
+            return
+        try:
+            req = self._read_json()
+        except ValueError as e:
+            self._send_json({"error": f"bad request: {e}"}, 400)
+            return
+        try:
+            self._send_json(handler(req))
+        except KeyError as e:  # unknown KB, missing field
+            self._send_json({"error": f"bad request: {e}"}, 400)
+        except Exception as e:
+            log_debug(f"Worker error | path={path} | {type(e).__name__}: {e}")
+            self._send_json({"error": f"{type(e).__name__}: {e}"}, 500)
+
+
+class WorkerServer:
+    """Threaded HTTP front for a QueryWorker; use as a context manager or call start()/stop()."""
+
+    def __init__(self, worker: Optional[QueryWorker] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.worker = worker or QueryWorker()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.worker = self.worker  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.httpd.server_address[:2]  # type: ignore[return-value]
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "WorkerServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="query-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.worker.close()
+
+    def __enter__(self) -> "WorkerServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve retrieval/summarization for this process's knowledge bases")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101, help="0 picks a free port (printed on startup)")
+    parser.add_argument("--name", default=None, help="Worker name reported to the coordinator")
+    parser.add_argument("--warmup", action="store_true", default=None, help="Warm models and index before reporting ready (default MULTI_SEARCH_WARMUP)")
+    args = parser.parse_args()
+    server = WorkerServer(QueryWorker(name=args.name), args.host, args.port)
+    warm = warmup_settings()["enabled"] if args.warmup is None else args.warmup
+    if warm:
+        # Serve /health and /ready (503) while warming, so orchestration sees the node
+        server.worker._ready.clear()
+        threading.Thread(target=server.worker.warm_up, name="worker-warmup", daemon=True).start()
+    print(f"Query worker listening on {server.base_url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
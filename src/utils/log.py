@@ -1,15 +1,26 @@
+import atexit
 import logging
+import logging.handlers
 import os
 import json
+import queue
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from langchain_core.callbacks import BaseCallbackHandler
 
-from src.config import PROJECT_ROOT
+from src.config import PROJECT_ROOT, log_mode
 
 _logger: Optional[logging.Logger] = None
 _log_path: Optional[str] = None
+# Handlers installed by setup_run_logging, removed again on re-initialization so
+# long-running processes do not accumulate one handler (and open file) per call.
+_installed: List[logging.Handler] = []
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# Bounds applied to previews *before* serialization
+_PREVIEW_MAX_ITEMS = 8
+_PREVIEW_MAX_DEPTH = 4
 
 
 def _sanitize_label(label: Optional[str]) -> str:
@@ -19,45 +30,91 @@ def _sanitize_label(label: Optional[str]) -> str:
     return s or "run"
 
 
-def setup_run_logging(label: Optional[str] = None, debug: bool = True, run_type: str = "q") -> str:
+def _teardown_handlers() -> None:
+    """Detach and close handlers installed by a previous setup_run_logging call."""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
+    for name in ("multi_search", "langchain"):
+        lg = logging.getLogger(name)
+        for h in list(lg.handlers):
+            if h in _installed:
+                lg.removeHandler(h)
+    for h in _installed:
+        try:
+            h.close()
+        except Exception:
+            pass
+    _installed.clear()
+
+
+def setup_run_logging(
+    label: Optional[str] = None,
+    debug: bool = True,
+    run_type: str = "q",
+    queued: Optional[bool] = None,
+    per_run: bool = True,
+) -> str:
     """Setup per-run file logging for app and LangChain.
 
-    - Creates output/log/<type>_<timestamp>.log (type in {q, init_data})
-    - Attaches a FileHandler to 'multi_search' and 'langchain' loggers
+    - Creates output/log/<type>_<timestamp>.log (type in {q, init_data});
+      with per_run=False appends to output/log/<type>.log instead
+    - Attaches a FileHandler to 'multi_search' and 'langchain' loggers; when queued
+      (default from MULTI_SEARCH_LOG_MODE=queue) loggers only enqueue records and a
+      single QueueListener thread performs formatting and file I/O
+    - Re-initialization replaces previously installed handlers instead of stacking them
     - Returns the absolute log file path
     """
-    global _logger, _log_path
+    global _logger, _log_path, _listener
 
     base_dir = os.path.dirname(PROJECT_ROOT)
     log_dir = os.path.join(base_dir, "output", "log")
     os.makedirs(log_dir, exist_ok=True)
 
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     # Filename follows required format: type_time
     rtype = run_type if run_type in ("q", "init_data") else "q"
-    filename = f"{rtype}_{ts}.log"
+    if per_run:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{rtype}_{ts}.log"
+    else:
+        filename = f"{rtype}.log"
     log_path = os.path.join(log_dir, filename)
 
+    _teardown_handlers()
+    level = logging.DEBUG if debug else logging.INFO
+
     # File handler
     fh = logging.FileHandler(log_path, encoding="utf-8")
-    fh.setLevel(logging.DEBUG if debug else logging.INFO)
+    fh.setLevel(level)
     formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s")
     fh.setFormatter(formatter)
+    _installed.append(fh)
+
+    if queued is None:
+        queued = log_mode() == "queue"
+    handler: logging.Handler = fh
+    if queued:
+        q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(q)
+        handler.setLevel(level)
+        _installed.append(handler)
+        _listener = logging.handlers.QueueListener(q, fh, respect_handler_level=True)
+        _listener.start()
 
     # App logger
     app_logger = logging.getLogger("multi_search")
-    app_logger.setLevel(logging.DEBUG if debug else logging.INFO)
-    # Avoid duplicate file handlers if reinitialized
-    for h in list(app_logger.handlers):
-        if isinstance(h, logging.FileHandler):
-            app_logger.removeHandler(h)
-    app_logger.addHandler(fh)
+    app_logger.setLevel(level)
+    app_logger.addHandler(handler)
     app_logger.propagate = False
 
     # LangChain logger (captures LCEL debug trees)
     lc_logger = logging.getLogger("langchain")
-    lc_logger.setLevel(logging.DEBUG if debug else logging.INFO)
-    lc_logger.addHandler(fh)
+    lc_logger.setLevel(level)
+    lc_logger.addHandler(handler)
 
     _logger = app_logger
     _log_path = log_path
@@ -67,6 +124,14 @@ def setup_run_logging(label: Optional[str] = None, debug: bool = True, run_type:
     return log_path
 
 
+def shutdown_logging() -> None:
+    """Flush the background writer (if any) and close installed handlers."""
+    _teardown_handlers()
+
+
+atexit.register(shutdown_logging)
+
+
 def get_log_path() -> Optional[str]:
     return _log_path
 
@@ -81,6 +146,51 @@ def log_debug(msg: str) -> None:
         _logger.debug(msg)
 
 
+def _bounded(obj, budget: List[int], depth: int):
+    """Return a size-bounded, JSON-friendly copy of obj.
+
+    budget is a one-element list holding the remaining character allowance shared by
+    all strings in the payload; once exhausted, remaining values collapse to "...".
+    """
+    if obj is None or isinstance(obj, (bool, int, float)):
+        return obj
+    if budget[0] <= 0:
+        return "..."
+    if isinstance(obj, str):
+        n = budget[0]
+        budget[0] -= min(len(obj), n)
+        return obj if len(obj) <= n else obj[:n] + f"...({len(obj)} chars)"
+    if depth >= _PREVIEW_MAX_DEPTH:
+        return f"<{type(obj).__name__}>"
+    if hasattr(obj, "page_content"):
+        return {
+            "metadata": _bounded(getattr(obj, "metadata", None), budget, depth + 1),
+            "page_content": _bounded(getattr(obj, "page_content", ""), budget, depth + 1),
+        }
+    if isinstance(obj, dict):
+        out = {}
+        for i, (k, v) in enumerate(obj.items()):
+            if i >= _PREVIEW_MAX_ITEMS or budget[0] <= 0:
+                out["..."] = f"{len(obj) - i} more"
+                break
+            out[str(k)] = _bounded(v, budget, depth + 1)
+        return out
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        seq = list(obj) if isinstance(obj, (set, frozenset)) else obj
+        out_l = []
+        for i, v in enumerate(seq):
+            if i >= _PREVIEW_MAX_ITEMS or budget[0] <= 0:
+                out_l.append(f"...({len(seq) - i} more)")
+                break
+            out_l.append(_bounded(v, budget, depth + 1))
+        return out_l
+    slots = getattr(type(obj), "__slots__", None)
+    if slots:
+        # Pipeline result objects (src/pipeline/types.py): preview their fields
+        return _bounded({s: getattr(obj, s, None) for s in slots}, budget, depth)
+    return _bounded(str(obj), budget, depth)
+
+
 class LCELFileCallback(BaseCallbackHandler):
     """Lightweight LangChain callback handler that logs inputs/outputs of each step.
 
@@ -93,11 +203,16 @@ class LCELFileCallback(BaseCallbackHandler):
         self.preview_limit = preview_limit
         self._names = {}
 
+    def _enabled(self) -> bool:
+        return self.logger.isEnabledFor(logging.DEBUG)
+
     def _p(self, obj) -> str:
+        # Shrink first (bounded work regardless of payload size), then serialize
+        budget = [self.preview_limit]
         try:
-            s = json.dumps(obj, ensure_ascii=False, default=str)
+            s = json.dumps(_bounded(obj, budget, 0), ensure_ascii=False, default=str)
         except Exception:
-            s = str(obj)
+            s = str(obj)[: self.preview_limit]
         if isinstance(s, str) and len(s) > self.preview_limit:
             s = s[: self.preview_limit] + f"...({len(s)} chars)"
         return s
@@ -123,6 +238,8 @@ class LCELFileCallback(BaseCallbackHandler):
 
     # Chains / runnables
     def on_chain_start(self, serialized, inputs, run_id, **kwargs):
+        if not self._enabled():
+            return
         name = kwargs.get("name")
         if not name and isinstance(serialized, dict):
             name = serialized.get("id", {}).get("name") or serialized.get("name")
@@ -132,11 +249,15 @@ class LCELFileCallback(BaseCallbackHandler):
 
     def on_chain_end(self, outputs, run_id, **kwargs):
         name = self._names.pop(run_id, kwargs.get("name") or "Runnable")
+        if not self._enabled():
+            return
         tags = kwargs.get("tags") or []
         self._log(logging.DEBUG, f"LCEL end | {name} | tags={tags} | outputs={self._p(outputs)}")
 
     # Retrievers
     def on_retriever_start(self, serialized, query, run_id, **kwargs):
+        if not self._enabled():
+            return
         name = kwargs.get("name") or "Retriever"
         filt = self._extract_search_filter(serialized)
         filt_s = self._p(filt) if filt is not None else "None"
@@ -144,6 +265,8 @@ class LCELFileCallback(BaseCallbackHandler):
         self._log(logging.DEBUG, f"{name} start | tags={tags} | query={self._p(query)} | filter={filt_s}")
 
     def on_retriever_end(self, documents, run_id, **kwargs):
+        if not self._enabled():
+            return
         name = kwargs.get("name") or "Retriever"
         tags = kwargs.get("tags") or []
         try:
@@ -162,11 +285,15 @@ class LCELFileCallback(BaseCallbackHandler):
 
     # LLMs
     def on_llm_start(self, serialized, prompts, run_id, **kwargs):
+        if not self._enabled():
+            return
         name = kwargs.get("name") or "LLM"
         p0 = prompts[0] if prompts else ""
         self._log(logging.DEBUG, f"{name} start | prompt[0]={self._p(p0)} | prompts={len(prompts) if prompts is not None else 0}")
 
     def on_llm_end(self, response, run_id, **kwargs):
+        if not self._enabled():
+            return
         name = kwargs.get("name") or "LLM"
         text = None
         try:
@@ -0,0 +1,299 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+
+# Relative precision of histogram buckets (HDR-style log-linear bucketing):
+# each recorded value is stored in a bucket whose bounds differ by at most 1%.
+_DEFAULT_PRECISION = 0.01
+_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """In-memory HDR-style latency histogram (seconds).
+
+    Values are bucketed on a logarithmic scale with a fixed relative error, so memory
+    stays bounded (a few hundred buckets) regardless of how many samples are recorded,
+    while percentiles keep ~1% precision from microseconds up to minutes.
+    """
+
+    def __init__(self, precision: float = _DEFAULT_PRECISION, min_value: float = 1e-6) -> None:
+        self.precision = precision
+        self.min_value = min_value
+        self._log_base = math.log1p(precision)
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        return int(math.log(max(value, self.min_value) / self.min_value) / self._log_base)
+
+    def _upper(self, index: int) -> float:
+        return self.min_value * math.exp((index + 1) * self._log_base)
+
+    def record(self, value: float) -> None:
+        idx = self._index(value)
+        self._buckets[idx] = self._buckets.get(idx, 0) + 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for idx, n in other._buckets.items():
+            self._buckets[idx] = self._buckets.get(idx, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for idx in sorted(self._buckets):
+            seen += self._buckets[idx]
+            if seen >= rank:
+                return min(self._upper(idx), self.max)
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "mean": (self.total / self.count) if self.count else 0.0,
+            **{f"p{int(q * 100)}": self.percentile(q) for q in _QUANTILES},
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe collection of per-stage latency histograms, plus labeled gauges and
+    counters (`{metric: {key: value}}`) for queue depths and admission outcomes.
+
+    Each gauge/counter has one label; its name is given by the caller (`stage` unless
+    the key is something else, such as a worker URL or a hit/miss outcome).
+    """
+
+    def __init__(self, precision: float = _DEFAULT_PRECISION) -> None:
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._hists: Dict[str, LatencyHistogram] = {}
+        self._gauges: Dict[str, Dict[str, float]] = {}
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._labels: Dict[str, str] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            h = self._hists.get(stage)
+            if h is None:
+                h = self._hists[stage] = LatencyHistogram(self.precision)
+            h.record(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def set_gauge(self, metric: str, key: str, value: float, label: str = "stage") -> None:
+        with self._lock:
+            self._gauges.setdefault(metric, {})[key] = value
+            self._labels[metric] = label
+
+    def inc(self, metric: str, key: str, n: float = 1, label: str = "stage") -> None:
+        with self._lock:
+            series = self._counters.setdefault(metric, {})
+            series[key] = series.get(key, 0) + n
+            self._labels[metric] = label
+
+    def gauges(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {m: dict(v) for m, v in self._gauges.items()}
+
+    def counters(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {m: dict(v) for m, v in self._counters.items()}
+
+    def stages(self) -> List[str]:
+        with self._lock:
+            return sorted(self._hists)
+
+    def histogram(self, stage: str) -> Optional[LatencyHistogram]:
+        with self._lock:
+            return self._hists.get(stage)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists.clear()
+            self._gauges.clear()
+            self._counters.clear()
+            self._labels.clear()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: h.snapshot() for name, h in sorted(self._hists.items())}
+
+    def to_prometheus(self, metric: str = "multi_search_stage_latency_seconds") -> str:
+        """Render histograms as Prometheus text exposition (summary type), then the
+        gauges and counters (`multi_search_<metric>`, counters suffixed `_total`)."""
+        lines: List[str] = [
+            f"# HELP {metric} Wall time per pipeline stage in seconds.",
+            f"# TYPE {metric} summary",
+        ]
+        for stage, snap in self.snapshot().items():
+            label = _escape_label(stage)
+            for q in _QUANTILES:
+                lines.append(f'{metric}{{stage="{label}",quantile="{q}"}} {snap[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'{metric}_sum{{stage="{label}"}} {snap["sum"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{label}"}} {snap["count"]}')
+        with self._lock:
+            labels = dict(self._labels)
+        for kind, series in (("gauge", self.gauges()), ("counter", self.counters())):
+            for name, values in sorted(series.items()):
+                full = f"multi_search_{name}"
+                if kind == "counter" and not full.endswith("_total"):
+                    full += "_total"
+                label = labels.get(name, "stage")
+                lines.append(f"# TYPE {full} {kind}")
+                for key, v in sorted(values.items()):
+                    lines.append(f'{full}{{{label}="{_escape_label(key)}"}} {v:g}')
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"stages": self.snapshot(), "gauges": self.gauges(), "counters": self.counters()},
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    def export(self, path: str) -> str:
+        """Write metrics to path; `.prom`/`.txt` → Prometheus text, otherwise JSON."""
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        content = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+
+def _escape_label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _registry
+
+
+def stage_timer(stage: str):
+    """Context manager timing a block into the process-wide registry."""
+    return _registry.timer(stage)
+
+
+class LatencyMetricsCallback(BaseCallbackHandler):
+    """LangChain callback recording wall time per named runnable, retriever and LLM call.
+
+    Start/end events are matched by run_id, so the handler may be attached both at step
+    and chain level (as `build_app_chain` does) without double counting.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None) -> None:
+        self.registry = registry or _registry
+        self._starts: Dict[object, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, stage: str) -> None:
+        with self._lock:
+            if run_id not in self._starts:
+                self._starts[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id) -> None:
+        with self._lock:
+            entry = self._starts.pop(run_id, None)
+        if entry is not None:
+            stage, t0 = entry
+            self.registry.observe(stage, time.perf_counter() - t0)
+
+    def on_chain_start(self, serialized, inputs, run_id, **kwargs):
+        name = kwargs.get("name")
+        if not name and isinstance(serialized, dict):
+            name = serialized.get("name")
+        self._start(run_id, name or "Runnable")
+
+    def on_chain_end(self, outputs, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, run_id, **kwargs):
+        with self._lock:
+            self._starts.pop(run_id, None)
+
+    def on_retriever_start(self, serialized, query, run_id, **kwargs):
+        self._start(run_id, kwargs.get("name") or "Retriever")
+
+    def on_retriever_end(self, documents, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_error(self, error, run_id, **kwargs):
+        with self._lock:
+            self._starts.pop(run_id, None)
+
+    def on_llm_start(self, serialized, prompts, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_end(self, response, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_llm_error(self, error, run_id, **kwargs):
+        with self._lock:
+            self._starts.pop(run_id, None)
+
+
+class TimedEmbeddings(Embeddings):
+    """Embeddings wrapper recording `embed_query`/`embed_documents` wall time."""
+
+    def __init__(self, inner: Embeddings, registry: Optional[MetricsRegistry] = None) -> None:
+        self.inner = inner
+        self.registry = registry or _registry
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.registry.timer("embedding"):
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self.registry.timer("embedding"):
+            return self.inner.embed_query(text)
+
+
+def get_metrics_callback(registry: Optional[MetricsRegistry] = None) -> BaseCallbackHandler:
+    """Factory to get a latency callback bound to the process-wide registry."""
+    return LatencyMetricsCallback(registry)
+
+
+__all__ = [
+    "LatencyHistogram",
+    "MetricsRegistry",
+    "LatencyMetricsCallback",
+    "TimedEmbeddings",
+    "get_metrics_registry",
+    "get_metrics_callback",
+    "stage_timer",
+]
@@ -0,0 +1,292 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.config import PROJECT_ROOT, profile_format, profile_rate
+from src.utils.log import get_log_path, log_info
+
+# (function, filename, first line) — code-object identity, cheap to collect
+FrameKey = Tuple[str, str, int]
+
+
+class StackSampler:
+    """Low-overhead wall-clock sampler based on `sys._current_frames()`.
+
+    A daemon thread wakes every `interval` seconds and records the Python stack of the
+    watched threads (all threads but itself unless `thread_ids` is given; the set may
+    grow and shrink while sampling). Identical stacks are aggregated, so memory grows with the
+    number of distinct stacks rather than with run time.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[List[int]] = None, max_depth: int = 128) -> None:
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.root_thread = thread_ids[0] if thread_ids else None
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StackSampler":
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="multi_search-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == own or (self.thread_ids is not None and tid not in self.thread_ids):
+                    continue
+                stack: List[FrameKey] = []
+                f = frame
+                while f is not None and len(stack) < self.max_depth:
+                    co = f.f_code
+                    stack.append((co.co_name, co.co_filename, co.co_firstlineno))
+                    f = f.f_back
+                stack.reverse()
+                tname = names.get(tid)
+                if tname is None:
+                    tname = names[tid] = _thread_name(tid)
+                self.samples[(tname, tuple(stack))] += 1
+
+    def to_folded(self) -> str:
+        """Brendan Gregg folded-stack format (`flamegraph.pl`, inferno, speedscope)."""
+        lines = []
+        for (tname, stack), n in sorted(self.samples.items(), key=lambda kv: -kv[1]):
+            frames = [tname] + [f"{fn} ({_short(path)}:{line})" for fn, path, line in stack]
+            lines.append(f"{';'.join(frames)} {n}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str) -> Dict:
+        frames: List[Dict] = []
+        index: Dict[FrameKey, int] = {}
+        by_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        for (tname, stack), n in self.samples.items():
+            ids = []
+            for key in stack:
+                i = index.get(key)
+                if i is None:
+                    i = index[key] = len(frames)
+                    frames.append({"name": key[0], "file": key[1], "line": key[2]})
+                ids.append(i)
+            samples, weights = by_thread.setdefault(tname, ([], []))
+            samples.append(ids)
+            weights.append(n * self.interval)
+        profiles = [
+            {
+                "type": "sampled",
+                "name": tname,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for tname, (samples, weights) in sorted(by_thread.items())
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "multi_search",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def write(self, path: str, fmt: str = "speedscope", name: str = "multi_search") -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            if fmt == "folded":
+                f.write(self.to_folded())
+            else:
+                json.dump(self.to_speedscope(name), f, ensure_ascii=False)
+        return path
+
+
+def _thread_name(tid: int) -> str:
+    for t in threading.enumerate():
+        if t.ident == tid:
+            return t.name
+    return f"thread-{tid}"
+
+
+def _short(path: str) -> str:
+    root = os.path.dirname(PROJECT_ROOT)
+    if path.startswith(root):
+        return os.path.relpath(path, root)
+    parts = path.replace("\\", "/").split("/site-packages/")
+    return parts[-1] if len(parts) > 1 else os.path.basename(path)
+
+
+def profile_output_path(fmt: str = "speedscope", label: str = "q") -> str:
+    """Path next to the per-run log: output/log/<log name>.prof_<time>.<ext>."""
+    ext = "folded" if fmt == "folded" else "speedscope.json"
+    ts = datetime.now().strftime("%H%M%S_%f")
+    log_path = get_log_path()
+    if log_path:
+        base = os.path.splitext(log_path)[0]
+        return f"{base}.prof_{ts}.{ext}"
+    log_dir = os.path.join(os.path.dirname(PROJECT_ROOT), "output", "log")
+    day = datetime.now().strftime("%Y%m%d")
+    return os.path.join(log_dir, f"{label}_{day}.prof_{ts}.{ext}")
+
+
+class SamplingProfilerCallback(BaseCallbackHandler):
+    """Profile a random fraction of top-level chain runs.
+
+    The decision is made on the root run's start event (parent_run_id is None); only
+    sampled runs pay for the sampler thread. The profile is written when the root run
+    ends or fails.
+
+    Only the threads working for the sampled run are recorded: the root run's thread,
+    plus each executor thread while it runs one of the root's child runs (chains,
+    retrievers, LLM calls), so concurrent requests stay out of the profile.
+    `all_threads` records every thread instead.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        fmt: Optional[str] = None,
+        interval: float = 0.005,
+        all_threads: bool = False,
+    ) -> None:
+        self.rate = profile_rate() if rate is None else rate
+        self.fmt = fmt or profile_format()
+        self.interval = interval
+        self.all_threads = all_threads
+        self.written: List[str] = []
+        self._active: Dict[object, Tuple[StackSampler, str]] = {}
+        # child run -> (root run, thread it started on); per root, live child runs per thread
+        self._children: Dict[object, Tuple[object, int]] = {}
+        self._threads: Dict[object, Counter] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, run_id, **kwargs):
+        if kwargs.get("parent_run_id") is not None:
+            self._enter(run_id, kwargs["parent_run_id"])
+            return
+        if self.rate <= 0 or (self.rate < 1 and random.random() >= self.rate):
+            return
+        with self._lock:
+            if run_id in self._active:
+                return
+            tids = None if self.all_threads else [threading.get_ident()]
+            sampler = StackSampler(self.interval, thread_ids=tids)
+            self._active[run_id] = (sampler, kwargs.get("name") or "AppChain")
+            self._threads[run_id] = Counter()
+        sampler.start()
+
+    def _enter(self, run_id, parent_run_id) -> None:
+        """Watch the current thread while a child run of a sampled root runs on it."""
+        if not self._active:
+            return
+        with self._lock:
+            root = parent_run_id if parent_run_id in self._active else self._children.get(parent_run_id, (None,))[0]
+            if root is None or root not in self._active:
+                return
+            tid = threading.get_ident()
+            self._children[run_id] = (root, tid)
+            self._threads[root][tid] += 1
+            sampler = self._active[root][0]
+            if sampler.thread_ids is not None:
+                sampler.thread_ids.add(tid)
+
+    def _leave(self, run_id) -> None:
+        if not self._children:
+            return
+        with self._lock:
+            entry = self._children.pop(run_id, None)
+            if entry is None or entry[0] not in self._active:
+                return
+            root, tid = entry
+            threads = self._threads[root]
+            threads[tid] -= 1
+            if threads[tid] <= 0:
+                del threads[tid]
+                sampler = self._active[root][0]
+                if sampler.thread_ids is not None and tid != sampler.root_thread:
+                    sampler.thread_ids.discard(tid)
+
+    def _finish(self, run_id) -> None:
+        with self._lock:
+            entry = self._active.pop(run_id, None)
+            self._threads.pop(run_id, None)
+            for child in [c for c, (root, _) in self._children.items() if root == run_id]:
+                del self._children[child]
+        if entry is None:
+            return
+        sampler, name = entry
+        sampler.stop()
+        path = sampler.write(profile_output_path(self.fmt), fmt=self.fmt, name=name)
+        self.written.append(path)
+        log_info(f"Profile written | run={name} | samples={sum(sampler.samples.values())} | path={path}")
+
+    def on_chain_end(self, outputs, run_id, **kwargs):
+        if kwargs.get("parent_run_id") is not None:
+            self._leave(run_id)
+        else:
+            self._finish(run_id)
+
+    def on_chain_error(self, error, run_id, **kwargs):
+        if kwargs.get("parent_run_id") is not None:
+            self._leave(run_id)
+        else:
+            self._finish(run_id)
+
+    def on_retriever_start(self, serialized, query, run_id, **kwargs):
+        if kwargs.get("parent_run_id") is not None:
+            self._enter(run_id, kwargs["parent_run_id"])
+
+    def on_llm_start(self, serialized, prompts, run_id, **kwargs):
+        if kwargs.get("parent_run_id") is not None:
+            self._enter(run_id, kwargs["parent_run_id"])
+
+    def on_chat_model_start(self, serialized, messages, run_id, **kwargs):
+        if kwargs.get("parent_run_id") is not None:
+            self._enter(run_id, kwargs["parent_run_id"])
+
+    def on_retriever_end(self, documents, run_id, **kwargs):
+        self._leave(run_id)
+
+    def on_retriever_error(self, error, run_id, **kwargs):
+        self._leave(run_id)
+
+    def on_llm_end(self, response, run_id, **kwargs):
+        self._leave(run_id)
+
+    def on_llm_error(self, error, run_id, **kwargs):
+        self._leave(run_id)
+
+
+def get_profiling_callback(rate: Optional[float] = None, fmt: Optional[str] = None) -> BaseCallbackHandler:
+    """Factory for the sampling profiler callback (rate/format default from env)."""
+    return SamplingProfilerCallback(rate=rate, fmt=fmt)
+
+
+__all__ = [
+    "StackSampler",
+    "SamplingProfilerCallback",
+    "get_profiling_callback",
+    "profile_output_path",
+]
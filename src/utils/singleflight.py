@@ -0,0 +1,63 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from src.utils.metrics import MetricsRegistry, get_metrics_registry
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls with the same key.
+
+    The first caller for a key (the leader) runs `fn`; callers arriving while it runs
+    wait for and receive the same result or exception. Nothing is kept once the call
+    finishes, so this only collapses overlapping calls, it is not a cache. Results are
+    shared objects: callers must not mutate them. Each shared result increments the
+    `coalesced_total{stage=<name>}` counter.
+    """
+
+    def __init__(self, name: str, registry: Optional[MetricsRegistry] = None) -> None:
+        self.name = name
+        self.registry = registry or get_metrics_registry()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """Return (result, shared); raises TimeoutError if a follower waits longer than timeout."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+        if not call.done.wait(timeout):
+            raise TimeoutError(f"single-flight {self.name}: waited {timeout}s for shared call")
+        self.registry.inc("coalesced", self.name)
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+__all__ = ["SingleFlight"]
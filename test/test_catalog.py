@@ -0,0 +1,164 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rag import catalog as catalog_mod
+from src.rag.catalog import KBCatalog, KBSpec, UnknownKB, load_catalog_file
+from src.rag.partition import build_flat_filters
+from src.utils.metrics import MetricsRegistry
+
+
+class _FakeStore:
+    def __init__(self, spec):
+        self.spec = spec
+        self.closed = False
+
+
+class TestKBCatalog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.specs = {}
+        for name, chunks in (("a", 100), ("b", 200), ("c", 300)):
+            persist = os.path.join(self.tmp.name, name)
+            os.makedirs(persist)
+            with open(os.path.join(persist, "kb_registry.json"), "w", encoding="utf-8") as f:
+                json.dump({"provinces": ["四川"], "total_chunks": chunks}, f, ensure_ascii=False)
+            self.specs[name] = KBSpec(name, collection=f"col_{name}", persist_dir=persist)
+        self.opened = []
+        patches = [
+            mock.patch.object(catalog_mod, "_open_vectorstore", side_effect=self._open),
+            mock.patch.object(catalog_mod, "_close_vectorstore", side_effect=lambda s: setattr(s, "closed", True)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _open(self, spec, persist_dir):
+        store = _FakeStore(spec)
+        self.opened.append(store)
+        return store
+
+    def _catalog(self, **kw):
+        kw.setdefault("memory_budget_bytes", 10**9)
+        kw.setdefault("max_open", 8)
+        return KBCatalog(self.specs, default="a", bytes_per_chunk=1000, registry=MetricsRegistry(), **kw)
+
+    def test_opens_lazily(self):
+        cat = self._catalog()
+        self.assertEqual(cat.plans("b").provinces(), ["四川"])
+        self.assertEqual(self.opened, [])
+        store = cat.vectorstore("b")
+        self.assertEqual(store.spec.collection, "col_b")
+        self.assertIs(cat.vectorstore("b"), store)
+        self.assertEqual(cat.get().spec.name, "a")
+        with self.assertRaises(UnknownKB):
+            cat.get("missing")
+
+    def test_evicts_least_recently_used_over_budget(self):
+        cat = self._catalog(memory_budget_bytes=450_000)  # a + b + c = 600k
+        a = cat.vectorstore("a")
+        cat.vectorstore("b")
+        cat.vectorstore("a")  # b is now least recently used
+        cat.vectorstore("c")
+        self.assertEqual(sorted(n for n, s in cat.snapshot().items() if s["open"]), ["a", "c"])
+        self.assertTrue(self.opened[1].closed)
+        self.assertFalse(a.closed)
+        self.assertEqual(cat.registry.counters()["kb_evicted"]["b"], 1)
+        self.assertEqual(cat.registry.gauges()["kb_resident_bytes"]["catalog"], 400_000)
+        self.assertIsNot(cat.vectorstore("b"), self.opened[1])  # reopened on next use
+
+    def test_max_open(self):
+        cat = self._catalog(max_open=1)
+        cat.vectorstore("a")
+        cat.vectorstore("b")
+        self.assertEqual([n for n, s in cat.snapshot().items() if s["open"]], ["b"])
+
+    def test_lease_prevents_eviction(self):
+        cat = self._catalog(max_open=1)
+        with cat.lease("a") as handle:
+            cat.vectorstore("b")
+            self.assertTrue(handle.is_open)
+            self.assertEqual(handle.leases, 1)
+        self.assertEqual(handle.leases, 0)
+        cat.vectorstore("c")
+        self.assertFalse(handle.is_open)
+
+    def test_concurrent_eviction_cannot_close_a_handle_being_leased(self):
+        cat = self._catalog(max_open=1)
+        store = cat.vectorstore("a")
+        other = threading.Thread(target=cat.vectorstore, args=("b",))  # evicts the LRU idle KB
+
+        def race(original):
+            # Run the eviction to completion right after the lookup of a
+            def wrapper(*args):
+                out = original(*args)
+                kb = args[0].spec.name if hasattr(args[0], "spec") else args[0]  # get(name) / _after_get(handle, retired)
+                if kb == "a" and other.ident is None:
+                    other.start()
+                    other.join()
+                return out
+
+            return wrapper
+
+        with mock.patch.object(cat, "get", side_effect=race(cat.get)), mock.patch.object(cat, "_after_get", side_effect=race(cat._after_get)):
+            with cat.lease("a") as handle:
+                self.assertIsNotNone(other.ident)
+                self.assertIs(handle.vectorstore, store)
+                self.assertFalse(store.closed)
+        self.assertNotIn("a", cat.registry.counters().get("kb_evicted", {}))
+
+    def test_flat_partition(self):
+        self.specs["b"] = KBSpec("b", persist_dir=self.specs["b"].persist_dir, partition="flat")
+        cat = self._catalog()
+        plan = cat.plans("b").get("四川")
+        self.assertEqual([dict(f) for f in plan.filters_list], build_flat_filters("四川"))
+        self.assertEqual(plan.group_names, ("all",))
+        with self.assertRaises(ValueError):
+            KBSpec("x", partition="nope")
+
+
+class TestCatalogFile(unittest.TestCase):
+    def test_parse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "kbs.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "default": "regs",
+                        "root": "stores",
+                        "kbs": {"procurement": {"persist_dir": ".chroma"}, "regs": {"collection": "regulations", "partition": "flat"}},
+                    },
+                    f,
+                )
+            parsed = load_catalog_file(path)
+            self.assertEqual(parsed["default"], "regs")
+            specs = parsed["specs"]
+            self.assertEqual(specs["procurement"].persist_dir, os.path.join(tmp, ".chroma"))
+            self.assertEqual(specs["procurement"].collection, "knowledge_base")
+            self.assertEqual(specs["regs"].persist_dir, os.path.join(tmp, "stores", "regs"))
+            self.assertEqual(specs["regs"].partition, "flat")
+
+            with mock.patch.dict(os.environ, {"MULTI_SEARCH_KB_CATALOG": path}):
+                cat = KBCatalog.from_env(registry=MetricsRegistry())
+            self.assertEqual(cat.names(), ["procurement", "regs"])
+            self.assertEqual(cat.spec().name, "regs")
+
+    def test_unknown_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "kbs.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"default": "x", "kbs": {"a": {}}}, f)
+            with self.assertRaises(ValueError):
+                load_catalog_file(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data_init import initializer
+from src.data_init.chunker import assign_chunk_ids, chunk_text, sentence_spans
+
+_PARA = "政府采购制度改革持续深化，采购人主体责任进一步落实。远程异地评标加快推广！如何提升采购效率？要完善质疑投诉机制；强化履约验收管理。"
+
+
+def _doc(paragraphs: int) -> str:
+    return "\n　　".join(f"第{i}段。" + _PARA * 2 for i in range(paragraphs))
+
+
+class TestChunker(unittest.TestCase):
+    def test_sentence_spans_split_on_chinese_punctuation(self):
+        text = "　　第一句。第二句！“第三句？”第四句；\n第五句"
+        self.assertEqual([text[s:e] for s, e in sentence_spans(text)], ["第一句。", "第二句！", "“第三句？”", "第四句；", "第五句"])
+
+    def test_chunks_are_whole_sentences_with_offsets(self):
+        text = _doc(12)
+        chunks = chunk_text(text, chunk_size=200, chunk_overlap=40)
+        self.assertGreater(len(chunks), 5)
+        for c in chunks:
+            self.assertEqual(text[c.start:c.end], c.text)
+            self.assertLessEqual(len(c.text), 200)
+            self.assertIn(c.text[-1], "。！？；")
+        self.assertEqual(chunks[-1].end, len(text))
+
+    def test_long_sentence_is_cut_at_clauses(self):
+        text = "，".join(["采购人落实主体责任"] * 60) + "。"
+        chunks = chunk_text(text, chunk_size=100, chunk_overlap=0)
+        self.assertTrue(all(len(c.text) <= 100 for c in chunks))
+        self.assertEqual("".join(c.text for c in chunks), text)
+        self.assertTrue(chunks[0].text.endswith("，"))
+
+    def test_edit_only_changes_nearby_chunk_ids(self):
+        text = _doc(20)
+        before = assign_chunk_ids(chunk_text(text))
+        pos = text.index("第10段")
+        after = assign_chunk_ids(chunk_text(text[:pos] + "新增一句说明。" + text[pos:]))
+        self.assertGreaterEqual(len(set(before) & set(after)), len(before) - 3)
+
+    def test_duplicate_chunks_get_distinct_ids(self):
+        chunks = chunk_text(("重复段落。" * 50 + "\n") * 3, chunk_size=250)
+        ids = assign_chunk_ids(chunks)
+        self.assertEqual(len(ids), len(set(ids)))
+
+
+class _FakeStore:
+    def __init__(self):
+        self.docs = {}
+        self.added = 0
+
+    def get(self, ids=None, include=None):
+        return {"ids": [i for i in (self.docs if ids is None else ids) if i in self.docs]}
+
+    def delete(self, ids):
+        for i in ids:
+            self.docs.pop(i, None)
+
+    def add_texts(self, texts, metadatas, ids):
+        self.added += len(ids)
+        self.docs.update(zip(ids, texts))
+
+
+class TestIncrementalInit(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.tmp, "data")
+        os.makedirs(self.data_dir)
+        for name, n in (("【中央】改革", 8), ("【四川】采购", 8)):
+            with open(os.path.join(self.data_dir, name), "w", encoding="utf-8") as f:
+                f.write(_doc(n))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_reinit_embeds_only_changed_chunks(self):
+        store = _FakeStore()
+        persist = os.path.join(self.tmp, "chroma")
+        with mock.patch.object(initializer, "get_vectorstore", return_value=store), mock.patch("time.sleep"):
+            first = initializer.init_vector_db(data_dir=self.data_dir, persist_dir=persist)
+            self.assertEqual(first["added_chunks"], first["total_chunks"])
+            with open(os.path.join(self.data_dir, "【四川】采购"), "a", encoding="utf-8") as f:
+                f.write("\n　　新增段落：推行电子化采购。")
+            os.remove(os.path.join(self.data_dir, "【中央】改革"))
+            second = initializer.init_vector_db(data_dir=self.data_dir, persist_dir=persist)
+        self.assertEqual(second["added_chunks"], 1)
+        self.assertGreater(second["unchanged_chunks"], 0)
+        self.assertGreater(second["deleted_chunks"], 0)
+        self.assertEqual(len(store.docs), second["total_chunks"])
+        self.assertTrue(all(k.startswith("【四川】采购::") for k in store.docs))
+
+
+if __name__ == "__main__":
+    unittest.main()
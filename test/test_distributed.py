@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rag import catalog as catalog_mod
+from src.rag.catalog import KBCatalog, KBSpec
+from src.service.coordinator import Coordinator, WorkerUnavailable, merge_group
+from src.service.worker import QueryWorker, WorkerServer
+from src.utils.metrics import MetricsRegistry
+
+
+def _matches(md, where):
+    if not where:
+        return True
+    if "$and" in where:
+        return all(_matches(md, w) for w in where["$and"])
+    for key, cond in where.items():
+        if isinstance(cond, dict) and "$in" in cond:
+            if md.get(key) not in cond["$in"]:
+                return False
+        elif md.get(key) != cond:
+            return False
+    return True
+
+
+class _VecStore:
+    def __init__(self, docs):
+        # docs: (source_name, kb_type, province, vector)
+        self.docs = [
+            (SimpleNamespace(page_content=f"{name} 正文", metadata={"source_name": name, "chunk_id": "c1", "kb_type": kb, "province": prov}), vec)
+            for name, kb, prov, vec in docs
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(self, vec, k=4, filter=None):
+        hits = [(d, sum((a - b) ** 2 for a, b in zip(vec, v))) for d, v in self.docs if _matches(d.metadata, filter)]
+        return sorted(hits, key=lambda h: h[1])[:k]
+
+
+_SHARD_A = [
+    ("【中央】改革", "core", "中央", (1.0, 0.0)),
+    ("【中央】总结", "core", "中央", (0.0, 1.0)),
+    ("【四川】采购", "regional", "四川", (0.9, 0.1)),
+    ("【四川】评标", "regional", "四川", (0.5, 0.5)),
+]
+_SHARD_B = [
+    ("【河南】诚信", "regional", "河南", (0.95, 0.05)),
+    ("【广东】商城", "regional", "广东", (0.2, 0.8)),
+]
+
+
+class TestDistributedQuery(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.stores = {}
+        patch = mock.patch.object(catalog_mod, "_open_vectorstore", side_effect=lambda spec, d: self.stores[d])
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.servers = [self._worker("a", _SHARD_A), self._worker("b", _SHARD_B)]
+        self.coordinator = Coordinator([s.base_url for s in self.servers], registry=MetricsRegistry())
+        self.addCleanup(self.coordinator.close)
+
+    def tearDown(self):
+        for s in self.servers:
+            try:
+                s.stop()
+            except Exception:
+                pass
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _worker(self, name, docs):
+        persist = os.path.join(self.tmp, name)
+        os.makedirs(persist)
+        regional = sorted({p for _, kb, p, _ in docs if kb == "regional"})
+        kb_types = sorted({kb for _, kb, _, _ in docs})
+        with open(os.path.join(persist, "kb_registry.json"), "w", encoding="utf-8") as f:
+            json.dump({"provinces": regional, "kb_types": kb_types, "total_chunks": len(docs)}, f, ensure_ascii=False)
+        self.stores[persist] = _VecStore(docs)
+        catalog = KBCatalog({"default": KBSpec("default", persist_dir=persist)}, registry=MetricsRegistry())
+        return WorkerServer(QueryWorker(catalog, name=name, registry=MetricsRegistry())).start()
+
+    def _query(self, province, top_k=2, vec=(1.0, 0.0)):
+        state = self.coordinator.plan({"question": "采购效率", "province": province, "top_k": top_k})
+        return self.coordinator.retrieve({**state, "question_vector": list(vec)})
+
+    def _requests(self):
+        return [w["requests"] for w in self.coordinator.snapshot()]
+
+    def test_routes_groups_to_shard_owners(self):
+        out = self._query("四川")
+        self.assertEqual(self.coordinator.provinces("default"), ["四川", "广东", "河南"])
+        groups = {c["name"]: [it["source_name"] for it in c["results"]] for c in out["contexts"]}
+        self.assertEqual(groups["core"], ["【中央】改革", "【中央】总结"])
+        self.assertEqual(groups["target_region"], ["【四川】采购", "【四川】评标"])
+        self.assertEqual(groups["other_regions"], ["【河南】诚信", "【广东】商城"])
+        self.assertFalse(out["partial"])
+        self.assertEqual(self._requests(), [1, 1])  # one request per worker
+
+        self._query("河南")  # target on b; a holds 四川, an "other" region
+        self.assertEqual(self._requests(), [2, 2])
+
+    def test_others_group_merged_across_shards_by_distance(self):
+        out = self._query(None, top_k=3)
+        others = out["contexts"][1]
+        self.assertEqual(others["name"], "others")
+        self.assertEqual([it["source_name"] for it in others["results"]], ["【河南】诚信", "【四川】采购", "【四川】评标"])
+        scores = [it["score"] for it in others["results"]]
+        self.assertEqual(scores, sorted(scores))
+
+    def test_failed_worker_gives_partial_answer(self):
+        self.assertFalse(self._query("四川")["partial"])
+        self.servers[1].stop()
+        out = self._query("四川")
+        self.assertTrue(out["partial"])
+        groups = {c["name"]: c["results"] for c in out["contexts"]}
+        self.assertEqual(len(groups["core"]), 2)
+        self.assertEqual(groups["other_regions"], [])
+        self.assertEqual(self.coordinator.registry.counters()["worker_errors"][self.servers[1].base_url], 1)
+        self.assertTrue(self._query("四川")["partial"])  # marked unhealthy: not asked again until the next refresh
+        self.assertEqual(self.coordinator.registry.counters()["worker_errors"][self.servers[1].base_url], 1)
+
+    def test_partial_reaches_the_chain_result(self):
+        state = {"question": "采购效率", "province": "四川", "top_k": 2, "summary_mode": "retrieval"}
+        with mock.patch("src.pipeline.chain._embed_question", side_effect=lambda s: {**s, "question_vector": [1.0, 0.0]}):
+            chain = self.coordinator.build_chain()
+            self.assertFalse(chain.invoke(state)["partial"])
+            self.servers[1].stop()
+            out = chain.invoke(state)
+            self.assertTrue(out["partial"])
+            self.assertTrue(out["summary"])
+            fake = {"question": "q", "summary": "ok", "references": []}
+            with mock.patch("src.pipeline.chain._summarize_and_refs", return_value=fake):
+                self.assertTrue(chain.invoke({**state, "summary_mode": "single"})["partial"])  # summarized on worker a
+
+    def test_no_worker_left_raises(self):
+        for s in self.servers:
+            s.stop()
+        with self.assertRaises(WorkerUnavailable):
+            self._query("四川")  # every routed request fails
+        with self.assertRaises(WorkerUnavailable):
+            self._query("四川")  # now none is healthy
+
+    def test_summaries_are_load_balanced(self):
+        fake = mock.patch("src.pipeline.chain._summarize_and_refs", side_effect=lambda s: {"question": s["question"], "summary": "ok", "references": []})
+        with fake as summarize:
+            state = self._query("四川")
+            before = self._requests()
+            for _ in range(4):
+                out = self.coordinator.summarize({**state, "summary_mode": "single"})
+            self.assertEqual(out["summary"], "ok")
+            self.assertEqual([b - a for a, b in zip(before, self._requests())], [2, 2])
+            self.coordinator.summarize({**state, "summary_mode": "retrieval"})  # no LLM: local
+            self.assertEqual(summarize.call_count, 5)
+            self.assertEqual([b - a for a, b in zip(before, self._requests())], [2, 2])
+
+
+class TestMergeGroup(unittest.TestCase):
+    def test_replicas_deduplicated(self):
+        a = [{"ref": "x::1", "score": 0.1}, {"ref": "y::1", "score": 0.3}]
+        b = [{"ref": "x::1", "score": 0.1}, {"ref": "z::1", "score": 0.2}]
+        self.assertEqual([it["ref"] for it in merge_group([a, b], 3)], ["x::1", "z::1", "y::1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
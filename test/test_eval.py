@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench.eval import _matches, score_question
+from src.rag.partition import build_partition_filters_precise
+
+_FILTERS = build_partition_filters_precise("四川")
+_CORE = ["【中央】改革::1", "【中央】改革::2", "【中央】总结::1"]
+_TARGET = ["【四川】采购::1", "【四川】评标::1", "【四川】采购::2"]
+_OTHERS = ["【河南】诚信::1", "【广东】商城::1", "【河南】诚信::2"]
+_RETRIEVED = ([("core", _CORE), ("target_region", _TARGET), ("other_regions", _OTHERS)], _FILTERS)
+
+
+class TestScoreQuestion(unittest.TestCase):
+    def test_recall_and_reciprocal_rank(self):
+        # (case, expected refs, recall, reciprocal rank, per-group (hit, total))
+        cases = [
+            ("hit at rank 1", ["【中央】改革::1"], 1.0, 1.0, {"core": (1, 1)}),
+            ("hit at rank k of the first group", ["【中央】总结::1"], 1.0, 1 / 3, {"core": (1, 1)}),
+            ("hit in a later group", ["【四川】评标::1"], 1.0, 1 / 5, {"target_region": (1, 1)}),
+            ("miss", ["【四川】远程::9"], 0.0, 0.0, {"target_region": (0, 1)}),
+            (
+                "several gold sources, some found",
+                ["【中央】改革::2", "【四川】远程::9", "【河南】诚信::2", "【广东】缺失::1"],
+                0.5,
+                1 / 2,
+                {"core": (1, 1), "target_region": (0, 1), "other_regions": (1, 2)},
+            ),
+            ("no gold sources", [], 1.0, 0.0, {}),
+        ]
+        for name, expected, recall, rr, groups in cases:
+            with self.subTest(name):
+                score = score_question(expected, _RETRIEVED)
+                self.assertAlmostEqual(score["recall"], recall)
+                self.assertAlmostEqual(score["rr"], rr)
+                self.assertEqual(score["groups"], groups)
+
+    def test_duplicate_gold_refs_count_once(self):
+        score = score_question(["【中央】改革::1", "【中央】改革::1"], _RETRIEVED)
+        self.assertEqual((score["recall"], score["rr"]), (1.0, 1.0))
+
+
+class TestMatches(unittest.TestCase):
+    def test_where_operators(self):
+        sichuan = {"kb_type": "regional", "province": "四川"}
+        cases = [
+            (None, True),
+            ({"kb_type": "regional"}, True),
+            ({"kb_type": "core"}, False),
+            ({"province": {"$eq": "四川"}}, True),
+            ({"province": {"$ne": "四川"}}, False),
+            ({"province": {"$in": ["四川", "河南"]}}, True),
+            ({"province": {"$nin": ["四川"]}}, False),
+            ({"$and": [{"kb_type": "regional"}, {"province": {"$in": ["河南"]}}]}, False),
+            ({"$or": [{"kb_type": "core"}, {"province": "四川"}]}, True),
+            ({"province": {"$gt": "四川"}}, False),  # unsupported operator never matches
+        ]
+        for where, expected in cases:
+            with self.subTest(where=where):
+                self.assertEqual(_matches(sichuan, where), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.pipeline.extractive import extract_summary, score_lexical, split_sentences
+from src.pipeline.summary import summarize
+
+CONTEXTS = [
+    {"name": "core", "results": [
+        {"text": "国采中心举办培训班。聚焦采购效率，提升采购服务效能。", "source_name": "【中央】国采", "chunk_id": 0},
+    ]},
+    {"name": "target_region", "results": [
+        {"text": "四川省财政厅发布通知。要推动提高政府采购执行效率！", "source_name": "【四川】明确", "chunk_id": 1},
+        {"text": "完善质疑投诉工作措施。", "source_name": "【四川】明确", "chunk_id": 2},
+    ]},
+    {"name": "other_regions", "results": []},
+]
+
+
+class TestExtractive(unittest.TestCase):
+    def test_split_sentences(self):
+        self.assertEqual(split_sentences("第一句话很长。第二句也长！短。\n第三行内容在此"), ["第一句话很长。", "第二句也长！", "第三行内容在此"])
+
+    def test_lexical_scores_prefer_overlap(self):
+        scores = score_lexical("提高采购效率", ["提高政府采购执行效率。", "发布通知一则。"])
+        self.assertGreater(scores[0], scores[1])
+        self.assertEqual(len(score_lexical("", ["任意句子内容"])), 1)
+
+    def test_best_sentence_first_with_valid_refs(self):
+        obj = extract_summary(CONTEXTS, "如何提高采购效率", per_group=2)
+        self.assertEqual(obj.core[0].text, "聚焦采购效率，提升采购服务效能。")
+        self.assertEqual(obj.target[0].text, "要推动提高政府采购执行效率！")
+        self.assertEqual(obj.target[0].ref, "【四川】明确::1")
+        # Second slot prefers a chunk not cited yet
+        self.assertEqual(obj.target[1].ref, "【四川】明确::2")
+        self.assertEqual(obj.others, [])
+
+    def test_mode_renders_without_llm(self):
+        with mock.patch("src.llm.generation.PooledOllamaLLM._call", side_effect=AssertionError("LLM called")):
+            md = summarize(CONTEXTS, "如何提高采购效率", province="四川", mode="extractive")
+        self.assertIn("- 聚焦采购效率，提升采购服务效能。 [1-1]", md)
+        self.assertIn("- 要推动提高政府采购执行效率！ [2-1]", md)
+        self.assertIn("该组未检索到相关内容", md)
+
+
+if __name__ == "__main__":
+    unittest.main()
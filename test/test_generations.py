@@ -0,0 +1,290 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data_init import initializer
+from src.data_init.journal import DEAD_LETTER_FILE
+from src.rag import catalog as catalog_mod
+from src.rag import generations as gen
+from src.rag.catalog import KBCatalog, KBSpec
+from src.utils.metrics import MetricsRegistry
+
+_PARA = "政府采购制度改革持续深化，采购人主体责任进一步落实。远程异地评标加快推广，提升采购效率。"
+
+
+class _DirStore:
+    """Vector store persisted as a JSON file in its directory, so copying the directory copies it."""
+
+    def __init__(self, persist_dir, broken=False, fail=None):
+        self.path = os.path.join(persist_dir, "store.json")
+        self.broken = broken
+        self.fail = fail  # texts containing this substring fail to embed
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.docs = json.load(f)
+        except FileNotFoundError:
+            self.docs = {}
+
+    def _save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.docs, f, ensure_ascii=False)
+
+    def get(self, ids=None, include=None):
+        ids = [i for i in (self.docs if ids is None else ids) if i in self.docs]
+        return {"ids": ids, "documents": [self.docs[i] for i in ids]}
+
+    def delete(self, ids):
+        for i in ids:
+            self.docs.pop(i, None)
+        self._save()
+
+    def add_texts(self, texts, metadatas, ids):
+        if self.fail is not None and any(self.fail in t for t in texts):
+            raise RuntimeError("embedding failed")
+        self.docs.update(zip(ids, texts))
+        self._save()
+
+    def similarity_search(self, text, k=1):
+        if self.broken:
+            return []
+        return [SimpleNamespace(page_content=t) for t in self.docs.values() if t == text][:k]
+
+
+class TestGenerationLayout(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_plain_dir_resolves_to_itself(self):
+        self.assertIsNone(gen.current_generation(self.root))
+        self.assertEqual(gen.resolve_persist_dir(self.root), self.root)
+
+    def test_stage_activate_and_prune(self):
+        ids = []
+        for _ in range(4):
+            stage = gen.begin_staging(self.root)
+            self.assertFalse(stage["resumed"])
+            gen.activate(self.root, stage["generation"])
+            ids.append(stage["generation"])
+        self.assertEqual(gen.resolve_persist_dir(self.root), gen.generation_dir(self.root, ids[-1]))
+        self.assertFalse(os.path.exists(os.path.join(self.root, gen.STAGING_FILE)))
+        self.assertEqual(gen.prune_generations(self.root, keep=1), ids[:2])
+        self.assertEqual(gen.list_generations(self.root), ids[2:])
+        gen.activate(self.root, ids[2])  # rollback
+        self.assertEqual(gen.current_generation(self.root)["previous"], ids[3])
+        with self.assertRaises(FileNotFoundError):
+            gen.activate(self.root, "missing")
+
+    def test_unfinished_staging_is_resumed(self):
+        first = gen.begin_staging(self.root)
+        again = gen.begin_staging(self.root)
+        self.assertTrue(again["resumed"])
+        self.assertEqual(again["generation"], first["generation"])
+        gen.abandon_staging(self.root)
+        self.assertNotEqual(gen.begin_staging(self.root)["generation"], first["generation"])
+
+    def test_legacy_collection_seeds_first_generation(self):
+        with open(os.path.join(self.root, "chroma.sqlite3"), "w") as f:
+            f.write("x")
+        stage = gen.begin_staging(self.root)
+        self.assertEqual(stage["base"], "legacy")
+        self.assertTrue(os.path.exists(os.path.join(stage["path"], "chroma.sqlite3")))
+        self.assertFalse(os.path.exists(os.path.join(stage["path"], gen.GENERATIONS_DIR)))
+
+
+class TestStagedInit(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.tmp, "data")
+        self.root = os.path.join(self.tmp, "chroma")
+        os.makedirs(self.data_dir)
+        for prov in ("中央", "四川"):
+            self._write(prov, 4)
+        self.broken = False
+        self.fail = None
+        for patch in (
+            mock.patch.object(initializer, "get_vectorstore", side_effect=lambda d, name: _DirStore(d, self.broken, self.fail)),
+            mock.patch("time.sleep"),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write(self, prov, n):
+        with open(os.path.join(self.data_dir, f"【{prov}】文档"), "w", encoding="utf-8") as f:
+            f.write("\n".join(f"第{j}段{prov}。" + _PARA * 3 for j in range(n)))
+
+    def _init(self, **kw):
+        return initializer.init_vector_db(data_dir=self.data_dir, persist_dir=self.root, staged=True, **kw)
+
+    def test_builds_new_generation_and_switches(self):
+        first = self._init()
+        live = gen.resolve_persist_dir(self.root)
+        self.assertEqual(first["generation_dir"], live)
+        self.assertTrue(first["validation"]["ok"])
+        self.assertTrue(os.path.exists(os.path.join(live, "kb_registry.json")))
+
+        self._write("四川", 5)
+        second = self._init()
+        self.assertEqual(second["previous_generation"], first["generation"])
+        # Seeded from the live generation: only the changed tail is embedded
+        self.assertGreater(second["unchanged_chunks"], 0)
+        self.assertLess(second["added_chunks"], first["total_chunks"])
+        self.assertEqual(len(_DirStore(live).docs), first["total_chunks"])  # old generation untouched
+        self.assertEqual(len(_DirStore(gen.resolve_persist_dir(self.root)).docs), second["total_chunks"])
+
+        # Once a root holds generations, the default is staged too
+        third = initializer.init_vector_db(data_dir=self.data_dir, persist_dir=self.root)
+        self.assertEqual(third["previous_generation"], second["generation"])
+        self.assertEqual(third["added_chunks"], 0)
+
+    def test_failed_validation_keeps_current(self):
+        first = self._init()
+        self.broken = True
+        with self.assertRaises(initializer.GenerationValidationError):
+            self._init(reset=True)
+        self.assertEqual(gen.current_generation(self.root)["generation"], first["generation"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, gen.STAGING_FILE)))
+
+
+    def _failed_rebuild(self, fail):
+        """Rebuild from scratch while adds of texts containing `fail` fail; returns (first, staging)."""
+        first = self._init()
+        self.fail = fail
+        with self.assertRaises(initializer.GenerationValidationError):
+            self._init(reset=True)
+        self.assertEqual(gen.current_generation(self.root)["generation"], first["generation"])
+        with open(os.path.join(self.root, gen.STAGING_FILE), encoding="utf-8") as f:
+            staging = json.load(f)
+        self.assertNotEqual(staging["generation"], first["generation"])
+        return first, staging
+
+    def _dead_letters(self, generation):
+        with open(os.path.join(gen.generation_dir(self.root, generation), DEAD_LETTER_FILE), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_every_add_failing_keeps_current_and_resumes(self):
+        # Embedding backend down during a reset rebuild: the empty generation must not go live
+        first, staging = self._failed_rebuild(fail="")
+        self.assertEqual(len(self._dead_letters(staging["generation"])), first["total_chunks"])
+        self.fail = None
+        resumed = self._init()
+        self.assertEqual(resumed["generation"], staging["generation"])
+        self.assertEqual(resumed["added_chunks"], first["total_chunks"])
+        self.assertEqual(gen.current_generation(self.root)["generation"], staging["generation"])
+        self.assertIsNone(resumed["dead_letter_path"])
+
+    def test_some_adds_failing_keeps_current_and_resumes(self):
+        first, staging = self._failed_rebuild(fail="四川")
+        dead = self._dead_letters(staging["generation"])
+        self.assertTrue(dead)
+        self.assertTrue(all("四川" in e["text"] for e in dead))
+        self.fail = None
+        resumed = self._init()
+        self.assertEqual(resumed["generation"], staging["generation"])
+        self.assertEqual(resumed["added_chunks"], len(dead))  # only the missing chunks are embedded
+        self.assertEqual(resumed["total_chunks"], first["total_chunks"])
+        self.assertTrue(resumed["validation"]["ok"])
+
+    def test_replay_activates_the_staging_generation(self):
+        first, staging = self._failed_rebuild(fail="四川")
+        self.fail = "四川"
+        kept = initializer.replay_dead_letters(persist_dir=self.root)
+        self.assertFalse(kept["activated"])
+        self.assertEqual(kept["generation"], staging["generation"])
+        self.assertEqual(gen.current_generation(self.root)["generation"], first["generation"])
+
+        self.fail = None
+        out = initializer.replay_dead_letters(persist_dir=self.root)
+        self.assertTrue(out["activated"])
+        self.assertEqual(out["generation"], staging["generation"])
+        self.assertEqual(out["previous_generation"], first["generation"])
+        self.assertEqual(out["total_chunks"], first["total_chunks"])
+        self.assertTrue(out["validation"]["ok"])
+        self.assertIsNone(out["dead_letter_path"])
+        self.assertEqual(gen.current_generation(self.root)["generation"], staging["generation"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, gen.STAGING_FILE)))
+        self.assertEqual(len(_DirStore(gen.generation_dir(self.root, first["generation"])).docs), first["total_chunks"])
+
+        # Nothing left to replay: the live generation is not copied again
+        again = initializer.replay_dead_letters(persist_dir=self.root)
+        self.assertEqual(again["replayed"], 0)
+        self.assertNotIn("generation", again)
+
+    def test_replay_of_live_dead_letters_builds_a_new_generation(self):
+        first = self._init()
+        self._write("四川", 5)
+        self.fail = "第4段"
+        patched = initializer.init_vector_db(data_dir=self.data_dir, persist_dir=self.root, staged=False)  # --in-place
+        self.assertTrue(patched["failed_chunks"])
+        live = gen.resolve_persist_dir(self.root)
+        self.fail = None
+        out = initializer.replay_dead_letters(persist_dir=self.root)
+        self.assertTrue(out["activated"])
+        self.assertEqual(out["previous_generation"], first["generation"])
+        self.assertEqual(out["total_chunks"], patched["expected_chunks"])
+        self.assertEqual(len(_DirStore(live).docs), patched["total_chunks"])  # the old live index is not patched
+
+    def test_empty_collection_is_not_activated(self):
+        first = self._init()
+        for name in os.listdir(self.data_dir):
+            os.remove(os.path.join(self.data_dir, name))
+        with self.assertRaises(initializer.GenerationValidationError):
+            self._init(reset=True)
+        self.assertEqual(gen.current_generation(self.root)["generation"], first["generation"])
+
+
+class TestCatalogReload(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.gens = []
+        for _ in range(2):
+            stage = gen.begin_staging(self.root)
+            with open(os.path.join(stage["path"], "kb_registry.json"), "w", encoding="utf-8") as f:
+                json.dump({"provinces": ["四川"], "total_chunks": 1}, f)
+            self.gens.append(stage["generation"])
+            gen.abandon_staging(self.root)
+        gen.activate(self.root, self.gens[0])
+        self.closed = []
+        patches = [
+            mock.patch.object(catalog_mod, "_open_vectorstore", side_effect=lambda spec, d: SimpleNamespace(dir=d)),
+            mock.patch.object(catalog_mod, "_close_vectorstore", side_effect=self.closed.append),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.catalog = KBCatalog({"kb": KBSpec("kb", persist_dir=self.root)}, registry=MetricsRegistry())
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _switch(self, generation):
+        gen.activate(self.root, generation)
+        os.utime(os.path.join(self.root, gen.CURRENT_FILE), ns=(0, gen.pointer_mtime(self.root) + 10**9))
+        self.catalog.get("kb")._checked -= catalog_mod._GENERATION_CHECK_S
+
+    def test_switches_after_in_flight_queries(self):
+        with self.catalog.lease("kb") as old:
+            self.assertEqual(old.vectorstore.dir, gen.generation_dir(self.root, self.gens[0]))
+            self._switch(self.gens[1])
+            new = self.catalog.get("kb")
+            self.assertIsNot(new, old)
+            self.assertEqual(new.generation, self.gens[1])
+            self.assertEqual(new.vectorstore.dir, gen.generation_dir(self.root, self.gens[1]))
+            self.assertEqual(self.closed, [])  # still leased
+        self.assertEqual(len(self.closed), 1)
+        self.assertEqual(self.catalog.registry.counters()["kb_reloaded"]["kb"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import unittest
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load on the code path that needs them
+HEAVY = ("chromadb", "langchain_chroma", "langchain_ollama", "langchain_text_splitters", "langchain_core.output_parsers")
+# Budget for the cumulative import time of an entry module (override for slow CI hosts)
+BUDGET_MS = float(os.getenv("MULTI_SEARCH_IMPORT_BUDGET_MS", "300"))
+
+
+def _importtime(args: List[str]) -> Dict[str, int]:
+    """Run python -X importtime and return {module: cumulative_us}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    out: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cum_us, name = line[len("import time:"):].split("|")
+        out[name.strip()] = int(cum_us)
+    return out
+
+
+class TestImportTime(unittest.TestCase):
+    def assertLight(self, mods: Dict[str, int]):
+        loaded = [m for m in mods if m in HEAVY]
+        self.assertEqual(loaded, [], f"heavy modules imported eagerly: {loaded}")
+
+    def test_app_module_import(self):
+        mods = _importtime(["-c", "import src.app"])
+        self.assertLight(mods)
+        ms = mods["src.app"] / 1000.0
+        print(f"\nimport src.app: {ms:.1f} ms")
+        self.assertLess(ms, BUDGET_MS)
+
+    def test_entry_points_help(self):
+        for args in (["src/app.py", "--help"], ["-m", "src.data_init.cli", "--help"], ["-m", "src.data_init.inspect", "--help"], ["-m", "src.rag.simple", "--help"]):
+            with self.subTest(args=args):
+                self.assertLight(_importtime(args))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import chromadb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data_init.initializer import chunk_doc_id, split_items
+from src.data_init.inspect import inspect_index
+
+_CORE = "【中央】深化改革"
+_SICHUAN = "【四川】采购效率"
+
+
+class TestInspectIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.data_dir = os.path.join(self.tmp, "data")
+        self.persist_dir = os.path.join(self.tmp, "chroma")
+        os.makedirs(self.data_dir)
+        texts = {_CORE: "深化政府采购制度改革。" * 80, _SICHUAN: "四川提升采购效率。" * 80, "【河南】未入库": "河南建立诚信评价体系。"}
+        for name, text in texts.items():
+            with open(os.path.join(self.data_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        docs = [
+            {"text": texts[name], "metadata": {"source_name": name, "kb_type": kb, "province": prov}}
+            for name, kb, prov in ((_CORE, "core", "中央"), (_SICHUAN, "regional", "四川"))
+        ]
+        chunks = split_items(docs)
+        ids = [chunk_doc_id(c["metadata"]) for c in chunks]
+        metadatas = [c["metadata"] for c in chunks]
+        self.expected = len(chunks)
+        # A stale chunk of a file no longer in data/, a second id for an existing chunk,
+        # and a chunk without source metadata
+        ids += ["【辽宁】已删除::x1", "copy-of-first", "stray"]
+        metadatas += [
+            {"source_name": "【辽宁】已删除", "chunk_id": "x1", "kb_type": "regional", "province": "辽宁"},
+            dict(metadatas[0]),
+            {"kb_type": "regional"},
+        ]
+        client = chromadb.PersistentClient(path=self.persist_dir)
+        col = client.create_collection("knowledge_base")
+        col.add(ids=ids, metadatas=metadatas, embeddings=[[float(i), 1.0] for i in range(len(ids))])
+        with open(os.path.join(self.persist_dir, "kb_registry.json"), "w", encoding="utf-8") as f:
+            json.dump({"provinces": ["四川"], "kb_types": ["core", "regional"], "total_chunks": self.expected, "complete": True}, f, ensure_ascii=False)
+
+    def _inspect(self, **kw):
+        return inspect_index(persist_dir=self.persist_dir, data_dir=self.data_dir, page_size=2, **kw)
+
+    def test_counts_orphans_duplicates(self):
+        report = self._inspect()
+        self.assertEqual(report["total_chunks"], self.expected + 3)
+        self.assertEqual(sum(report["file_chunk_counts"].values()), self.expected + 2)
+        self.assertEqual(report["by_kb_type"]["core"], report["file_chunk_counts"][_CORE])
+        self.assertEqual(report["by_province"]["辽宁"], 1)
+        self.assertEqual(report["orphans"]["count"], 2)  # copy-of-first (id != key) and stray
+        self.assertEqual({o["id"] for o in report["orphans"]["examples"]}, {"copy-of-first", "stray"})
+        self.assertEqual((report["duplicates"]["keys"], report["duplicates"]["ids"]), (1, 0))
+        self.assertEqual(sorted(report["duplicates"]["examples"][0]["ids"])[0], "copy-of-first")
+        self.assertNotIn("vectors", report)
+
+    def test_diff_against_data_and_registry(self):
+        report = self._inspect()
+        data = report["data"]
+        self.assertEqual(data["files_not_indexed"], ["【河南】未入库"])
+        self.assertEqual(data["files_not_in_data"], ["【辽宁】已删除"])
+        self.assertEqual(data["chunks_to_add"], {"【河南】未入库": 1})
+        self.assertEqual(data["chunks_to_delete"], {_CORE: 1, "【辽宁】已删除": 1})  # the duplicate copy, the stale file
+        problems = " | ".join(report["registry"]["problems"])
+        self.assertIn("total_chunks", problems)
+        self.assertIn("辽宁", problems)
+
+    def test_vectors_and_export_only_when_asked(self):
+        out = os.path.join(self.tmp, "meta.jsonl")
+        report = self._inspect(export=out)
+        with open(out, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), report["total_chunks"])
+        self.assertNotIn("embedding", rows[0])
+        report = self._inspect(vectors=True, export=out)
+        self.assertEqual(report["vectors"], {"dims": {2: report["total_chunks"]}, "zero": 0})
+        with open(out, encoding="utf-8") as f:
+            self.assertEqual(len(json.loads(f.readline())["embedding"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data_init import initializer
+from src.data_init.journal import DEAD_LETTER_FILE, JOURNAL_FILE, IngestJournal
+
+_PARA = "政府采购制度改革持续深化，采购人主体责任进一步落实。远程异地评标加快推广，提升采购效率。"
+
+
+class _Crash(BaseException):
+    """Stands in for the process dying (not caught by the retry loop)."""
+
+
+class _Store:
+    def __init__(self, crash_after_batches=None, poison=None):
+        self.docs = {}
+        self.calls = 0
+        self.crash_after_batches = crash_after_batches
+        self.poison = poison
+
+    def get(self, ids=None, include=None):
+        return {"ids": [i for i in (self.docs if ids is None else ids) if i in self.docs]}
+
+    def delete(self, ids):
+        for i in ids:
+            self.docs.pop(i, None)
+
+    def add_texts(self, texts, metadatas, ids):
+        if self.crash_after_batches is not None and self.calls >= self.crash_after_batches:
+            raise _Crash()
+        self.calls += 1
+        if self.poison and any(self.poison in t for t in texts):
+            raise RuntimeError("embedding failed")
+        self.docs.update(zip(ids, texts))
+
+
+class TestJournaledIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.tmp, "data")
+        self.persist = os.path.join(self.tmp, "chroma")
+        os.makedirs(self.data_dir)
+        for i, prov in enumerate(("中央", "四川", "河南", "广东")):
+            with open(os.path.join(self.data_dir, f"【{prov}】文档{i}"), "w", encoding="utf-8") as f:
+                f.write("\n".join(f"第{j}段{prov}。" + _PARA * 3 for j in range(6)))
+        self.sleep = mock.patch("time.sleep")
+        self.sleep.start()
+
+    def tearDown(self):
+        self.sleep.stop()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _init(self, store, **kw):
+        with mock.patch.object(initializer, "get_vectorstore", return_value=store):
+            return initializer.init_vector_db(data_dir=self.data_dir, persist_dir=self.persist, batch_size=4, **kw)
+
+    def _registry(self):
+        with open(os.path.join(self.persist, "kb_registry.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_batches_and_clean_run_leaves_no_journal(self):
+        store = _Store()
+        out = self._init(store)
+        self.assertEqual(out["total_chunks"], len(store.docs))
+        self.assertEqual(store.calls, -(-out["added_chunks"] // 4))
+        self.assertTrue(out["complete"])
+        self.assertFalse(os.path.exists(os.path.join(self.persist, JOURNAL_FILE)))
+        self.assertEqual(self._registry()["total_chunks"], len(store.docs))
+
+    def test_resumes_after_crash(self):
+        store = _Store(crash_after_batches=2)
+        with self.assertRaises(_Crash):
+            self._init(store)
+        self.assertEqual(len(store.docs), 8)
+        run = IngestJournal(self.persist).unfinished()
+        self.assertEqual(len(run["committed"]), 8)
+        self.assertEqual(len(run["pending"]), 4)  # third batch: intent written, never committed
+
+        store.crash_after_batches = None
+        out = self._init(store)
+        self.assertTrue(out["resumed"])
+        self.assertEqual(out["unchanged_chunks"], 8)
+        self.assertEqual(out["total_chunks"], len(store.docs))
+        self.assertEqual(out["added_chunks"] + 8, out["total_chunks"])
+        self.assertIsNone(IngestJournal(self.persist).unfinished())
+
+    def test_failed_chunks_are_dead_lettered_and_replayed(self):
+        store = _Store(poison="第3段河南")
+        out = self._init(store)
+        self.assertEqual(out["failed_chunks"], 1)
+        self.assertFalse(out["complete"])
+        self.assertEqual(out["total_chunks"], len(store.docs))
+        registry = self._registry()
+        self.assertEqual((registry["total_chunks"], registry["failed_chunks"], registry["complete"]), (len(store.docs), 1, False))
+        with open(os.path.join(self.persist, DEAD_LETTER_FILE), encoding="utf-8") as f:
+            (entry,) = [json.loads(line) for line in f]
+        self.assertIn("第3段河南", entry["text"])
+        self.assertEqual(entry["metadata"]["province"], "河南")
+
+        store.poison = None
+        with mock.patch.object(initializer, "get_vectorstore", return_value=store):
+            replay = initializer.replay_dead_letters(self.persist)
+        self.assertEqual((replay["added_chunks"], replay["failed_chunks"]), (1, 0))
+        self.assertIn(entry["id"], store.docs)
+        self.assertFalse(os.path.exists(os.path.join(self.persist, DEAD_LETTER_FILE)))
+        self.assertTrue(self._registry()["complete"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.llm.client import OllamaClient, OllamaRequestError
+from src.llm.embeddings import PooledOllamaEmbeddings
+
+
+def _client(handler, urls, **kwargs) -> OllamaClient:
+    return OllamaClient(base_urls=urls, transport=httpx.MockTransport(handler), backoff=0.0, **kwargs)
+
+
+class TestOllamaClient(unittest.TestCase):
+    def test_round_robin_across_endpoints(self):
+        hosts = []
+
+        def handler(request: httpx.Request):
+            hosts.append(request.url.port)
+            return httpx.Response(200, json={"response": "ok"})
+
+        c = _client(handler, ["http://127.0.0.1:1001", "http://127.0.0.1:1002"])
+        for _ in range(4):
+            self.assertEqual(c.generate("m", "p"), "ok")
+        self.assertEqual(sorted(hosts), [1001, 1001, 1002, 1002])
+
+    def test_least_loaded_prefers_idle_endpoint(self):
+        gate = threading.Event()
+        hosts = []
+
+        def handler(request: httpx.Request):
+            hosts.append(request.url.port)
+            if request.url.port == 1001:
+                gate.wait(2)
+            return httpx.Response(200, json={"response": "ok"})
+
+        c = _client(handler, ["http://127.0.0.1:1001", "http://127.0.0.1:1002"], strategy="least_loaded")
+        c._rr = iter(range(0, 1000, 2))  # always start scanning at endpoint 1001
+        t = threading.Thread(target=c.generate, args=("m", "slow"))
+        t.start()
+        while not c.endpoints[0].inflight:
+            pass
+        c.generate("m", "fast")
+        gate.set()
+        t.join()
+        self.assertEqual(hosts, [1001, 1002])
+
+    def test_retries_on_server_error_then_succeeds(self):
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(request.url.port)
+            if len(calls) == 1:
+                return httpx.Response(503, text="loading")
+            return httpx.Response(200, json={"embeddings": [[0.1, 0.2]]})
+
+        c = _client(handler, ["http://127.0.0.1:1001", "http://127.0.0.1:1002"], retries=2)
+        self.assertEqual(c.embed("m", ["x"]), [[0.1, 0.2]])
+        # retry goes to the other endpoint
+        self.assertEqual(calls, [1001, 1002])
+        self.assertEqual(c.endpoints[0].failures, 1)
+
+    def test_client_error_not_retried(self):
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(1)
+            return httpx.Response(404, json={"error": "model not found"})
+
+        c = _client(handler, ["http://127.0.0.1:1001"], retries=3)
+        with self.assertRaises(OllamaRequestError):
+            c.generate("missing", "p")
+        self.assertEqual(len(calls), 1)
+
+    def test_identical_concurrent_generations_share_one_request(self):
+        gate = threading.Event()
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(1)
+            gate.wait(2)
+            return httpx.Response(200, json={"response": "shared"})
+
+        c = _client(handler, ["http://127.0.0.1:1001"])
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(c.generate("m", "same"))) for _ in range(3)]
+        threads[0].start()
+        while not c.endpoints[0].inflight:
+            pass
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.05)  # followers are now waiting on the leader's request
+        gate.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ["shared"] * 3)
+        self.assertEqual(len(calls), 1)
+        # Uncoalesced client sends every request
+        calls.clear()
+        c2 = _client(handler, ["http://127.0.0.1:1001"], coalesce=False)
+        c2.generate("m", "same")
+        c2.generate("m", "same")
+        self.assertEqual(len(calls), 2)
+
+    def test_embeddings_batching(self):
+        sizes = []
+
+        def handler(request: httpx.Request):
+            import json
+
+            texts = json.loads(request.content)["input"]
+            sizes.append(len(texts))
+            return httpx.Response(200, json={"embeddings": [[float(len(t))] for t in texts]})
+
+        emb = PooledOllamaEmbeddings("m", _client(handler, ["http://127.0.0.1:1001"]), batch_size=2)
+        self.assertEqual(emb.embed_documents(["a", "bb", "ccc"]), [[1.0], [2.0], [3.0]])
+        self.assertEqual(sizes, [2, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data_init.loaders import detect_encoding, iter_documents, load_documents, loader_for, register_loader
+
+
+class TestLoaders(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _write(self, name, data: bytes) -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_detect_encoding(self):
+        self.assertEqual(detect_encoding("政府采购".encode("utf-8")), "utf-8")
+        self.assertEqual(detect_encoding("政府采购".encode("utf-8")[:-1]), "utf-8")  # cut mid-character
+        self.assertEqual(detect_encoding("政府采购".encode("gbk")), "gb18030")
+        self.assertEqual(detect_encoding(b'<meta charset="GB2312">'), "gb18030")
+        self.assertEqual(detect_encoding(b"\xef\xbb\xbfabc"), "utf-8-sig")
+
+    def test_plain_text_keeps_existing_metadata(self):
+        path = self._write("【四川】明确采购人主体责任", "压实主体责任。".encode("utf-8"))
+        (doc,) = load_documents(path)
+        self.assertEqual(doc["text"], "压实主体责任。")
+        self.assertEqual(doc["metadata"]["source_name"], "【四川】明确采购人主体责任")
+        self.assertEqual((doc["metadata"]["kb_type"], doc["metadata"]["province"]), ("regional", "四川"))
+        self.assertEqual(doc["metadata"]["source_path"], path)
+
+    def test_gbk_html_page(self):
+        html = (
+            '<html><head><meta http-equiv="Content-Type" content="text/html; charset=gb2312">'
+            "<title>【河南】力推采购人主体责任有效落实</title><style>p{}</style></head>"
+            "<body><div>河南省财政厅印发通知。</div><script>var a = 1;</script><p>强化&nbsp;内控管理。</p></body></html>"
+        )
+        path = self._write("t20250912_123.htm", html.encode("gb18030"))
+        (doc,) = load_documents(path)
+        self.assertEqual(doc["text"], "河南省财政厅印发通知。\n强化 内控管理。")
+        self.assertEqual(doc["metadata"]["source_name"], "【河南】力推采购人主体责任有效落实")
+        self.assertEqual(doc["metadata"]["province"], "河南")
+        self.assertEqual(doc["metadata"]["source_format"], "html")
+
+    def test_gzipped_jsonl_streams_one_document_per_record(self):
+        path = os.path.join(self.dir, "【广东】导出.jsonl.gz")
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"title": "【中央】国采中心培训", "content": "提升采购效率。"}, ensure_ascii=False) + "\n")
+            f.write("not json\n\n")
+            f.write(json.dumps({"text": "推行电子化采购。"}, ensure_ascii=False) + "\n")
+        docs = list(load_documents(path))
+        self.assertEqual([d["metadata"]["source_name"] for d in docs], ["【中央】国采中心培训", "【广东】导出#4"])
+        self.assertEqual([d["metadata"]["province"] for d in docs], ["中央", "广东"])
+        self.assertEqual(docs[1]["metadata"]["source_path"], path + "#L4")
+
+    def test_tar_gz_members_are_dispatched_by_name(self):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+            for name, data in (("pages/【辽宁】整治.html", "<p>辽宁整治四类问题。</p>"), ("pages/【中央】通知.txt", "中央通知。")):
+                raw = data.encode("utf-8")
+                info = tarfile.TarInfo(name)
+                info.size = len(raw)
+                tar.addfile(info, io.BytesIO(raw))
+        self._write("bundle.tgz", buf.getvalue())
+        docs = list(iter_documents(self.dir))
+        self.assertEqual([(d["metadata"]["source_name"], d["text"]) for d in docs], [("【辽宁】整治", "辽宁整治四类问题。"), ("【中央】通知", "中央通知。")])
+
+    def test_sniffing_without_extension(self):
+        self.assertEqual(loader_for("【四川】页面", b"<!DOCTYPE html><html>"), "html")
+        self.assertEqual(loader_for("dump", b'{"text": "a"}\n{"text": "b"}'), "jsonl")
+        self.assertEqual(loader_for("【四川】正文", "四川省。".encode("utf-8")), "text")
+
+    def test_register_custom_loader(self):
+        @register_loader("upper_test", extensions=(".upper-test",))
+        def _load(stream, name, path):
+            yield {"text": stream.read().decode("utf-8").upper(), "metadata": {"source_name": name}}
+
+        from src.data_init import loaders
+
+        self.addCleanup(loaders._EXTENSIONS.pop, ".upper-test")
+        self.addCleanup(loaders._LOADERS.pop, "upper_test")
+        path = self._write("x.upper-test", b"abc")
+        self.assertEqual(next(load_documents(path))["text"], "ABC")
+
+
+if __name__ == "__main__":
+    unittest.main()
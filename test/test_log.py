@@ -0,0 +1,49 @@
+import logging
+import os
+import sys
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils.log import LCELFileCallback, setup_run_logging, shutdown_logging
+
+
+class TestRunLogging(unittest.TestCase):
+    def tearDown(self):
+        shutdown_logging()
+
+    def test_handlers_do_not_accumulate(self):
+        for queued in (False, True, True, False):
+            setup_run_logging(label="test_log", debug=True, queued=queued, per_run=False)
+        self.assertEqual(len(logging.getLogger("multi_search").handlers), 1)
+        self.assertEqual(len(logging.getLogger("langchain").handlers), 1)
+
+    def test_queued_mode_writes_file(self):
+        path = setup_run_logging(label="test_log", debug=True, queued=True, per_run=False)
+        logging.getLogger("multi_search").info("queued-marker")
+        shutdown_logging()
+        with open(path, "r", encoding="utf-8") as f:
+            self.assertIn("queued-marker", f.read())
+
+
+class TestLazyPreview(unittest.TestCase):
+    def test_preview_bounded_before_serialization(self):
+        cb = LCELFileCallback(logging.getLogger("test_log_preview"), preview_limit=100)
+        payload = {"contexts": [{"text": "采" * 10000} for _ in range(1000)]}
+        s = cb._p(payload)
+        self.assertLessEqual(len(s), 100 + len("...(99999 chars)"))
+
+    def test_disabled_level_skips_preview(self):
+        lg = logging.getLogger("test_log_disabled")
+        lg.setLevel(logging.INFO)
+        cb = LCELFileCallback(lg)
+
+        class Boom:
+            def __str__(self):
+                raise AssertionError("preview built while DEBUG disabled")
+
+        cb.on_chain_start({}, {"x": Boom()}, run_id=uuid.uuid4(), name="EnrichInput")
+
+
+if __name__ == "__main__":
+    unittest.main()
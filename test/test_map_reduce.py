@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.pipeline.prompt import build_group_prompt, build_reduce_prompt
+from src.pipeline.summary import summarize
+
+CONTEXTS = [
+    {"name": "core", "results": [{"text": "国采中心提升采购效率。", "source_name": "【中央】国采", "chunk_id": 0}]},
+    {"name": "target_region", "results": [{"text": "四川压实采购人主体责任。", "source_name": "【四川】明确", "chunk_id": 1}]},
+    {"name": "other_regions", "results": []},
+]
+
+
+def _fake_llm(prompt: str, *args, **kwargs) -> str:
+    if '"points"' in prompt:
+        if "【中央】国采::0" in prompt:
+            return json.dumps({"points": [{"text": "国采提效", "ref": "【中央】国采::0"}]}, ensure_ascii=False)
+        # Truncated map output is repaired
+        return '{"points": [{"text": "四川压责", "ref": "【四川】明确::1"'
+    if "各组要点" in prompt:
+        return json.dumps({"summary": "合并总结"}, ensure_ascii=False)
+    raise AssertionError("single-prompt call in map_reduce mode")
+
+
+class TestMapReduce(unittest.TestCase):
+    def _run(self, side_effect):
+        env = {"MULTI_SEARCH_LLM_CACHE": "off", "OLLAMA_BASE_URL": "http://127.0.0.1:9"}
+        with mock.patch.dict(os.environ, env):
+            with mock.patch("src.llm.generation.PooledOllamaLLM._call", side_effect=side_effect) as call:
+                md = summarize(CONTEXTS, "问题", province="四川", mode="map_reduce")
+        return md, call
+
+    def test_refs_kept_and_summary_from_reduce(self):
+        md, call = self._run(_fake_llm)
+        self.assertIn("### 总结\n合并总结", md)
+        self.assertIn("- 国采提效 [1-1]", md)
+        self.assertIn("- 四川压责 [2-1]", md)
+        self.assertIn("该组未检索到相关内容", md)
+        # Two non-empty groups + one reduce; the empty group is not sent
+        self.assertEqual(call.call_count, 3)
+
+    def test_map_calls_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def side_effect(prompt, *a, **kw):
+            if '"points"' in prompt:
+                barrier.wait()  # deadlocks (BrokenBarrierError) if map calls were sequential
+            return _fake_llm(prompt)
+
+        md, _ = self._run(side_effect)
+        self.assertIn("- 四川压责 [2-1]", md)
+
+    def test_reduce_prompt_has_no_refs(self):
+        p = build_reduce_prompt([{"name": "core", "points": ["要点"]}], "问题", "四川")
+        self.assertIn("- 要点", p)
+        self.assertNotIn("::", p)
+        self.assertIn("【中央】国采::0", build_group_prompt(CONTEXTS[0], 1, "问题", "四川"))
+
+
+if __name__ == "__main__":
+    unittest.main()
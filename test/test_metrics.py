@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils.metrics import LatencyHistogram, LatencyMetricsCallback, MetricsRegistry
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_within_precision(self):
+        h = LatencyHistogram()
+        for i in range(1, 1001):
+            h.record(i / 1000.0)
+        self.assertEqual(h.count, 1000)
+        self.assertAlmostEqual(h.percentile(0.5), 0.5, delta=0.5 * 0.02)
+        self.assertAlmostEqual(h.percentile(0.99), 0.99, delta=0.99 * 0.02)
+        self.assertLessEqual(h.percentile(1.0), h.max)
+
+    def test_empty(self):
+        self.assertEqual(LatencyHistogram().percentile(0.95), 0.0)
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_callback_dedupes_repeated_events(self):
+        reg = MetricsRegistry()
+        cb = LatencyMetricsCallback(reg)
+        rid = uuid.uuid4()
+        # build_app_chain attaches callbacks at step and chain level, so events arrive twice
+        cb.on_chain_start({}, {}, run_id=rid, name="EnrichInput")
+        cb.on_chain_start({}, {}, run_id=rid, name="EnrichInput")
+        cb.on_chain_end({}, run_id=rid)
+        cb.on_chain_end({}, run_id=rid)
+        self.assertEqual(reg.histogram("EnrichInput").count, 1)
+
+    def test_export_prometheus_and_json(self):
+        reg = MetricsRegistry()
+        reg.observe("Retrieve[core]", 0.01)
+        reg.observe("llm", 1.2)
+        text = reg.to_prometheus()
+        self.assertIn('multi_search_stage_latency_seconds{stage="Retrieve[core]",quantile="0.95"}', text)
+        self.assertIn('multi_search_stage_latency_seconds_count{stage="llm"} 1', text)
+        with tempfile.TemporaryDirectory() as d:
+            path = reg.export(os.path.join(d, "metrics.json"))
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        self.assertEqual(data["stages"]["llm"]["count"], 1)
+
+    def test_gauge_and_counter_labels(self):
+        reg = MetricsRegistry()
+        reg.set_gauge("queue_depth", "embed", 3)
+        reg.inc("worker_errors", "http://a:8101", label="worker")
+        reg.inc("speculative_retrieval", "hit", label="outcome")
+        reg.inc("speculative_retrieval", "hit", label="outcome")
+        text = reg.to_prometheus()
+        self.assertIn("# TYPE multi_search_queue_depth gauge", text)
+        self.assertIn('multi_search_queue_depth{stage="embed"} 3', text)
+        self.assertIn("# TYPE multi_search_worker_errors_total counter", text)
+        self.assertIn('multi_search_worker_errors_total{worker="http://a:8101"} 1', text)
+        self.assertIn('multi_search_speculative_retrieval_total{outcome="hit"} 2', text)
+        self.assertNotIn('{stage="hit"}', text)
+        self.assertEqual(reg.counters()["speculative_retrieval"], {"hit": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
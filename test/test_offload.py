@@ -0,0 +1,80 @@
+import json
+import os
+import pickle
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.pipeline import summary
+from src.pipeline.types import as_contexts
+from src.service.offload import CPUOffload, compact_contexts, get_offload, reset_offload
+from src.utils.metrics import MetricsRegistry
+
+_LONG = "四川省财政厅印发通知，明确远程异地评标的适用范围与组织方式，要求各地加快推广" * 3
+CONTEXTS = [
+    {"name": "core", "where": {"kb_type": "core"}, "results": [
+        {"text": "  国采中心举办培训班。聚焦采购效率，提升采购服务效能。", "source_name": "【中央】国采", "chunk_id": 0, "score": 0.1},
+    ]},
+    {"name": "target_region", "where": {"province": "四川"}, "results": [
+        {"text": "。" + _LONG + "。后续内容", "source_name": "【四川】明确", "chunk_id": 1, "kb_type": "regional"},
+        {"text": _LONG, "source_name": "【四川】明确", "chunk_id": 2},
+    ]},
+    {"name": "other_regions", "results": []},
+]
+_ANSWER = json.dumps({"summary": "推进远程异地评标", "core": [{"text": "举办培训", "ref": "【中央】国采::0"}], "target": []}, ensure_ascii=False)
+
+
+class TestCompactContexts(unittest.TestCase):
+    def test_renders_like_full_contexts(self):
+        small = compact_contexts(CONTEXTS)
+        self.assertIsNone(small[0].where)
+        self.assertLess(len(pickle.dumps(small)), len(pickle.dumps(as_contexts(CONTEXTS))))
+        for text in (_ANSWER, "没有JSON的输出"):
+            self.assertEqual(
+                summary._parse_and_render(text, small, "四川")[0],
+                summary._parse_and_render(text, CONTEXTS, "四川")[0],
+            )
+
+    def test_full_text_kept_for_extractive(self):
+        self.assertEqual(compact_contexts(CONTEXTS, full_text=True)[1]["results"][0]["text"], CONTEXTS[1]["results"][0]["text"])
+
+
+class TestCPUOffload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.registry = MetricsRegistry()
+        cls.offload = CPUOffload(1, min_chars=0, registry=cls.registry)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.offload.close()
+
+    def test_parse_and_render_in_child(self):
+        markdown, obj = self.offload.call(summary._parse_and_render, _ANSWER, compact_contexts(CONTEXTS), "四川")
+        self.assertEqual(markdown, summary._parse_and_render(_ANSWER, CONTEXTS, "四川")[0])
+        self.assertEqual(obj.core[0].ref, "【中央】国采::0")
+        # Child stage timings land in the parent's registry
+        for stage in ("summary_parse", "summary_render", "offload_wait"):
+            self.assertEqual(self.registry.histogram(stage).count, 1, stage)
+
+    def test_summary_modes_use_pool_when_enabled(self):
+        env = {"MULTI_SEARCH_CPU_OFFLOAD": "1", "MULTI_SEARCH_CPU_OFFLOAD_MIN_CHARS": "0"}
+        inline = {mode: summary.summarize(CONTEXTS, "如何提高采购效率", province="四川", mode=mode) for mode in ("extractive", "retrieval")}
+        with mock.patch.dict(os.environ, env):
+            try:
+                offload = get_offload()
+                with mock.patch.object(offload, "call", wraps=offload.call) as call:
+                    for mode, expected in inline.items():
+                        self.assertEqual(summary.summarize(CONTEXTS, "如何提高采购效率", province="四川", mode=mode), expected)
+                    self.assertEqual(call.call_count, 2)
+            finally:
+                reset_offload()
+
+    def test_disabled_by_default(self):
+        with mock.patch.dict(os.environ, {"MULTI_SEARCH_CPU_OFFLOAD": "0"}):
+            self.assertIsNone(get_offload())
+
+
+if __name__ == "__main__":
+    unittest.main()
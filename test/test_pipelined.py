@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.pipeline import chain as chain_mod
+from src.rag import catalog as catalog_mod
+from src.rag.catalog import KBCatalog, KBSpec
+from src.utils.metrics import MetricsRegistry
+
+_DELAY = 0.2
+
+
+class _Store:
+    """Records every search; returns one doc tagged with the filter it was asked for."""
+
+    def __init__(self):
+        self.calls = []
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def similarity_search_by_vector(self, vec, k=4, filter=None):
+        with self._lock:
+            self.calls.append(filter)
+        time.sleep(self.delay)
+        md = {"source_name": f"doc:{json.dumps(filter, ensure_ascii=False, sort_keys=True)}", "chunk_id": 0}
+        return [SimpleNamespace(page_content="正文", metadata=md)]
+
+
+class _SlowEmbeddings:
+    def embed_query(self, text):
+        time.sleep(_DELAY)
+        return [1.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(t) for t in texts]
+
+
+def _slow_province(question):
+    time.sleep(_DELAY)
+    return "四川"
+
+
+class TestPipelinedChain(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        with open(os.path.join(self.tmp, "kb_registry.json"), "w", encoding="utf-8") as f:
+            json.dump({"provinces": ["四川", "河南"], "kb_types": ["core", "regional"], "total_chunks": 4}, f, ensure_ascii=False)
+        self.store = _Store()
+        self.registry = MetricsRegistry()
+        catalog = KBCatalog({"default": KBSpec("default", persist_dir=self.tmp)}, registry=MetricsRegistry())
+        patches = [
+            mock.patch.object(catalog_mod, "_open_vectorstore", side_effect=lambda spec, d: self.store),
+            mock.patch.object(chain_mod, "get_catalog", return_value=catalog),
+            mock.patch.object(chain_mod, "get_langchain_embeddings", side_effect=_SlowEmbeddings),
+            mock.patch.object(chain_mod, "resolve_province", side_effect=_slow_province),
+            mock.patch.object(chain_mod, "get_metrics_registry", return_value=self.registry),
+            mock.patch.object(chain_mod, "_summarize_and_refs", side_effect=lambda s: s),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _run(self, speculative):
+        t0 = time.perf_counter()
+        out = chain_mod.build_app_chain(speculative=speculative).invoke({"question": "四川采购效率", "top_k": 2})
+        return out, time.perf_counter() - t0
+
+    def _groups(self, out):
+        return {g.name: [c.source_name for c in g.results] for g in out["contexts"]}
+
+    def test_embedding_overlaps_province_resolution(self):
+        out, elapsed = self._run(speculative=False)
+        self.assertEqual(out["province"], "四川")
+        self.assertLess(elapsed, 2 * _DELAY)  # max(embed, extract), not the sum
+        self.assertEqual(len(self.store.calls), 3)
+        self.assertEqual(self.registry.counters().get("speculative_retrieval"), None)
+
+    def test_core_group_retrieved_once_speculatively(self):
+        baseline, _ = self._run(speculative=False)
+        self.store.calls.clear()
+        out, _ = self._run(speculative=True)
+        self.assertEqual(self._groups(out), self._groups(baseline))
+        self.assertEqual(self.store.calls.count({"kb_type": "core"}), 1)
+        self.assertEqual(len(self.store.calls), 3)
+        self.assertEqual(self.registry.counters()["speculative_retrieval"], {"hit": 1})
+
+    def test_speculation_stays_off_the_critical_path(self):
+        # Fast province resolution, slow search: the core group must run alongside the
+        # other groups (embed + search), not before them (embed + 2 x search)
+        self.store.delay = _DELAY
+        with mock.patch.object(chain_mod, "resolve_province", return_value="四川"):
+            out, elapsed = self._run(speculative=True)
+        self.assertEqual(len(out["contexts"]), 3)
+        self.assertLess(elapsed, 2.5 * _DELAY)
+        self.assertEqual(len(self.store.calls), 3)
+        self.assertEqual(self.registry.counters()["speculative_retrieval"], {"hit": 1})
+
+    def test_prefetch_ignored_when_plan_differs(self):
+        state = chain_mod._prefetch({"question": "q", "top_k": 2})
+        self.assertEqual(list(state["prefetched"]), ["core"])
+        state["prefetched"]["core"][2].result()
+        # A different k means the speculative hits are not what the plan asks for
+        plan = chain_mod._build_filters({"question": "q", "province": "四川", "kb": "default"})
+        self.store.calls.clear()
+        chain_mod._run_multi_query({**plan, **state, "top_k": 3})
+        self.assertEqual(self.store.calls.count({"kb_type": "core"}), 1)
+        self.assertEqual(self.registry.counters()["speculative_retrieval"], {"miss": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
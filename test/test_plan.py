@@ -0,0 +1,78 @@
+import json
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.rag import plan as plan_mod
+from src.rag.partition import build_partition_filters_precise
+from src.rag.plan import PlanTable, get_plan_table, reset_plan_state
+
+
+class TestPlanTable(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "kb_registry.json")
+        self._write(["四川", "河南", "广东"])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, provinces):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"provinces": provinces, "kb_types": ["core", "regional"], "total_chunks": 1}, f, ensure_ascii=False)
+
+    def test_plans_match_partition_filters(self):
+        table = PlanTable(self.path)
+        self.assertEqual(len(table), 4)  # three provinces + no province
+        provinces = ["四川", "河南", "广东"]
+        for p in provinces + [None]:
+            self.assertEqual([dict(f) for f in table.get(p).filters_list], build_partition_filters_precise(p, provinces))
+        self.assertIs(table.get("四川"), table.get("四川"))
+        self.assertEqual(table.get(None).group_names, ("core", "others"))
+
+    def test_filters_are_read_only(self):
+        f = PlanTable(self.path).get("四川").filters_list[2]
+        with self.assertRaises(TypeError):
+            f["name"] = "x"
+        with self.assertRaises(TypeError):
+            f["where"]["$and"][0].update(kb_type="core")
+        self.assertIsInstance(f, dict)
+        self.assertEqual(json.loads(json.dumps(f, ensure_ascii=False))["name"], "other_regions")
+        self.assertEqual(pickle.loads(pickle.dumps(f)), f)
+
+    def test_unknown_province_is_planned_on_demand(self):
+        table = PlanTable(self.path)
+        where = table.get("西藏").filters_list[2]["where"]
+        self.assertEqual(where["$and"][1], {"province": {"$ne": "西藏"}})
+        self.assertEqual(len(table), 5)
+
+    def test_rebuilds_when_registry_changes(self):
+        table = PlanTable(self.path)
+        self._write(["四川", "河南", "广东", "浙江"])
+        os.utime(self.path, (0, os.path.getmtime(self.path) + 5))
+        self.assertFalse(table.refresh())  # within the check interval
+        table._checked -= plan_mod._CHECK_INTERVAL_S
+        self.assertTrue(table.refresh())
+        self.assertEqual(table.builds, 2)
+        self.assertIn("浙江", table.get("四川").filters_list[2]["where"]["$and"][1]["province"]["$in"])
+
+    def test_shared_table_follows_persist_dir(self):
+        old = os.environ.get("CHROMA_PERSIST_DIR")
+        os.environ["CHROMA_PERSIST_DIR"] = self.tmp.name
+        try:
+            reset_plan_state()
+            self.assertIs(get_plan_table(), get_plan_table())
+            self.assertEqual(get_plan_table().provinces(), ["四川", "河南", "广东"])
+        finally:
+            if old is None:
+                os.environ.pop("CHROMA_PERSIST_DIR", None)
+            else:
+                os.environ["CHROMA_PERSIST_DIR"] = old
+            reset_plan_state()
+
+
+if __name__ == "__main__":
+    unittest.main()
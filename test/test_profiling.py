@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.utils.profiling import SamplingProfilerCallback, StackSampler
+
+
+def _busy_wait(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(200))
+
+
+class TestStackSampler(unittest.TestCase):
+    def test_samples_running_function(self):
+        sampler = StackSampler(interval=0.002).start()
+        _busy_wait(0.1)
+        sampler.stop()
+        folded = sampler.to_folded()
+        self.assertIn("_busy_wait", folded)
+        doc = sampler.to_speedscope("test")
+        self.assertEqual(doc["profiles"][0]["type"], "sampled")
+        names = {f["name"] for f in doc["shared"]["frames"]}
+        self.assertIn("_busy_wait", names)
+
+
+class TestSamplingProfilerCallback(unittest.TestCase):
+    def test_rate_zero_never_profiles(self):
+        cb = SamplingProfilerCallback(rate=0.0)
+        rid = uuid.uuid4()
+        cb.on_chain_start({}, {}, run_id=rid, name="AppChain", parent_run_id=None)
+        cb.on_chain_end({}, run_id=rid)
+        self.assertEqual(cb.written, [])
+
+    def test_root_run_profile_written(self):
+        cb = SamplingProfilerCallback(rate=1.0, interval=0.002)
+        rid = uuid.uuid4()
+        with tempfile.TemporaryDirectory() as d:
+            import src.utils.profiling as prof
+
+            orig = prof.profile_output_path
+            prof.profile_output_path = lambda fmt="speedscope", label="q": os.path.join(d, "p.speedscope.json")
+            try:
+                cb.on_chain_start({}, {}, run_id=rid, name="AppChain", parent_run_id=None)
+                # child runs never start a second sampler
+                cb.on_chain_start({}, {}, run_id=uuid.uuid4(), name="EnrichInput", parent_run_id=rid)
+                _busy_wait(0.05)
+                cb.on_chain_end({}, run_id=rid)
+            finally:
+                prof.profile_output_path = orig
+            self.assertEqual(len(cb.written), 1)
+            with open(cb.written[0], "r", encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["name"], "AppChain")
+
+    def test_only_threads_of_the_sampled_run_are_recorded(self):
+        import threading
+
+        def _sampled_child_work(seconds):
+            _busy_wait(seconds)
+
+        def _other_request_work(seconds):
+            _busy_wait(seconds)
+
+        def child(parent):
+            cid = uuid.uuid4()
+            cb.on_chain_start({}, {}, run_id=cid, name="Retrieve", parent_run_id=parent)
+            _sampled_child_work(0.08)
+            cb.on_chain_end({}, run_id=cid, parent_run_id=parent)
+            _other_request_work(0.08)  # the pool thread moves on to other work
+
+        cb = SamplingProfilerCallback(rate=1.0, interval=0.002)
+        rid = uuid.uuid4()
+        with tempfile.TemporaryDirectory() as d:
+            import src.utils.profiling as prof
+
+            orig = prof.profile_output_path
+            prof.profile_output_path = lambda fmt="speedscope", label="q": os.path.join(d, "p.folded")
+            cb.fmt = "folded"
+            try:
+                cb.on_chain_start({}, {}, run_id=rid, name="AppChain", parent_run_id=None)
+                other = threading.Thread(target=_other_request_work, args=(0.15,), name="other-request")
+                worker = threading.Thread(target=child, args=(rid,), name="pool-worker")
+                other.start()
+                worker.start()
+                _busy_wait(0.02)
+                worker.join()
+                other.join()
+                cb.on_chain_end({}, run_id=rid)
+            finally:
+                prof.profile_output_path = orig
+            with open(cb.written[0], "r", encoding="utf-8") as f:
+                folded = f.read()
+        self.assertIn("_sampled_child_work", folded)
+        self.assertNotIn("other-request", folded)
+        self.assertNotIn("_other_request_work", folded)
+        self.assertEqual((cb._children, cb._threads), ({}, {}))
+
+    def test_all_threads(self):
+        cb = SamplingProfilerCallback(rate=1.0, all_threads=True)
+        rid = uuid.uuid4()
+        cb.on_chain_start({}, {}, run_id=rid, name="AppChain", parent_run_id=None)
+        try:
+            self.assertIsNone(cb._active[rid][0].thread_ids)
+        finally:
+            cb._active.pop(rid)[0].stop()
+
+
+class TestChainProfileRate(unittest.TestCase):
+    def test_distributed_chain_gets_the_profiler(self):
+        from src.service.coordinator import Coordinator
+
+        coordinator = Coordinator(["http://127.0.0.1:9"])
+        self.addCleanup(coordinator.close)
+        profilers = lambda chain: [cb for cb in chain.config["callbacks"] if isinstance(cb, SamplingProfilerCallback)]
+        self.assertEqual([cb.rate for cb in profilers(coordinator.build_chain(profile_rate=1.0))], [1.0])
+        self.assertEqual(profilers(coordinator.build_chain(profile_rate=0.0)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.pipeline.repair import lenient_json
+from src.pipeline.summary import summarize_with_ollama
+
+CONTEXTS = [
+    {"name": "core", "results": [{"text": "国采中心提升采购效率。其他。", "source_name": "【中央】国采", "chunk_id": 0}]},
+    {"name": "target_region", "results": [{"text": "四川压实采购人主体责任。", "source_name": "【四川】明确", "chunk_id": 1}]},
+    {"name": "other_regions", "results": [{"text": "广东推行电子化采购。", "source_name": "【广东】电子", "chunk_id": 2}]},
+]
+
+
+class TestLenientJson(unittest.TestCase):
+    def test_well_formed(self):
+        self.assertEqual(lenient_json('{"a": [1, 2], "b": "x"}'), {"a": [1, 2], "b": "x"})
+
+    def test_fences_chatter_and_think(self):
+        text = '<think>先想想 {"no": 1}</think>好的：\n```json\n{"summary": "s"}\n```\n以上。'
+        self.assertEqual(lenient_json(text), {"summary": "s"})
+
+    def test_truncated_object(self):
+        got = lenient_json('{"summary": "采购效率", "core": [{"text": "要点一", "ref": "a::0"}, {"text": "要点')
+        self.assertEqual(got["summary"], "采购效率")
+        self.assertEqual(got["core"], [{"text": "要点一", "ref": "a::0"}, {"text": "要点"}])
+
+    def test_trailing_commas_single_quotes_bare_keys(self):
+        got = lenient_json("{summary: 's', 'core': [{'text': 't', 'ref': 'a::0',},], ok: True, n: 1.5,}")
+        self.assertEqual(got, {"summary": "s", "core": [{"text": "t", "ref": "a::0"}], "ok": True, "n": 1.5})
+
+    def test_missing_values_keep_nesting(self):
+        cases = [
+            ('{"core":[{"text":"t","ref":}], "summary":"s"}', {"core": [{"text": "t", "ref": None}], "summary": "s"}),
+            ('{"x":{"a":}, "b":1}', {"x": {"a": None}, "b": 1}),
+            ('{"a":, "b":[1,,2], "c":}', {"a": None, "b": [1, 2], "c": None}),
+        ]
+        for text, expected in cases:
+            with self.subTest(text):
+                self.assertEqual(lenient_json(text), expected)
+
+    def test_escapes(self):
+        self.assertEqual(lenient_json('{"a": "x\\n\\u56db\\"'), {"a": 'x\n四"'})
+
+    def test_no_object(self):
+        self.assertIsNone(lenient_json("模型只输出了文字"))
+        self.assertIsNone(lenient_json(""))
+
+
+class TestSummarizeRepair(unittest.TestCase):
+    def _run(self, response: str) -> str:
+        env = {"MULTI_SEARCH_LLM_CACHE": "off", "OLLAMA_BASE_URL": "http://127.0.0.1:9"}
+        with mock.patch.dict(os.environ, env):
+            with mock.patch("src.llm.generation.PooledOllamaLLM._call", return_value=response):
+                return summarize_with_ollama(CONTEXTS, "问题", province="四川")
+
+    def test_truncated_output_renders_and_fills_groups(self):
+        md = self._run('{"summary": "总述", "core": [{"text": "提升效率", "ref": "【中央】国采::0"}], "target_region": [{"text": "压实责')
+        self.assertIn("### 总结\n总述", md)
+        self.assertIn("- 提升效率 [1-1]", md)
+        # Unresolvable ref → group filled from contexts
+        self.assertIn("- 四川压实采购人主体责任 [2-1]", md)
+        self.assertIn("- 广东推行电子化采购 [3-1]", md)
+
+    def test_non_json_output_falls_back_to_snippets(self):
+        md = self._run("抱歉，我无法给出JSON。")
+        self.assertIn("核心组：国采中心提升采购效率。", md)
+        self.assertIn("目标地域组（四川）：四川压实采购人主体责任。", md)
+        for title in ("## 核心组", "## 目标地域组", "## 其他组"):
+            self.assertIn(title, md)
+
+    def test_empty_output_raises(self):
+        with self.assertRaises(RuntimeError):
+            self._run("  ")
+
+
+if __name__ == "__main__":
+    unittest.main()
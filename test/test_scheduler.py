@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from langchain_core.runnables import RunnableLambda
+
+from src.service.scheduler import QueryRejected, QueryScheduler
+from src.utils.metrics import MetricsRegistry
+
+
+def _stages(summarize_delay: float = 0.0, embed_gate: threading.Event = None):
+    def embed(x):
+        if embed_gate is not None:
+            embed_gate.wait(5)
+        return {**x, "question_vector": [0.0]}
+
+    def summarize(x):
+        if x["summary_mode"] in ("single", "map_reduce"):
+            time.sleep(summarize_delay)
+        return {"question": x["question"], "summary": f"mode={x['summary_mode']}", "references": []}
+
+    return {
+        "plan": RunnableLambda(lambda x: {**x, "filters_list": []}),
+        "embed": RunnableLambda(embed),
+        "retrieve": RunnableLambda(lambda x: {**x, "contexts": []}),
+        "summarize": RunnableLambda(summarize),
+    }
+
+
+class TestQueryScheduler(unittest.TestCase):
+    def test_runs_requested_tier(self):
+        reg = MetricsRegistry()
+        s = QueryScheduler(registry=reg, stages=_stages(), summary_mode="single", deadline_s=5)
+        out = s.run("问题")
+        self.assertEqual(out["tier"], "single")
+        self.assertFalse(out["degraded"])
+        self.assertEqual(reg.gauges()["queue_depth"], {"embed": 0, "retrieve": 0, "summarize": 0})
+        self.assertEqual(reg.histogram("service[summarize]").count, 1)
+
+    def test_degrades_when_llm_slot_cannot_be_had_in_time(self):
+        reg = MetricsRegistry()
+        reg.observe("service[summarize]", 0.5)  # learned LLM service time
+        s = QueryScheduler(registry=reg, stages=_stages(summarize_delay=0.5), summary_mode="single", summarize_concurrency=1)
+        first = threading.Thread(target=s.run, args=("慢请求",), kwargs={"deadline_s": 5})
+        first.start()
+        time.sleep(0.1)  # first request now holds the only LLM slot
+        out = s.run("快请求", deadline_s=0.2)
+        first.join()
+        self.assertEqual(out["tier"], "extractive")
+        self.assertTrue(out["degraded"])
+        self.assertEqual(reg.counters()["degraded"], {"single->extractive": 1})
+
+    def test_rejects_without_degradation(self):
+        s = QueryScheduler(registry=MetricsRegistry(), stages=_stages(summarize_delay=0.5), summary_mode="single",
+                           summarize_concurrency=1, degrade=False)
+        first = threading.Thread(target=s.run, args=("慢请求",), kwargs={"deadline_s": 5})
+        first.start()
+        time.sleep(0.1)
+        with self.assertRaises(QueryRejected) as cm:
+            s.run("快请求", deadline_s=0.2)
+        first.join()
+        self.assertEqual(cm.exception.stage, "summarize")
+
+    def test_queue_full_rejects_at_embed(self):
+        reg = MetricsRegistry()
+        gate = threading.Event()
+        s = QueryScheduler(registry=reg, stages=_stages(embed_gate=gate), embed_concurrency=1, max_queue=1, deadline_s=5)
+        threads = [threading.Thread(target=s.run, args=(f"q{i}",)) for i in range(2)]
+        for t in threads:
+            t.start()
+            time.sleep(0.05)  # one running, one queued
+        self.assertEqual(reg.gauges()["queue_depth"]["embed"], 1)
+        with self.assertRaises(QueryRejected) as cm:
+            s.run("q2")
+        gate.set()
+        for t in threads:
+            t.join()
+        self.assertEqual((cm.exception.stage, cm.exception.reason), ("embed", "queue_full"))
+        self.assertEqual(reg.counters()["rejected"], {"embed:queue_full": 1})
+        self.assertIn('multi_search_queue_depth{stage="embed"} 0', reg.to_prometheus())
+        self.assertIn('multi_search_rejected_total{reason="embed:queue_full"} 1', reg.to_prometheus())
+
+
+if __name__ == "__main__":
+    unittest.main()
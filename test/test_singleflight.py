@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from langchain_core.runnables import RunnableLambda
+
+from src.pipeline.normalize import normalize_question
+from src.service.scheduler import QueryScheduler
+from src.utils.metrics import MetricsRegistry
+from src.utils.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_overlapping_calls_share_result_and_error(self):
+        sf = SingleFlight("t", MetricsRegistry())
+        gate = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            gate.wait(2)
+            return {"v": 1}
+
+        out = []
+        threads = [threading.Thread(target=lambda: out.append(sf.do("k", fn))) for _ in range(3)]
+        threads[0].start()
+        while not calls:
+            time.sleep(0.001)
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.05)
+        gate.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _, shared in out), [False, True, True])
+        self.assertEqual(sf.registry.counters()["coalesced"], {"t": 2})
+        # Not a cache: a later call runs again
+        sf.do("k", fn)
+        self.assertEqual(len(calls), 2)
+
+        def boom():
+            raise ValueError("x")
+
+        with self.assertRaises(ValueError):
+            sf.do("e", boom)
+        self.assertEqual(sf.inflight(), 0)
+
+    def test_normalize_question(self):
+        base = normalize_question("四川在提高政府采购效率有哪些措施？")
+        self.assertEqual(normalize_question("  四川 在提高政府采购效率有哪些措施?? "), base)
+        self.assertEqual(normalize_question("四川在提高政府采购效率有哪些措施"), base)
+        self.assertEqual(normalize_question("ＡＢＣ  Hello World!"), "abc hello world")
+
+
+class TestSchedulerCoalescing(unittest.TestCase):
+    def test_identical_questions_share_one_execution(self):
+        gate = threading.Event()
+        summarized = []
+
+        def summarize(x):
+            summarized.append(x["question"])
+            gate.wait(2)
+            return {"question": x["question"], "summary": "s", "references": []}
+
+        stages = {
+            "plan": RunnableLambda(lambda x: x),
+            "embed": RunnableLambda(lambda x: x),
+            "retrieve": RunnableLambda(lambda x: x),
+            "summarize": RunnableLambda(summarize),
+        }
+        s = QueryScheduler(registry=MetricsRegistry(), stages=stages, summary_mode="single", deadline_s=5)
+        out = []
+        qs = ["四川采购效率措施？", "四川 采购效率措施", "四川采购效率措施?"]
+        threads = [threading.Thread(target=lambda q=q: out.append(s.run(q))) for q in qs]
+        threads[0].start()
+        while not summarized:
+            time.sleep(0.001)
+        for t in threads[1:]:
+            t.start()
+        time.sleep(0.05)
+        gate.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(summarized), 1)
+        self.assertEqual(sorted(o["coalesced"] for o in out), [False, True, True])
+        # Different top_k is a different request
+        gate.set()
+        s.run("四川采购效率措施", top_k=5)
+        self.assertEqual(len(summarized), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
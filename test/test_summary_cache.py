@@ -0,0 +1,109 @@
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.pipeline.cache import SummaryCache, summary_cache_key
+from src.pipeline.summary import SummaryItem, SummaryStructured, summarize_map_reduce, summarize_with_ollama
+from src.pipeline.prompt import build_summary_prompt
+
+CONTEXTS = [
+    {"name": "core", "results": [{"text": "国采中心提升采购效率。其他。", "source_name": "【中央】国采", "chunk_id": 0}]},
+    {"name": "target_region", "results": [{"text": "四川压实采购人主体责任。", "source_name": "【四川】明确", "chunk_id": 1}]},
+    {"name": "other_regions", "results": []},
+]
+
+
+class TestSummaryCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_model_options_prompt(self):
+        k = summary_cache_key("m", {"temperature": 0}, "p")
+        self.assertEqual(k, summary_cache_key("m", {"temperature": 0}, "p"))
+        self.assertNotEqual(k, summary_cache_key("m2", {"temperature": 0}, "p"))
+        self.assertNotEqual(k, summary_cache_key("m", {"temperature": 0.5}, "p"))
+        self.assertNotEqual(k, summary_cache_key("m", {"temperature": 0}, "p2"))
+
+    def test_key_depends_on_kind(self):
+        self.assertNotEqual(summary_cache_key("m", {}, "p"), summary_cache_key("m", {}, "p", kind="json"))
+
+    def test_roundtrip_is_json(self):
+        c = SummaryCache(self.path)
+        obj = SummaryStructured(summary="s", core=[SummaryItem(text="t", ref="a::0")])
+        c.put("k", obj.model_dump())
+        self.assertEqual(SummaryCache(self.path).get("k"), obj.model_dump())
+        with self.assertRaises(TypeError):
+            c.put("k2", obj)  # only JSON values
+
+    def test_pickled_entry_is_a_miss(self):
+        c = SummaryCache(self.path)
+        c._db.execute(
+            "INSERT INTO summary_cache(key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+            ("k", pickle.dumps({"v": 1}), 1, time.time(), time.time()),
+        )
+        self.assertIsNone(c.get("k"))
+        self.assertEqual(c.stats()["entries"], 0)
+
+    def test_map_reduce_and_single_prompt_entries_do_not_mix(self):
+        env = {"MULTI_SEARCH_LLM_CACHE": self.path, "OLLAMA_BASE_URL": "http://127.0.0.1:9"}
+        reply = '{"summary": "整体", "points": [{"text": "要点", "ref": "【中央】国采::0"}], "core": [{"text": "要点", "ref": "【中央】国采::0"}]}'
+        with mock.patch.dict(os.environ, env), mock.patch("src.llm.generation.PooledOllamaLLM._call", return_value=reply):
+            summarize_map_reduce(CONTEXTS, "问题", province="四川")
+            summarize_with_ollama(CONTEXTS, "问题", province="四川")
+        c = SummaryCache(self.path)
+        kinds = {}
+        for key, value in c._db.execute("SELECT key, value FROM summary_cache"):
+            kinds[key] = json.loads(value)
+        summaries = [v for v in kinds.values() if set(v) == {"summary", "core", "target", "others"}]
+        self.assertEqual(len(summaries), 1)  # the single-prompt entry, coerced before caching
+        self.assertEqual(len(kinds), 1 + 2 + 1)  # + one map entry per non-empty group + reduce
+
+    def test_age_eviction(self):
+        c = SummaryCache(self.path, max_age_s=10)
+        c.put("k", {"v": 1})
+        with mock.patch("src.pipeline.cache.time.time", return_value=time.time() + 11):
+            self.assertIsNone(c.get("k"))
+
+    def test_lru_eviction_by_entries(self):
+        c = SummaryCache(self.path, max_entries=2)
+        c.put("a", 1)
+        time.sleep(0.01)
+        c.put("b", 2)
+        time.sleep(0.01)
+        self.assertEqual(c.get("a"), 1)  # refresh a → b becomes LRU
+        time.sleep(0.01)
+        c.put("c", 3)
+        self.assertIsNone(c.get("b"))
+        self.assertEqual(c.get("a"), 1)
+        self.assertEqual(c.stats()["entries"], 2)
+
+    def test_size_eviction(self):
+        c = SummaryCache(self.path, max_bytes=3000)
+        for i in range(10):
+            c.put(str(i), "x" * 1000)
+        self.assertLessEqual(c.stats()["bytes"], 3000)
+
+    def test_hit_skips_llm_call(self):
+        prompt = build_summary_prompt(CONTEXTS, "问题", province="四川")
+        key = summary_cache_key("qwen3:0.6b", {"temperature": 0.0, "format": "json"}, prompt)
+        SummaryCache(self.path).put(key, SummaryStructured(summary="缓存命中", core=[SummaryItem(text="要点", ref="【中央】国采::0")]).model_dump())
+        env = {"MULTI_SEARCH_LLM_CACHE": self.path, "OLLAMA_BASE_URL": "http://127.0.0.1:9"}
+        with mock.patch.dict(os.environ, env):
+            with mock.patch("src.llm.generation.PooledOllamaLLM._call", side_effect=AssertionError("LLM called")):
+                md = summarize_with_ollama(CONTEXTS, "问题", province="四川")
+        self.assertIn("缓存命中", md)
+        self.assertIn("- 要点 [1-1]", md)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import pickle
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.pipeline.chain import _summarize_and_refs
+from src.pipeline.summary import SummaryItem, SummaryStructured, _structured_to_markdown
+from src.pipeline.types import Contexts, GroupResult, RetrievedChunk, as_contexts
+
+
+def _doc(name, cid, text="政府采购效率提升。其他内容"):
+    return SimpleNamespace(page_content=text, metadata={"source_name": name, "chunk_id": cid, "kb_type": "regional", "province": "四川"})
+
+
+def _contexts():
+    return Contexts(
+        [
+            GroupResult("core", {"kb_type": "core"}, [RetrievedChunk.from_doc(_doc("【中央】改革", 0))], 1),
+            GroupResult("target_region", None, [RetrievedChunk.from_doc(_doc("【四川】采购", i)) for i in (3, 4)], 2),
+            GroupResult("other_regions", None, [], 3),
+        ]
+    )
+
+
+class TestResultTypes(unittest.TestCase):
+    def test_ref_and_sid_precomputed(self):
+        ctx = _contexts()
+        chunk = ctx[1].results[1]
+        self.assertEqual((chunk.ref, chunk.sid), ("【四川】采购::4", "[2-2]"))
+        self.assertIsNone(RetrievedChunk("x", source_name="s").ref)
+        self.assertIs(ctx.sid_map(), ctx.sid_map())  # built once per request
+        self.assertEqual(ctx.sid_map()["【中央】改革::0"], "[1-1]")
+
+    def test_dict_contexts_accepted(self):
+        ctx = as_contexts([{"name": "core", "results": [{"text": "t", "source_name": "a", "chunk_id": 1, "score": 0.5}]}])
+        self.assertEqual(ctx[0].results[0].sid, "[1-1]")
+        self.assertEqual(ctx[0]["results"][0]["score"], 0.5)
+        self.assertEqual(ctx[0].results[0].get("missing", "d"), "d")
+        self.assertIs(as_contexts(ctx), ctx)
+        self.assertEqual(as_contexts(ctx.to_dicts())[0].results[0].to_dict(), ctx[0].results[0].to_dict())
+
+    def test_pickles_with_slots(self):
+        ctx = pickle.loads(pickle.dumps(_contexts()))
+        self.assertEqual(ctx[1].results[0].sid, "[2-1]")
+        self.assertEqual(ctx.sid_map()["【四川】采购::3"], "[2-1]")
+
+    def test_render_and_references_share_sids(self):
+        ctx = _contexts()
+        obj = SummaryStructured.model_construct(summary="总结", core=[SummaryItem(text="深化改革", ref="【中央】改革::0")], target=[], others=[])
+        md = _structured_to_markdown(obj, ctx)
+        self.assertIn("- 深化改革 [1-1]", md)
+        self.assertIn("- 政府采购效率提升 [2-2]", md)
+        out = _summarize_and_refs({"question": "q", "contexts": ctx, "summary_mode": "retrieval"})
+        self.assertEqual(out["references"][1], {"name": "target_region", "items": ["[2-1] 【四川】采购", "[2-2] 【四川】采购"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
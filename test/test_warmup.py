@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.llm.client import OllamaClient
+from src.llm.embeddings import embed_model, get_langchain_embeddings
+from src.llm.generation import get_langchain_llm, llm_model
+from src.rag import catalog as catalog_mod
+from src.rag.catalog import KBCatalog, KBSpec
+from src.service.warmup import warm_up
+from src.service.worker import QueryWorker, WorkerServer
+from src.utils.metrics import MetricsRegistry
+
+
+class _Store:
+    def __init__(self):
+        self.filters = []
+
+    def similarity_search_by_vector(self, vec, k=4, filter=None):
+        self.filters.append(filter)
+        return []
+
+
+class _Embeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def _ollama(requests, fail=()):
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append((str(request.url), body))
+        if request.url.host in fail:
+            return httpx.Response(500, text="boom")
+        if request.url.path == "/api/embed":
+            return httpx.Response(200, json={"embeddings": [[0.0]]})
+        return httpx.Response(200, json={"response": "", "done_reason": "load"})
+
+    return OllamaClient(["http://a:11434", "http://b:11434"], transport=httpx.MockTransport(handler), retries=0)
+
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        with open(os.path.join(self.tmp, "kb_registry.json"), "w", encoding="utf-8") as f:
+            json.dump({"provinces": ["四川", "河南"], "kb_types": ["core", "regional"], "total_chunks": 4}, f, ensure_ascii=False)
+        with open(os.path.join(self.tmp, "index.bin"), "wb") as f:
+            f.write(b"\0" * 5000)
+        self.store = _Store()
+        patch = mock.patch.object(catalog_mod, "_open_vectorstore", side_effect=lambda spec, d: self.store)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.catalog = KBCatalog({"default": KBSpec("default", persist_dir=self.tmp)}, registry=MetricsRegistry())
+        self.registry = MetricsRegistry()
+
+    def test_preloads_models_touches_index_and_runs_each_plan(self):
+        requests = []
+        report = warm_up(self.catalog, keep_alive="1h", client=_ollama(requests), embeddings=_Embeddings(), registry=self.registry)
+        self.assertEqual(report["errors"], [])
+        # Both models on both endpoints, each with the configured keep_alive
+        self.assertEqual(sorted((u.split("/")[2], b["model"]) for u, b in requests), sorted(
+            (h, m) for h in ("a:11434", "b:11434") for m in (embed_model(), llm_model())
+        ))
+        self.assertTrue(all(b["keep_alive"] == "1h" for _, b in requests))
+        self.assertEqual([b["prompt"] for u, b in requests if u.endswith("/api/generate")], ["", ""])
+        self.assertGreaterEqual(report["index"]["default"]["bytes"], 5000)
+        # No province (core + others), then 四川 and 河南 (core + target + other each)
+        self.assertEqual(report["index"]["default"]["plans"], 3)
+        self.assertEqual(len(self.store.filters), 2 + 3 + 3)
+        for stage in ("warmup[models]", "warmup[index]", "warmup[queries]"):
+            self.assertEqual(self.registry.histogram(stage).count, 1, stage)
+
+    def test_preloads_the_models_queries_use(self):
+        requests = []
+        with mock.patch.dict(os.environ, {"OLLAMA_LLM_MODEL": "other-llm", "OLLAMA_EMBED_MODEL": "other-embed"}):
+            warm_up(self.catalog, index=False, client=_ollama(requests), registry=self.registry)
+            self.assertEqual(get_langchain_llm().model, "other-llm")
+            self.assertEqual(get_langchain_embeddings().model, "other-embed")
+        self.assertEqual({b["model"] for _, b in requests}, {"other-llm", "other-embed"})
+
+    def test_failures_are_reported_and_remaining_steps_run(self):
+        report = warm_up(self.catalog, client=_ollama([], fail=("b",)), embeddings=_Embeddings(), registry=self.registry)
+        self.assertEqual(len(report["errors"]), 2)  # embed + generate preload on b
+        self.assertTrue(all("http://b:11434" in e for e in report["errors"]))
+        self.assertEqual(report["index"]["default"]["plans"], 3)
+
+
+class TestWorkerReadiness(unittest.TestCase):
+    def test_not_ready_until_warm(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        with open(os.path.join(tmp, "kb_registry.json"), "w", encoding="utf-8") as f:
+            json.dump({"provinces": ["四川"], "total_chunks": 1}, f)
+        catalog = KBCatalog({"default": KBSpec("default", persist_dir=tmp)}, registry=MetricsRegistry())
+        release = threading.Event()
+
+        def slow_warm_up(*args, **kwargs):
+            release.wait(5)
+            return {"errors": [], "seconds": 0.0}
+
+        with WorkerServer(QueryWorker(catalog, name="w", registry=MetricsRegistry())) as server:
+            self.assertEqual(httpx.get(server.base_url + "/ready").status_code, 200)
+            with mock.patch("src.service.warmup.warm_up", side_effect=slow_warm_up):
+                t = threading.Thread(target=server.worker.warm_up)
+                t.start()
+                try:
+                    for _ in range(100):
+                        if not server.worker.ready:
+                            break
+                        threading.Event().wait(0.01)
+                    self.assertEqual(httpx.get(server.base_url + "/ready").status_code, 503)
+                    self.assertFalse(httpx.get(server.base_url + "/health").json()["ready"])
+                finally:
+                    release.set()
+                    t.join()
+            self.assertEqual(httpx.get(server.base_url + "/ready").json(), {"ready": True})
+
+    def test_failed_warm_up_stays_not_ready(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        catalog = KBCatalog({"default": KBSpec("default", persist_dir=tmp)}, registry=MetricsRegistry())
+        outcomes = [{"errors": ["preload generate http://b:11434: boom"], "seconds": 0.0}, RuntimeError("index gone"), {"errors": [], "seconds": 0.0}]
+        with WorkerServer(QueryWorker(catalog, name="w", registry=MetricsRegistry())) as server, mock.patch(
+            "src.service.warmup.warm_up", side_effect=outcomes
+        ):
+            for expected in ("boom", "index gone"):
+                server.worker.warm_up()
+                self.assertFalse(server.worker.ready)
+                resp = httpx.get(server.base_url + "/ready")
+                self.assertEqual(resp.status_code, 503)
+                self.assertIn(expected, resp.json()["errors"][0])
+                self.assertIn(expected, httpx.get(server.base_url + "/health").json()["warmup_errors"][0])
+            server.worker.warm_up()  # retried once the cause is fixed
+            self.assertEqual(httpx.get(server.base_url + "/ready").json(), {"ready": True})
+            self.assertNotIn("warmup_errors", httpx.get(server.base_url + "/health").json())
+
+
+if __name__ == "__main__":
+    unittest.main()